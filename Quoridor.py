@@ -1,597 +1,1501 @@
-# Author: Gabriel Mortensen
-# Date: 8/12/2021
-# Description: Final portfolio project for CS162. Class that allows two people to play the game Quoridor where two
-#              people take turns either moving their pawns or placing fences. First pawn to the other side of the board
-#              wins!
-
-class QuoridorGame:
-    """
-    Class that represents an instance of the game, Quoridor.
-    """
-
-    def __init__(self):
-        """
-        Creates instance of the game board, as wells as default starting data members.
-        """
-        #  I use a dictionary to represent my game board. The numeric keys represent the spaces a pawn is able to move
-        #  to, and the values of these keys are a list containing spaces to place a pawn, denoted as "", or a space to
-        #  place a vertical fence, denoted ".". The "." spaces are used to mark there is NOT a vertical fence separating
-        #  two horizontal spaces. The F1, F2, etc keys represent the horizontal lines between the rows where horizontal
-        #  fences can be placed. "----" means there is no fence yet, and "====" means it has now been fenced. Similarly,
-        #  "||" represents that there is a vertical fence separating two spaces
-        self._game_board = {
-            "top edge": ["||", "====", "====", "====", "====", "====", "====", "====", "====", "====", "||"],
-            0: ["||", "", ".", "", ".", "", ".", "", ".", "P1", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F1": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            1: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F2": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            2: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F3": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            3: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F4": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            4: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F5": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            5: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F6": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            6: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F7": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            7: ["||", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", ".", "", "||"],
-            "F8": ["||", "----", "----", "----", "----", "----", "----", "----", "----", "----", "||"],
-            8: ["||", "", ".", "", ".", "", ".", "", ".", "P2", ".", "", ".", "", ".", "", ".", "", "||"],
-            "bottom edge": ["||", "====", "====", "====", "====", "====", "====", "====", "====", "====", "||"], }
-
-        self._turn_count = 1
-        self._p1_token = "P1"
-        self._p2_token = "P2"
-        self._game_won = False
-        self._p1_location = (4, 0)
-        self._p2_location = (4, 8)
-        self._p1_fences = 10
-        self._p2_fences = 10
-        self._h_fence_dict = {
-            0: self._game_board["top edge"],
-            1: self._game_board["F1"],  # This dictionary allows me to easily convert the target space
-            2: self._game_board["F2"],  # entered for a horizontal fence to the proper place on the
-            3: self._game_board["F3"],  # on the game board. It makes navigating the game board easier
-            4: self._game_board["F4"],
-            5: self._game_board["F5"],
-            6: self._game_board["F6"],
-            7: self._game_board["F7"],
-            8: self._game_board["F8"],
-            9: self._game_board["bottom edge"], }
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                             Getter/Setter Methods
-    def get_turn_count(self):
-        """
-        Returns the current turn of the game. Odd numbers mean it is P1's turn, even numbers mean it's P2's turn
-        """
-        return self._turn_count
-
-    def get_game_won(self):
-        """
-        Method used to check if the private self._game_won variable is True or False
-        """
-        return self._game_won
-
-    def set_game_won(self):
-        """
-        Sets the self._game_won variable to True
-        """
-        self._game_won = True
-
-    def get_pawn_location(self):
-        """
-        Method to retrieve the current location of a pawn, returns a tuple of a pawn's current location
-        """
-        if self.get_turn_count() % 2 == 0:
-            return self._p2_location
-        else:
-            return self._p1_location
-
-    def set_pawn_location(self, target_location):
-        """
-        Method used to change a pawn's location to their targeted space, after it moves successfully
-        """
-        if self.get_turn_count() % 2 == 0:
-            self._p2_location = target_location
-        else:
-            self._p1_location = target_location
-
-    def get_fences_left(self, player_integer):
-        """
-        Method to check the number of fences each player has remaining
-        """
-        if player_integer == 1:
-            return self._p1_fences
-        elif player_integer == 2:
-            return self._p2_fences
-        else:
-            return False
-
-    def get_h_fence_dict(self):
-        """
-        Method to retrieve the dictionary used for horizontal fence placements
-        """
-        return self._h_fence_dict
-
-    def get_game_board(self):
-        """
-        Method to retrieve the private self._game_board data member
-        """
-        return self._game_board
-
-    def get_pawn(self, player_integer):
-        """
-        Gets the token representing the player's pawn on the board
-        """
-        if player_integer == 1:
-            return self._p1_token
-        else:
-            return self._p2_token
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Utility Methods
-    def increment_turn(self):
-        """
-        Method to increment the turn total to help keep track of whose turn it is
-        """
-        self._turn_count += 1
-
-    def display_board(self):
-        """
-        Displays the current game board with current pawn and fence locations
-        """
-        for key in self._game_board:
-            print(self._game_board[key])
-
-    def turn_check(self, player_integer):
-        """
-        Method to check it is the turn of the player trying to make a move, returns false if it is not their turn
-        """
-        if player_integer == 1 and self.get_turn_count() % 2 == 0:
-            return False
-        if player_integer == 2 and self.get_turn_count() % 2 != 0:
-            return False
-        else:
-            return
-
-    @staticmethod
-    def board_edges(target_location):
-        """
-        Checks to make sure a player isn't targeting a position off of the board's edges, returns false if the target
-        location is off the edges of the game board
-        """
-        if target_location[0] < 0 or target_location[0] > 8:
-            return False
-        if target_location[1] < 0 or target_location[1] > 8:
-            return False
-        else:
-            return
-
-    def condition_check(self, player_integer, target_location):
-        """
-        Method that checks various conditions that would invalidate a player move. Checks to make sure it is the players
-        turn, makes sure a player hasn't already won, makes sure the target space is on the board, and makes sure the
-        targeted space does not already have another player's pawn
-        """
-        game_board = self.get_game_board()
-        if self.turn_check(player_integer) is False:
-            return False
-        if self._game_won is True:
-            return False
-        if self.board_edges(target_location) is False:
-            return False
-        if game_board[target_location[1]][(target_location[0] * 2) + 1] != "":
-            return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Move Methods
-    def move_pawn(self, player_integer, target_location):
-        """
-        Method that moves a pawn to a selected space if it is a legal move. Calls other methods depending on the
-        direction the pawn is trying to move
-        """
-        current_location = self.get_pawn_location()
-        if self.condition_check(player_integer, target_location) is False:
-            return False
-        else:
-            if self.is_legal_move(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-
-    def is_legal_move(self, player_integer, target_location, current_location):  # Will add diagonal checks later
-        """
-        Checks to see if a desired move is legal, and determines if the pawn is making a normal move or a special move
-        like moving diagonally or jumping another pawn
-        """
-        #  Diagonal Move
-        if abs(current_location[0] - target_location[0]) == 1 and abs(current_location[1] - target_location[1]) == 1:
-            if self.diagonal_move(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        #  Jumping Move
-        elif abs(current_location[0] - target_location[0]) == 0 and abs(current_location[1] - target_location[1]) == 2:
-            if self.jump_move(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        #  Horizontal Moves
-        elif abs(current_location[0] - target_location[0]) == 1 and abs(current_location[1] - target_location[1]) == 0:
-            if self.horizontal_move(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        #  Vertical Moves
-        elif abs(current_location[0] - target_location[0]) == 0 and abs(current_location[1] - target_location[1]) == 1:
-            if self.vertical_move(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        else:
-            return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Vertical Moves
-
-    def vertical_move(self, player_integer, target_location, current_location):
-        """
-        Method that will be called to move a pawn in vertical directions
-        """
-        if target_location[1] > current_location[1]:  # Moving down the board
-            if self.move_down(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        else:  # Moving up the board
-            if self.move_up(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-
-    def move_down(self, player_integer, target_location, current_location):
-        """
-        Method used to move a piece down the board as long as there is not a horizontal fence blocking their path
-        """
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if h_fence_dict[current_location[1] + 1][current_location[0] + 1] == "----":
-            game_board[target_location[1]][(target_location[0] * 2) + 1] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(target_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    def move_up(self, player_integer, target_location, current_location):
-        """
-        Method used to move a piece up the board as long as there is not a horizontal fence blocking their path
-        """
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if h_fence_dict[current_location[1]][current_location[0] + 1] == "----":
-            game_board[target_location[1]][(target_location[0] * 2) + 1] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(target_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Horizontal Moves
-
-    def horizontal_move(self, player_integer, target_location, current_location):
-        """
-        Method that will be called to move a pawn in horizontal directions
-        """
-        if target_location[0] > current_location[0]:  # Moving to the right side of the board
-            if self.move_right(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        else:                                         # Moving to the left side of the board
-            if self.move_left(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-
-    def move_right(self, player_integer, target_location, current_location):
-        """
-        Moves the pawn to the right of the board as long as there is not a vertical fence blocking their path
-        """
-        game_board = self.get_game_board()
-        if game_board[current_location[1]][(current_location[0] * 2) + 2] == ".":
-            game_board[current_location[1]][(current_location[0] * 2) + 3] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    def move_left(self, player_integer, target_location, current_location):
-        """
-        Moves the pawn to the left of the board as long as there is not a vertical fence blocking their path
-        """
-        game_board = self.get_game_board()
-        if game_board[current_location[1]][(current_location[0] * 2)] == ".":
-            game_board[current_location[1]][(current_location[0] * 2) - 1] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Diagonal Moves
-
-    def diagonal_move(self, player_integer, target_location, current_location):
-        """
-        Method that will be used to make the special diagonal move when a pawn is blocked vertically by a fence and
-        another pawn
-        """
-        if target_location[1] > current_location[1]:  # Upwards diagonal moves
-            if self.diagonal_down(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        else:                                         # Downwards diagonal moves
-            if self.diagonal_up(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-
-    def diagonal_up(self, player_integer, target_location, current_location):
-        """
-        Moves the pawn up the board diagonally if there is a pawn and fence blocking their path upwards
-        """
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if game_board[current_location[1] - 1][(current_location[0] * 2) + 1] != "" and \
-                h_fence_dict[current_location[1] - 1][current_location[0] + 1] != "----":
-            if target_location[0] > current_location[0]:
-                if self.up_right(player_integer, target_location, current_location) is True:
-                    return True
-                else:
-                    return False
-            else:
-                if self.up_left(player_integer, target_location, current_location) is True:
-                    return True
-                else:
-                    return False
-
-    def diagonal_down(self, player_integer, target_location, current_location):
-        """
-        Moves the pawn down the board diagonally if there is a pawn and fence blocking their path downwards
-        """
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if game_board[current_location[1] + 1][(current_location[0] * 2) + 1] != "" and \
-                h_fence_dict[current_location[1] + 2][current_location[0] + 1] != "----":
-            if target_location[0] > current_location[0]:
-                if self.down_right(player_integer, target_location, current_location) is True:
-                    return True
-                else:
-                    return False
-            else:
-                if self.down_left(player_integer, target_location, current_location) is True:
-                    return True
-                else:
-                    return False
-        else:
-            return False
-
-    def down_left(self, player_integer, target_location, current_location):
-        """Moves the pawn down one row, and left one space"""
-        game_board = self.get_game_board()
-        if game_board[current_location[1] + 1][(current_location[0] * 2) - 1] == "":
-            game_board[current_location[1] + 1][(current_location[0] * 2) - 1] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    def down_right(self, player_integer, target_location, current_location):
-        """Moves the pawn down one row, and right one space"""
-        game_board = self.get_game_board()
-        if game_board[current_location[1] + 1][(current_location[0] * 2) + 3] == "":
-            game_board[current_location[1] + 1][(current_location[0] * 2) + 3] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    def up_left(self, player_integer, target_location, current_location):
-        """Moves the pawn up one row, and left one space"""
-        game_board = self.get_game_board()
-        if game_board[current_location[1] - 1][(current_location[0] * 2) - 1] == "":
-            game_board[current_location[1] - 1][(current_location[0] * 2) - 1] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    def up_right(self, player_integer, target_location, current_location):
-        """Moves the pawn down up row, and right one space"""
-        game_board = self.get_game_board()
-        if game_board[current_location[1] - 1][(current_location[0] * 2) + 3] == "":
-            game_board[current_location[1] - 1][(current_location[0] * 2) + 3] = self.get_pawn(player_integer)
-            game_board[current_location[1]][(current_location[0] * 2) + 1] = ""
-            self.set_pawn_location(target_location)
-            self.is_winner(player_integer)
-            self.increment_turn()
-            return True
-        else:
-            return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Jump Moves
-
-    def jump_move(self, player_integer, target_location, current_location):
-        """
-        Method for the special jump move when one pawn is blocked vertically by another
-        """
-        if target_location[1] > current_location[1]:
-            if self.jump_down(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-        else:
-            if self.jump_up(player_integer, target_location, current_location) is True:
-                return True
-            else:
-                return False
-
-    def jump_down(self, player_integer, target_location, current_location):
-        """Allows the pawn to jump down over another pawn, to two rows down"""
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if game_board[current_location[1] + 1][(current_location[0] * 2) + 1] != "":
-            if h_fence_dict[current_location[1] + 2][current_location[0] + 1] == "----" and \
-                    h_fence_dict[current_location[1] + 1][current_location[0] + 1] == "----":
-                game_board[target_location[1]][(target_location[0] * 2) + 1] = self.get_pawn(player_integer)
-                game_board[current_location[1]][(target_location[0] * 2) + 1] = ""
-                self.set_pawn_location(target_location)
-                self.is_winner(player_integer)
-                self.increment_turn()
-                return True
-            else:
-                return False
-
-    def jump_up(self, player_integer, target_location, current_location):
-        """Allows the pawn to jump up over another pawn, to two rows up"""
-        game_board = self.get_game_board()
-        h_fence_dict = self.get_h_fence_dict()
-        if game_board[current_location[1] - 1][(current_location[0] * 2) + 1] != "":
-            if h_fence_dict[current_location[1]][current_location[0] + 1] == "----" and \
-                    h_fence_dict[current_location[1] - 1][current_location[0] + 1] == "----":
-                game_board[target_location[1]][(target_location[0] * 2) + 1] = self.get_pawn(player_integer)
-                game_board[current_location[1]][(target_location[0] * 2) + 1] = ""
-                self.set_pawn_location(target_location)
-                self.is_winner(player_integer)
-                self.increment_turn()
-                return True
-            else:
-                return False
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Fence Methods
-
-    def fences_left(self, player_integer):
-        """
-        Checks if a player still has fences remaining. Returns false if they are out of fences
-        """
-        if self.get_fences_left(player_integer) < 1:
-            return False
-        else:
-            return
-
-    def decrement_fence(self, player_integer):
-        """
-        Reduces a player's fence total by one after they place a fence on their turn
-        """
-        if player_integer == 1:
-            self._p1_fences -= 1
-        else:
-            self._p2_fences -= 1
-
-    def already_fenced(self, v_or_h, target_location):
-        """
-        Method that checks if an entered fence target space is already occupied by another fence
-        """
-        if v_or_h.lower() == "h":
-            target_column = target_location[0] + 1
-            target_row = target_location[1]
-            if self._h_fence_dict[target_row][target_column] != "----":
-                return True
-            else:
-                return
-        elif v_or_h.lower() == "v":
-            target_column = (target_location[0] * 2)
-            target_row = target_location[1]
-            if self._game_board[target_row][target_column] != ".":
-                return True
-            else:
-                return
-
-    def place_fence(self, player_integer, v_or_h, target_location):
-        """
-        Method to place a fence at a targeted location if it passes the condition checks
-        """
-        if self.condition_check(player_integer, target_location) is False:
-            return False
-        if self.fences_left(player_integer) is False:
-            return False
-        if self.already_fenced(v_or_h, target_location) is True:
-            return False
-        else:
-            if v_or_h.lower() == "v":
-                self.vertical_fence(target_location)
-                self.decrement_fence(player_integer)
-                self.increment_turn()
-                return True
-            else:
-                self.horizontal_fence(target_location)
-                self.decrement_fence(player_integer)
-                self.increment_turn()
-                return True
-
-    def horizontal_fence(self, target_location):
-        """
-        Method for placing a horizontal fence
-        """
-        target_column = target_location[0] + 1
-        target_row = target_location[1]
-        self._h_fence_dict[target_row][target_column] = "===="
-        return
-
-    def vertical_fence(self, target_location):
-        """
-        Method for placing a vertical fence
-        """
-        target_column = target_location[0]
-        column_pos_in_dict = (target_column * 2)
-        target_row = target_location[1]
-        self._game_board[target_row][column_pos_in_dict] = "||"
-        return
-
-    # ------------------------------------------------------------------------------------------------------------------
-    #                                               Check for Win Method
-
-    def is_winner(self, player_integer):
-        """
-        Method to check if a player has moved their pawn to the other side of the board, and won the game. Is called by
-        the move_pawn methods anytime a pawn moves successfully
-        """
-        if player_integer == 1:
-            for value in self._game_board[8]:
-                if value == "P1":
-                    self.set_game_won()
-                    return True
-            return False
-        elif player_integer == 2:
-            for value in self._game_board[0]:
-                if value == "P2":
-                    self.set_game_won()
-                    return True
-            return False
-        else:
-            return False
+# Author: Gabriel Mortensen
+# Date: 8/12/2021
+# Description: Final portfolio project for CS162. Class that allows two people to play the game Quoridor where two
+#              people take turns either moving their pawns or placing fences. First pawn to the other side of the board
+#              wins!
+
+import heapq
+import operator
+import random
+import struct
+from array import array
+from collections import namedtuple
+
+#  Squares are numbered row by row, so the space (column, row) is square (row * size) + column, where size is the
+#  number of spaces along a side (9 unless the game is created with another board_size). The fence masks use the same
+#  numbering: bit n of the horizontal mask means there is a fence along the top side of square n, and bit n of the
+#  vertical mask means there is a fence along the left side of square n. The board edges are never stored in the
+#  masks, they are treated as permanent fences by the checks below.
+BOARD_SIZE = 9  # The standard board, used whenever no other size is given
+MIN_BOARD_SIZE = 3
+MAX_BOARD_SIZE = 15  # Pawn squares have to fit in one byte for to_bytes
+UNREACHABLE = 0xFFFF  # Distance given to squares that have no path to the goal row, more than any real distance
+
+#  Compact moves pack the target square and the kind of move into one small integer: (square << 2) | kind
+PAWN_MOVE = 0
+H_FENCE = 1
+V_FENCE = 2
+MOVE_KINDS = ("p", "h", "v")
+LISTENER_EVENTS = ("move", "undo", "load")  # What add_listener can ask to be told about
+
+#  Binary positions: P1 square, P2 square, P1 fences, P2 fences and the turn count (top bit set once the game is won),
+#  followed by the horizontal fence slots of rows 1 and up, then the vertical fence slots of columns 1 and up taken a
+#  row at a time. Each block of slots is packed into as few bytes as it fits in, so a 9x9 position is 24 bytes
+POSITION_HEADER = struct.Struct("<BBBBH")
+GAME_WON_FLAG = 0x8000
+
+
+def encode_move(kind, target_location, board_size=BOARD_SIZE):
+    """
+    Packs a move given as a kind ("p" for a pawn move, "h" or "v" for a fence) and a target location into its compact
+    integer form
+    """
+    return (((target_location[1] * board_size) + target_location[0]) << 2) | MOVE_KINDS.index(kind)
+
+
+def decode_move(move, board_size=BOARD_SIZE):
+    """
+    Unpacks a compact move back into a (kind, target location) tuple
+    """
+    square = move >> 2
+    return MOVE_KINDS[move & 3], (square % board_size, square // board_size)
+
+
+def position_bytes(board_size=BOARD_SIZE):
+    """
+    Returns the length of a position packed by to_bytes for a board size
+    """
+    return POSITION_HEADER.size + 2 * (((board_size - 1) * board_size + 7) // 8)
+
+
+def pack_position(board_size, p1_square, p2_square, h_fences, v_fences, p1_fences, p2_fences, turn_count, game_won):
+    """
+    Packs a position into position_bytes(board_size) bytes, laid out as described above
+    """
+    slot_bytes = (position_bytes(board_size) - POSITION_HEADER.size) // 2
+    turn = turn_count | (GAME_WON_FLAG if game_won is True else 0)
+    header = POSITION_HEADER.pack(p1_square, p2_square, p1_fences, p2_fences, turn)
+    v_rows = 0
+    row_mask = (1 << (board_size - 1)) - 1
+    for row in range(board_size):
+        v_rows |= ((v_fences >> ((row * board_size) + 1)) & row_mask) << (row * (board_size - 1))
+    return header + (h_fences >> board_size).to_bytes(slot_bytes, "little") + v_rows.to_bytes(slot_bytes, "little")
+
+
+def _square_moves(square, h_fences, v_fences, board_size=BOARD_SIZE):
+    """
+    Works out every space a pawn standing on a square can move to, given the fence masks. Returns a dictionary keyed by
+    the opponent's square: the four spaces around the square have their own entry, because an opponent there changes
+    the legal moves (it can't be stepped on, and it can be jumped or sidestepped diagonally). The -1 entry is used
+    whenever the opponent is anywhere else. Each value is a frozenset of target squares
+    """
+    square_count = board_size * board_size
+    column = square % board_size
+    up = square - board_size
+    down = square + board_size
+
+    def open_above(target):  # The first row and the row past the last one are the board edges, always fenced
+        return target >= board_size and not (h_fences >> target) & 1
+
+    def open_below(target):
+        return target < square_count - board_size and not (h_fences >> (target + board_size)) & 1
+
+    steps = []
+    if open_above(square):
+        steps.append(up)
+    if open_below(square):
+        steps.append(down)
+    if column > 0 and not (v_fences >> square) & 1:
+        steps.append(square - 1)
+    if column < board_size - 1 and not (v_fences >> (square + 1)) & 1:
+        steps.append(square + 1)
+
+    moves = {-1: frozenset(steps)}
+    if column > 0:
+        moves[square - 1] = frozenset(steps) - {square - 1}
+    if column < board_size - 1:
+        moves[square + 1] = frozenset(steps) - {square + 1}
+    for opponent, step_open, beyond_open in ((up, open_above, open_above), (down, open_below, open_below)):
+        if opponent < 0 or opponent >= square_count:
+            continue
+        targets = set(steps)
+        targets.discard(opponent)
+        if step_open(square) and beyond_open(opponent):  # Jump straight over the opponent
+            targets.add(opponent + (opponent - square))
+        elif not beyond_open(opponent):  # Fence or board edge behind the opponent, so sidestep diagonally
+            if column > 0:
+                targets.add(opponent - 1)
+            if column < board_size - 1:
+                targets.add(opponent + 1)
+        moves[opponent] = frozenset(targets)
+    return moves
+
+
+def _square_fence_mask(square, offsets, board_size=BOARD_SIZE):
+    """
+    Returns a mask of the fence slots at the given offsets from a square that are on the board
+    """
+    mask = 0
+    for offset in offsets:
+        if 0 <= square + offset < board_size * board_size:
+            mask |= 1 << (square + offset)
+    return mask
+
+
+def _square_edges(square, board_size=BOARD_SIZE):
+    """
+    Lists the spaces next to a square together with the fence slot between them, as (neighbour, horizontal, fence bit)
+    tuples. Used by the path search, which needs to test fences that have not been placed yet
+    """
+    column = square % board_size
+    row = square // board_size
+    edges = []
+    if row > 0:
+        edges.append((square - board_size, True, 1 << square))
+    if row < board_size - 1:
+        edges.append((square + board_size, True, 1 << (square + board_size)))
+    if column > 0:
+        edges.append((square - 1, False, 1 << square))
+    if column < board_size - 1:
+        edges.append((square + 1, False, 1 << (square + 1)))
+    return tuple(edges)
+
+
+def _corner_walls(corner_column, corner_row, board_size=BOARD_SIZE):
+    """
+    Returns the masks of the horizontal and vertical fence slots that meet at a fence corner, or None if the corner is
+    on the edge of the board. Corner (column, row) is the top left corner of the space (column, row)
+    """
+    if corner_column in (0, board_size) or corner_row in (0, board_size):
+        return None
+    corner = (corner_row * board_size) + corner_column
+    h_mask = (1 << corner) | (1 << (corner - 1))
+    v_mask = (1 << corner) | (1 << (corner - board_size))
+    return h_mask, v_mask
+
+
+class BoardGeometry:
+    """
+    Everything about a board size that stays the same from game to game: square numbering, fence slot masks, the
+    tables used by the path checks, the neighbour table of the open board and the Zobrist keys. Use get_geometry to
+    get the shared copy for a size instead of building a new one
+    """
+
+    def __init__(self, board_size):
+        """
+        Builds the tables for a board with board_size spaces along each side
+        """
+        self.board_size = board_size
+        self.square_count = board_size * board_size
+        self.square_to_location = tuple((square % board_size, square // board_size)
+                                        for square in range(self.square_count))
+        self.h_fence_slots = ((1 << self.square_count) - 1) ^ ((1 << board_size) - 1)  # Every square below the top row
+        self.v_fence_slots = sum(1 << square for square in range(self.square_count) if square % board_size > 0)
+        self.square_edges = tuple(_square_edges(square, board_size) for square in range(self.square_count))
+        self.corner_walls = tuple(_corner_walls(corner % (board_size + 1), corner // (board_size + 1), board_size)
+                                  for corner in range((board_size + 1) * (board_size + 1)))
+        #  Neighbour table for a board without any fences. Every game starts from this table and only replaces the
+        #  entries of the squares next to each fence that gets placed
+        self.open_board_moves = tuple(_square_moves(square, 0, 0, board_size) for square in range(self.square_count))
+        #  A square's entry only depends on the six fence slots around it that _square_moves looks at, so entries are
+        #  built once per square and combination of those slots, and shared by every game from then on
+        self.square_h_masks = tuple(_square_fence_mask(square, (-board_size, 0, board_size, 2 * board_size), board_size)
+                                    for square in range(self.square_count))
+        self.square_v_masks = tuple(_square_fence_mask(square, (0, 1), board_size)
+                                    for square in range(self.square_count))
+        self.square_moves = {}  # (square, fenced h slots, fenced v slots) -> entry from _square_moves
+        self.position_bytes = position_bytes(board_size)
+
+        #  Zobrist keys: one random 64-bit number per pawn square, fence slot and fence count, plus one for P2 to move.
+        #  The hash of a position is the XOR of the keys of everything in it, so each change to the game only XORs a
+        #  key in or out
+        zobrist_random = random.Random(0x51D0)
+        self.zobrist_p1 = tuple(zobrist_random.getrandbits(64) for _ in range(self.square_count))
+        self.zobrist_p2 = tuple(zobrist_random.getrandbits(64) for _ in range(self.square_count))
+        self.zobrist_h = tuple(zobrist_random.getrandbits(64) for _ in range(self.square_count))
+        self.zobrist_v = tuple(zobrist_random.getrandbits(64) for _ in range(self.square_count))
+        self.zobrist_p1_fences = tuple(zobrist_random.getrandbits(64) for _ in range(256))
+        self.zobrist_p2_fences = tuple(zobrist_random.getrandbits(64) for _ in range(256))
+        self.zobrist_p2_to_move = zobrist_random.getrandbits(64)
+
+
+_geometries = {}
+
+
+def get_geometry(board_size=BOARD_SIZE):
+    """
+    Returns the BoardGeometry for a board size, building it the first time that size is asked for. Raises ValueError
+    for sizes outside MIN_BOARD_SIZE to MAX_BOARD_SIZE
+    """
+    geometry = _geometries.get(board_size)
+    if geometry is None:
+        if not MIN_BOARD_SIZE <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError("board size must be from %d to %d, got %r" % (MIN_BOARD_SIZE, MAX_BOARD_SIZE, board_size))
+        geometry = BoardGeometry(board_size)
+        _geometries[board_size] = geometry
+    return geometry
+
+
+def _find_path(start_square, goal_row, h_fences, v_fences, board_size=BOARD_SIZE):
+    """
+    Breadth first search from a square to any space on the goal row, going around the fences in the two masks. Pawns
+    are ignored. Returns the path as a (squares mask, horizontal slots crossed, vertical slots crossed) tuple, or None
+    if the goal row can't be reached
+    """
+    square_edges = get_geometry(board_size).square_edges
+    parents = {start_square: None}
+    frontier = [start_square]
+    while frontier:
+        next_frontier = []
+        for square in frontier:
+            if square // board_size == goal_row:
+                squares_mask = h_crossed = v_crossed = 0
+                while square is not None:
+                    squares_mask |= 1 << square
+                    parent = parents[square]
+                    if parent is not None:
+                        for neighbour, horizontal, bit in square_edges[square]:
+                            if neighbour == parent:
+                                if horizontal:
+                                    h_crossed |= bit
+                                else:
+                                    v_crossed |= bit
+                    square = parent
+                return squares_mask, h_crossed, v_crossed
+            for neighbour, horizontal, bit in square_edges[square]:
+                if neighbour in parents:
+                    continue
+                if horizontal:
+                    if h_fences & bit:
+                        continue
+                elif v_fences & bit:
+                    continue
+                parents[neighbour] = square
+                next_frontier.append(neighbour)
+        frontier = next_frontier
+    return None
+
+
+class GameSnapshot(namedtuple("GameSnapshot", ["version", "board_size", "turn_count", "game_won", "p1_square",
+                                               "p2_square", "h_fences", "v_fences", "p1_fences", "p2_fences",
+                                               "position_hash"])):
+    """
+    Read-only copy of a position, published by QuoridorGame.publish_snapshot. It is a tuple of integers, which never
+    change, so other threads can read it without a lock while the game goes on, and snapshots taken one move apart
+    share every value the move didn't touch (a pawn move leaves both fence masks shared). It has the same getters as
+    QuoridorGame for reading a position, so code that only reads one, such as QuoridorRender, takes either. version
+    goes up by one with every snapshot a game publishes
+    """
+
+    __slots__ = ()
+
+    def get_version(self):
+        """
+        Returns the snapshot's version number
+        """
+        return self.version
+
+    def get_board_size(self):
+        """
+        Returns the number of spaces along each side of the board
+        """
+        return self.board_size
+
+    def get_turn_count(self):
+        """
+        Returns the turn count. Odd numbers mean it is P1's turn, even numbers mean it's P2's turn
+        """
+        return self.turn_count
+
+    def get_game_won(self):
+        """
+        Returns True if the game had been won
+        """
+        return self.game_won
+
+    def get_pawn_square(self, player_integer):
+        """
+        Returns the square a player's pawn was on
+        """
+        return self.p1_square if player_integer == 1 else self.p2_square
+
+    def get_fence_masks(self):
+        """
+        Returns the fences as (horizontal mask, vertical mask)
+        """
+        return self.h_fences, self.v_fences
+
+    def get_fences_left(self, player_integer):
+        """
+        Returns the number of fences a player had left
+        """
+        return self.p1_fences if player_integer == 1 else self.p2_fences
+
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the position
+        """
+        return self.position_hash
+
+    def to_bytes(self):
+        """
+        Packs the position the same way as QuoridorGame.to_bytes
+        """
+        return pack_position(self.board_size, self.p1_square, self.p2_square, self.h_fences, self.v_fences,
+                             self.p1_fences, self.p2_fences, self.turn_count, self.game_won)
+
+    def to_game(self):
+        """
+        Returns a new QuoridorGame at the snapshot's position, with no undo history
+        """
+        return QuoridorGame.from_bytes(self.to_bytes(), self.board_size)
+
+
+class QuoridorGame:
+    """
+    Class that represents an instance of the game, Quoridor.
+    """
+
+    def __init__(self, board_size=BOARD_SIZE, fences_per_player=10):
+        """
+        Creates instance of the game board, as wells as default starting data members. board_size is the number of
+        spaces along each side of the board, from MIN_BOARD_SIZE to MAX_BOARD_SIZE, and each player starts with
+        fences_per_player fences (at most 255). Raises ValueError for anything outside those ranges
+        """
+        if not 0 <= fences_per_player <= 255:
+            raise ValueError("fences per player must be from 0 to 255, got %r" % (fences_per_player,))
+        #  The whole position is kept in a handful of integers: one square number per pawn, one bit mask for each
+        #  fence direction and the fence counts. Everything that only depends on the board size is shared between
+        #  games through the board's geometry, so nothing here grows with the number of spaces on the board
+        self._geometry = get_geometry(board_size)
+        self._size = board_size
+        self._fences_per_player = fences_per_player
+        self._turn_count = 1
+        self._p1_token = "P1"
+        self._p2_token = "P2"
+        self._game_won = False
+        self._p1_square = board_size // 2
+        self._p2_square = (board_size * (board_size - 1)) + (board_size // 2)
+        self._h_fences = 0
+        self._v_fences = 0
+        self._p1_fences = fences_per_player
+        self._p2_fences = fences_per_player
+        self._pawn_moves = list(self._geometry.open_board_moves)
+        self._p1_distances = self.compute_distance_map(1)  # Steps from every square to each player's goal row
+        self._p2_distances = self.compute_distance_map(2)
+        self._p1_path = None  # Cached path to each player's goal row, used to skip most path checks for new fences
+        self._p2_path = None
+        self._history = []  # Undo stack, one (kind, player, old square or fence bit, game won, turn, hash) per move
+        self._hash = self.compute_hash()
+        self._snapshot = None  # Last published GameSnapshot, while publishing is switched on
+        self._snapshot_version = 0
+        self._listeners = None  # Event -> callables told about that kind of change to the position, see add_listener
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                             Getter/Setter Methods
+    def get_board_size(self):
+        """
+        Returns the number of spaces along each side of the board
+        """
+        return self._size
+
+    def get_fences_per_player(self):
+        """
+        Returns the number of fences each player started the game with
+        """
+        return self._fences_per_player
+
+    def get_turn_count(self):
+        """
+        Returns the current turn of the game. Odd numbers mean it is P1's turn, even numbers mean it's P2's turn
+        """
+        return self._turn_count
+
+    def get_game_won(self):
+        """
+        Method used to check if the private self._game_won variable is True or False
+        """
+        return self._game_won
+
+    def set_game_won(self):
+        """
+        Sets the self._game_won variable to True
+        """
+        self._game_won = True
+
+    def get_pawn_location(self):
+        """
+        Method to retrieve the current location of a pawn, returns a tuple of a pawn's current location
+        """
+        if self._turn_count % 2 == 0:
+            return self._geometry.square_to_location[self._p2_square]
+        else:
+            return self._geometry.square_to_location[self._p1_square]
+
+    def set_pawn_location(self, target_location):
+        """
+        Method used to change a pawn's location to their targeted space, after it moves successfully
+        """
+        square = (target_location[1] * self._size) + target_location[0]
+        if self._turn_count % 2 == 0:
+            self._hash ^= self._geometry.zobrist_p2[self._p2_square] ^ self._geometry.zobrist_p2[square]
+            self._p2_square = square
+        else:
+            self._hash ^= self._geometry.zobrist_p1[self._p1_square] ^ self._geometry.zobrist_p1[square]
+            self._p1_square = square
+
+    def get_pawn_square(self, player_integer):
+        """
+        Returns the square number, (row * board_size) + column, of a player's pawn
+        """
+        if player_integer == 1:
+            return self._p1_square
+        else:
+            return self._p2_square
+
+    def get_fence_masks(self):
+        """
+        Returns the horizontal and vertical fence masks as a tuple. Bit n of the horizontal mask is a fence along the
+        top side of square n, and bit n of the vertical mask is a fence along its left side
+        """
+        return self._h_fences, self._v_fences
+
+    def get_fences_left(self, player_integer):
+        """
+        Method to check the number of fences each player has remaining
+        """
+        if player_integer == 1:
+            return self._p1_fences
+        elif player_integer == 2:
+            return self._p2_fences
+        else:
+            return False
+
+    def get_h_fence_dict(self):
+        """
+        Method to retrieve the dictionary used for horizontal fence placements. Like get_game_board, this is a view
+        built from the current position, so writing to it does not change the game
+        """
+        game_board = self.get_game_board()
+        h_fence_dict = {0: game_board["top edge"]}
+        for row in range(1, self._size):
+            h_fence_dict[row] = game_board["F" + str(row)]
+        h_fence_dict[self._size] = game_board["bottom edge"]
+        return h_fence_dict
+
+    def get_game_board(self):
+        """
+        Builds the legacy dictionary view of the board from the current position. The numeric keys are the rows of
+        spaces, where "" is an empty space, "." means there is no vertical fence between two spaces and "||" means
+        there is one. The F1, F2, etc keys are the lines between the rows, where "----" means there is no fence yet
+        and "====" means it has been fenced
+        """
+        edge = ["||"] + ["===="] * self._size + ["||"]
+        game_board = {"top edge": edge}
+        for row in range(self._size):
+            if row > 0:
+                fence_line = ["||"]
+                for column in range(self._size):
+                    if (self._h_fences >> ((row * self._size) + column)) & 1:
+                        fence_line.append("====")
+                    else:
+                        fence_line.append("----")
+                fence_line.append("||")
+                game_board["F" + str(row)] = fence_line
+            spaces = ["||"]
+            for column in range(self._size):
+                square = (row * self._size) + column
+                if column > 0:
+                    if (self._v_fences >> square) & 1:
+                        spaces.append("||")
+                    else:
+                        spaces.append(".")
+                if square == self._p1_square:
+                    spaces.append(self._p1_token)
+                elif square == self._p2_square:
+                    spaces.append(self._p2_token)
+                else:
+                    spaces.append("")
+            spaces.append("||")
+            game_board[row] = spaces
+        game_board["bottom edge"] = list(edge)
+        return game_board
+
+    def get_hash(self):
+        """
+        Returns the 64-bit Zobrist hash of the current position. Positions reached through different move orders have
+        the same hash
+        """
+        return self._hash
+
+    def compute_hash(self):
+        """
+        Works out the Zobrist hash of the position from scratch. The game keeps its hash up to date move by move, so
+        this is only needed when the position has been set up some other way
+        """
+        geometry = self._geometry
+        position_hash = geometry.zobrist_p1[self._p1_square] ^ geometry.zobrist_p2[self._p2_square]
+        position_hash ^= geometry.zobrist_p1_fences[self._p1_fences & 255]
+        position_hash ^= geometry.zobrist_p2_fences[self._p2_fences & 255]
+        for keys, mask in ((geometry.zobrist_h, self._h_fences), (geometry.zobrist_v, self._v_fences)):
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                position_hash ^= keys[bit.bit_length() - 1]
+        if self._turn_count % 2 == 0:
+            position_hash ^= geometry.zobrist_p2_to_move
+        return position_hash
+
+    def get_pawn(self, player_integer):
+        """
+        Gets the token representing the player's pawn on the board
+        """
+        if player_integer == 1:
+            return self._p1_token
+        else:
+            return self._p2_token
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Utility Methods
+    def increment_turn(self):
+        """
+        Method to increment the turn total to help keep track of whose turn it is
+        """
+        self._turn_count += 1
+        self._hash ^= self._geometry.zobrist_p2_to_move
+        if self._snapshot is not None:
+            self.publish_snapshot()  # Passing the turn is the last step of every move
+
+    def display_board(self):
+        """
+        Displays the current game board with current pawn and fence locations, drawn as a grid by QuoridorRender
+        """
+        from QuoridorRender import render_board  # Imported here, the renderer module is built on this one
+        print(render_board(self), end="")
+
+    def turn_check(self, player_integer):
+        """
+        Method to check it is the turn of the player trying to make a move, returns false if it is not their turn
+        """
+        if player_integer == 1 and self._turn_count % 2 == 0:
+            return False
+        if player_integer == 2 and self._turn_count % 2 != 0:
+            return False
+        else:
+            return
+
+    @staticmethod
+    def board_edges(target_location, board_size=BOARD_SIZE):
+        """
+        Checks to make sure a player isn't targeting a position off of the board's edges, returns false if the target
+        location is off the edges of a board of board_size
+        """
+        if target_location[0] < 0 or target_location[0] >= board_size:
+            return False
+        if target_location[1] < 0 or target_location[1] >= board_size:
+            return False
+        else:
+            return
+
+    def is_occupied(self, target_location):
+        """
+        Returns True if either pawn is standing on the targeted space
+        """
+        square = (target_location[1] * self._size) + target_location[0]
+        return square == self._p1_square or square == self._p2_square
+
+    def is_h_fenced(self, column, row):
+        """
+        Returns True if the top side of the space (column, row) is closed, either by a horizontal fence or by the top
+        and bottom edges of the board (rows 0 and board_size)
+        """
+        if row <= 0 or row >= self._size:
+            return True
+        return (self._h_fences >> ((row * self._size) + column)) & 1 == 1
+
+    def is_v_fenced(self, column, row):
+        """
+        Returns True if the left side of the space (column, row) is closed, either by a vertical fence or by the left
+        and right edges of the board (columns 0 and board_size)
+        """
+        if column <= 0 or column >= self._size:
+            return True
+        return (self._v_fences >> ((row * self._size) + column)) & 1 == 1
+
+    def condition_check(self, player_integer, target_location):
+        """
+        Method that checks various conditions that would invalidate a player move. Checks to make sure it is the players
+        turn, makes sure a player hasn't already won, makes sure the target space is on the board, and makes sure the
+        targeted space does not already have another player's pawn
+        """
+        if self.turn_check(player_integer) is False:
+            return False
+        if self._game_won is True:
+            return False
+        if self.board_edges(target_location, self._size) is False:
+            return False
+        if self.is_occupied(target_location):
+            return False
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Move Methods
+    def move_pawn(self, player_integer, target_location):
+        """
+        Method that moves a pawn to a selected space if it is a legal move. The move itself is checked against the
+        neighbour table by is_legal_move
+        """
+        current_location = self.get_pawn_location()
+        if self.condition_check(player_integer, target_location) is False:
+            return False
+        else:
+            if self.is_legal_move(player_integer, target_location, current_location) is True:
+                return True
+            else:
+                return False
+
+    def is_legal_move(self, player_integer, target_location, current_location):
+        """
+        Checks to see if a desired move is legal by looking the target up in the neighbour table, which already accounts
+        for fences, jumps over the other pawn and the special diagonal moves
+        """
+        current_square = (current_location[1] * self._size) + current_location[0]
+        target_square = (target_location[1] * self._size) + target_location[0]
+        if current_square == self._p1_square:
+            opponent_square = self._p2_square
+        else:
+            opponent_square = self._p1_square
+        moves = self._pawn_moves[current_square]
+        if target_square in moves.get(opponent_square, moves[-1]):
+            return self.relocate_pawn(player_integer, target_location)
+        else:
+            return False
+
+    def relocate_pawn(self, player_integer, target_location):
+        """
+        Finishes a successful pawn move: moves the pawn, checks for a winner and passes the turn
+        """
+        if self._turn_count % 2 == 0:
+            self.push_undo(PAWN_MOVE, player_integer, self._p2_square, self._hash)
+        else:
+            self.push_undo(PAWN_MOVE, player_integer, self._p1_square, self._hash)
+        self.set_pawn_location(target_location)
+        self.is_winner(player_integer)
+        self.increment_turn()
+        if self._listeners and "move" in self._listeners:
+            self.notify_listeners("move", encode_move("p", target_location, self._size))
+        return True
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Fence Methods
+
+    def fences_left(self, player_integer):
+        """
+        Checks if a player still has fences remaining. Returns false if they are out of fences
+        """
+        if self.get_fences_left(player_integer) < 1:
+            return False
+        else:
+            return
+
+    def decrement_fence(self, player_integer):
+        """
+        Reduces a player's fence total by one after they place a fence on their turn
+        """
+        if player_integer == 1:
+            keys = self._geometry.zobrist_p1_fences
+            self._hash ^= keys[self._p1_fences & 255] ^ keys[(self._p1_fences - 1) & 255]
+            self._p1_fences -= 1
+        else:
+            keys = self._geometry.zobrist_p2_fences
+            self._hash ^= keys[self._p2_fences & 255] ^ keys[(self._p2_fences - 1) & 255]
+            self._p2_fences -= 1
+
+    def already_fenced(self, v_or_h, target_location):
+        """
+        Method that checks if an entered fence target space is already occupied by another fence
+        """
+        if v_or_h.lower() == "h":
+            if self.is_h_fenced(target_location[0], target_location[1]):
+                return True
+            else:
+                return
+        elif v_or_h.lower() == "v":
+            if self.is_v_fenced(target_location[0], target_location[1]):
+                return True
+            else:
+                return
+
+    def place_fence(self, player_integer, v_or_h, target_location):
+        """
+        Method to place a fence at a targeted location if it passes the condition checks
+        """
+        if self.condition_check(player_integer, target_location) is False:
+            return False
+        if self.fences_left(player_integer) is False:
+            return False
+        if self.already_fenced(v_or_h, target_location) is True:
+            return False
+        if self.fence_blocks_path(v_or_h, target_location) is True:
+            return False
+        else:
+            if v_or_h.lower() == "v":
+                v_fences = self._v_fences
+                position_hash = self._hash
+                self.vertical_fence(target_location)
+                self.push_undo(V_FENCE, player_integer, self._v_fences ^ v_fences, position_hash)
+                self.decrement_fence(player_integer)
+                self.increment_turn()
+                if self._listeners and "move" in self._listeners:
+                    self.notify_listeners("move", encode_move("v", target_location, self._size))
+                return True
+            else:
+                h_fences = self._h_fences
+                position_hash = self._hash
+                self.horizontal_fence(target_location)
+                self.push_undo(H_FENCE, player_integer, self._h_fences ^ h_fences, position_hash)
+                self.decrement_fence(player_integer)
+                self.increment_turn()
+                if self._listeners and "move" in self._listeners:
+                    self.notify_listeners("move", encode_move("h", target_location, self._size))
+                return True
+
+    def fence_touches_walls(self, v_or_h, target_location):
+        """
+        Checks if both ends of a fence would touch another fence or the edge of the board. A fence can only close off
+        part of the board if it joins up two walls, so any fence with a free end can't block a path
+        """
+        column = target_location[0]
+        row = target_location[1]
+        if v_or_h.lower() == "v":
+            ends = ((row * (self._size + 1)) + column, ((row + 1) * (self._size + 1)) + column)
+        else:
+            ends = ((row * (self._size + 1)) + column, (row * (self._size + 1)) + column + 1)
+        for corner in ends:
+            walls = self._geometry.corner_walls[corner]
+            if walls is not None and not (self._h_fences & walls[0]) and not (self._v_fences & walls[1]):
+                return False
+        return True
+
+    def get_path(self, player_integer):
+        """
+        Returns a path from the player's pawn to their goal row as a (squares mask, horizontal slots crossed, vertical
+        slots crossed) tuple, or None if there isn't one. The path is cached, and only read off the distance map again
+        once the pawn has stepped off of it or a fence has been placed across it
+        """
+        if player_integer == 1:
+            path = self._p1_path
+            square = self._p1_square
+        else:
+            path = self._p2_path
+            square = self._p2_square
+        if path is None or not (path[0] >> square) & 1:
+            path = self.get_shortest_path(player_integer)
+            self.set_path(player_integer, path)
+        return path
+
+    def set_path(self, player_integer, path):
+        """
+        Stores the cached path for a player
+        """
+        if player_integer == 1:
+            self._p1_path = path
+        else:
+            self._p2_path = path
+
+    def fence_blocks_path(self, v_or_h, target_location):
+        """
+        Checks if placing a fence would leave either player without any path to their goal row. Most fences are ruled
+        out straight away because they have a free end or don't cross either player's cached path, so the path search
+        only runs for fences that could actually close something off
+        """
+        column = target_location[0]
+        row = target_location[1]
+        h_bit = v_bit = 0
+        if v_or_h.lower() == "v":
+            if column <= 0:
+                return False
+            v_bit = 1 << ((row * self._size) + column)
+        else:
+            if row <= 0:  # Placing on the top edge doesn't add a fence to the board
+                return False
+            h_bit = 1 << ((row * self._size) + column)
+        if self.fence_touches_walls(v_or_h, target_location) is False:
+            return False
+        h_fences = self._h_fences | h_bit
+        v_fences = self._v_fences | v_bit
+        for player_integer in (1, 2):
+            path = self.get_path(player_integer)
+            if path is None or not (path[1] & h_bit or path[2] & v_bit):
+                continue
+            pawn_square = self._p1_square if player_integer == 1 else self._p2_square
+            goal_row = self._size - 1 if player_integer == 1 else 0
+            new_path = _find_path(pawn_square, goal_row, h_fences, v_fences, self._size)
+            if new_path is None:
+                return True
+            self.set_path(player_integer, new_path)  # Avoids the new fence, so it's still a valid path today
+        return False
+
+    def horizontal_fence(self, target_location):
+        """
+        Method for placing a horizontal fence. Only the neighbour table entries for the four spaces in the fence's
+        column that can step, jump or sidestep across it are rebuilt
+        """
+        column = target_location[0]
+        row = target_location[1]
+        square = (row * self._size) + column
+        if 0 < row < self._size and not (self._h_fences >> square) & 1:  # Row 0 is the top edge, always fenced
+            bit = 1 << square
+            self._hash ^= self._geometry.zobrist_h[square]
+            self._h_fences |= bit
+            if self._p1_path is not None and self._p1_path[1] & bit:
+                self._p1_path = None
+            if self._p2_path is not None and self._p2_path[1] & bit:
+                self._p2_path = None
+            for near_row in range(max(row - 2, 0), min(row + 2, self._size)):
+                self.update_pawn_moves((near_row * self._size) + column)
+            self.raise_distances(square - self._size, square)
+        return
+
+    def vertical_fence(self, target_location):
+        """
+        Method for placing a vertical fence. Only the two spaces on either side of it need new neighbour table entries
+        """
+        column = target_location[0]
+        row = target_location[1]
+        square = (row * self._size) + column
+        if 0 < column < self._size and not (self._v_fences >> square) & 1:  # Column 0 is the left edge, always fenced
+            bit = 1 << square
+            self._hash ^= self._geometry.zobrist_v[square]
+            self._v_fences |= bit
+            if self._p1_path is not None and self._p1_path[2] & bit:
+                self._p1_path = None
+            if self._p2_path is not None and self._p2_path[2] & bit:
+                self._p2_path = None
+            self.update_pawn_moves(square - 1)
+            self.update_pawn_moves(square)
+            self.raise_distances(square - 1, square)
+        return
+
+    def update_pawn_moves(self, square):
+        """
+        Rebuilds the neighbour table entry for one square from the current fence masks, reusing the geometry's copy of
+        the entry when a game has already had the same fences around that square
+        """
+        geometry = self._geometry
+        h_fences = self._h_fences & geometry.square_h_masks[square]
+        v_fences = self._v_fences & geometry.square_v_masks[square]
+        key = (square, h_fences, v_fences)
+        moves = geometry.square_moves.get(key)
+        if moves is None:
+            moves = _square_moves(square, h_fences, v_fences, self._size)
+            geometry.square_moves[key] = moves
+        self._pawn_moves[square] = moves
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Distance Methods
+
+    def get_distance_map(self, player_integer):
+        """
+        Returns a tuple with the number of steps from every square to the player's goal row (the last row for P1, row
+        0 for P2), going around fences and ignoring pawns. Squares that can't reach the goal row get UNREACHABLE. Both
+        maps are kept up to date as fences come and go, so this doesn't search anything
+        """
+        if player_integer == 1:
+            return tuple(self._p1_distances)
+        else:
+            return tuple(self._p2_distances)
+
+    def get_distance(self, player_integer, square):
+        """
+        Returns the number of steps from one square to the player's goal row, the same as that square's entry in
+        get_distance_map, without copying the map
+        """
+        if player_integer == 1:
+            return self._p1_distances[square]
+        else:
+            return self._p2_distances[square]
+
+    def get_shortest_path_length(self, player_integer):
+        """
+        Returns the number of steps the player's pawn needs to reach their goal row, or UNREACHABLE if it can't
+        """
+        if player_integer == 1:
+            return self._p1_distances[self._p1_square]
+        else:
+            return self._p2_distances[self._p2_square]
+
+    def compute_distance_map(self, player_integer):
+        """
+        Works out a player's distance map from scratch with a breadth first search from their goal row, as a list. The
+        game keeps its own maps up to date move by move, so this is only needed to check them
+        """
+        goal_row = self._size - 1 if player_integer == 1 else 0
+        distances = [UNREACHABLE] * self._geometry.square_count
+        frontier = list(range(goal_row * self._size, (goal_row + 1) * self._size))
+        for square in frontier:
+            distances[square] = 0
+        distance = 0
+        pawn_moves = self._pawn_moves
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for square in frontier:
+                for neighbour in pawn_moves[square][-1]:
+                    if distances[neighbour] == UNREACHABLE:
+                        distances[neighbour] = distance
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return distances
+
+    def raise_distances(self, square_a, square_b):
+        """
+        Repairs both distance maps after a fence has closed the way between two neighbouring squares. Only squares
+        whose every shortest path went through that gap get new distances: they are found level by level outward from
+        the gap, then given new distances from the squares around them that weren't affected
+        """
+        pawn_moves = self._pawn_moves
+        for distances in (self._p1_distances, self._p2_distances):
+            lower, upper = square_a, square_b
+            if distances[lower] > distances[upper]:
+                lower, upper = upper, lower
+            if distances[upper] != distances[lower] + 1:
+                continue  # The gap wasn't on any shortest path, so nothing changes
+            affected = set()
+            level = [upper]
+            while level:
+                next_level = []
+                for square in level:
+                    if square in affected:
+                        continue
+                    supported = False
+                    for neighbour in pawn_moves[square][-1]:
+                        if distances[neighbour] == distances[square] - 1 and neighbour not in affected:
+                            supported = True
+                            break
+                    if supported:
+                        continue
+                    affected.add(square)
+                    for neighbour in pawn_moves[square][-1]:
+                        if distances[neighbour] == distances[square] + 1:
+                            next_level.append(neighbour)
+                level = next_level
+            if not affected:
+                continue
+            for square in affected:
+                distances[square] = UNREACHABLE
+            queue = []
+            for square in affected:
+                best = UNREACHABLE
+                for neighbour in pawn_moves[square][-1]:
+                    if distances[neighbour] + 1 < best:
+                        best = distances[neighbour] + 1
+                if best < UNREACHABLE:
+                    distances[square] = best
+                    queue.append((best, square))
+            heapq.heapify(queue)
+            while queue:
+                distance, square = heapq.heappop(queue)
+                if distance > distances[square]:
+                    continue
+                for neighbour in pawn_moves[square][-1]:
+                    if distance + 1 < distances[neighbour]:
+                        distances[neighbour] = distance + 1
+                        heapq.heappush(queue, (distance + 1, neighbour))
+
+    def lower_distances(self, square_a, square_b):
+        """
+        Repairs both distance maps after the way between two neighbouring squares has been opened up again. Distances
+        can only go down, so the change is spread outward from the gap until it stops making anything shorter
+        """
+        pawn_moves = self._pawn_moves
+        for distances in (self._p1_distances, self._p2_distances):
+            if distances[square_a] > distances[square_b] + 1:
+                distances[square_a] = distances[square_b] + 1
+                frontier = [square_a]
+            elif distances[square_b] > distances[square_a] + 1:
+                distances[square_b] = distances[square_a] + 1
+                frontier = [square_b]
+            else:
+                continue
+            while frontier:
+                next_frontier = []
+                for square in frontier:
+                    for neighbour in pawn_moves[square][-1]:
+                        if distances[neighbour] > distances[square] + 1:
+                            distances[neighbour] = distances[square] + 1
+                            next_frontier.append(neighbour)
+                frontier = next_frontier
+
+    def get_shortest_path(self, player_integer, distances=None):
+        """
+        Returns one shortest path from the player's pawn to their goal row, in the same (squares mask, horizontal slots
+        crossed, vertical slots crossed) form as get_path, or None if there isn't one. A distance map for the player
+        can be passed in if the caller already has one
+        """
+        if distances is None:
+            distances = self._p1_distances if player_integer == 1 else self._p2_distances
+        square = self._p1_square if player_integer == 1 else self._p2_square
+        if distances[square] == UNREACHABLE:
+            return None
+        squares_mask = 1 << square
+        h_crossed = v_crossed = 0
+        while distances[square] > 0:
+            for neighbour, horizontal, bit in self._geometry.square_edges[square]:
+                if distances[neighbour] == distances[square] - 1 and neighbour in self._pawn_moves[square][-1]:
+                    if horizontal:
+                        h_crossed |= bit
+                    else:
+                        v_crossed |= bit
+                    square = neighbour
+                    break
+            squares_mask |= 1 << square
+        return squares_mask, h_crossed, v_crossed
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Move Generation
+
+    def get_pawn_targets(self, player_integer):
+        """
+        Returns the frozenset of squares the player's pawn could move to from where it stands, ignoring whose turn it is
+        """
+        if player_integer == 1:
+            moves = self._pawn_moves[self._p1_square]
+            return moves.get(self._p2_square, moves[-1])
+        else:
+            moves = self._pawn_moves[self._p2_square]
+            return moves.get(self._p1_square, moves[-1])
+
+    def legal_fence_masks(self, player_integer):
+        """
+        Returns the masks of every horizontal and vertical fence slot the player could place a fence in, ignoring whose
+        turn it is. Free slots are found for the whole board at once, and only the slots that cross one of the cached
+        paths are checked one by one with fence_blocks_path
+        """
+        if self.get_fences_left(player_integer) < 1:
+            return 0, 0
+        pawns = (1 << self._p1_square) | (1 << self._p2_square)  # A fence can't be placed on a pawn's space
+        h_free = self._geometry.h_fence_slots & ~self._h_fences & ~pawns
+        v_free = self._geometry.v_fence_slots & ~self._v_fences & ~pawns
+        h_crossed = v_crossed = 0
+        for path in (self.get_path(1), self.get_path(2)):
+            if path is not None:
+                h_crossed |= path[1]
+                v_crossed |= path[2]
+        for v_or_h, crossed in (("h", h_free & h_crossed), ("v", v_free & v_crossed)):
+            while crossed:
+                bit = crossed & -crossed
+                crossed ^= bit
+                if self.fence_blocks_path(v_or_h, self._geometry.square_to_location[bit.bit_length() - 1]) is True:
+                    if v_or_h == "h":
+                        h_free ^= bit
+                    else:
+                        v_free ^= bit
+        return h_free, v_free
+
+    def legal_moves(self, player_integer, compact=False):
+        """
+        Returns every legal move for a player without changing the game: pawn moves first, then horizontal fences, then
+        vertical fences. Each move is a (kind, target location) tuple where kind is "p", "h" or "v". With compact set
+        to True the moves come back as an array of compact integers instead (see encode_move). A player has no legal
+        moves when it isn't their turn or the game is over
+        """
+        moves = array("H")
+        if self.turn_check(player_integer) is False or self._game_won is True:
+            return moves if compact else []
+        for square in sorted(self.get_pawn_targets(player_integer)):
+            moves.append((square << 2) | PAWN_MOVE)
+        h_free, v_free = self.legal_fence_masks(player_integer)
+        for kind, mask in ((H_FENCE, h_free), (V_FENCE, v_free)):
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                moves.append(((bit.bit_length() - 1) << 2) | kind)
+        if compact:
+            return moves
+        return [(MOVE_KINDS[move & 3], self._geometry.square_to_location[move >> 2]) for move in moves]
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Make/Unmake Methods
+
+    def apply(self, move):
+        """
+        Plays a move for whoever's turn it is. The move can be a compact integer, including a NumPy one, or a (kind,
+        target location) tuple, as returned by legal_moves. Returns True if the move was legal and has been made, False
+        otherwise, including for a compact integer that doesn't encode a move on this board
+        """
+        if isinstance(move, (tuple, list)):
+            kind, target_location = move
+        else:
+            move = operator.index(move)
+            if move < 0 or (move >> 2) >= self._geometry.square_count or (move & 3) >= len(MOVE_KINDS):
+                return False
+            kind = MOVE_KINDS[move & 3]
+            target_location = self._geometry.square_to_location[move >> 2]
+        player_integer = 1 if self._turn_count % 2 != 0 else 2
+        if kind == "p":
+            return self.move_pawn(player_integer, target_location)
+        else:
+            return self.place_fence(player_integer, kind, target_location)
+
+    def push_undo(self, kind, player_integer, value, position_hash):
+        """
+        Records what a move changes, so that undo can put it back. The value is the pawn's old square for pawn moves,
+        or the fence bit that was added for fences (0 if the fence didn't add anything to the board), and the hash is
+        the one from before the move
+        """
+        self._history.append((kind, player_integer, value, self._game_won, self._turn_count, position_hash))
+
+    def undo(self):
+        """
+        Takes back the last successful move, whether it was made through apply, move_pawn or place_fence. Returns False
+        if there is nothing to take back
+        """
+        if not self._history:
+            return False
+        kind, player_integer, value, game_won, turn_count, position_hash = self._history.pop()
+        if kind == PAWN_MOVE:
+            if player_integer == 1:
+                self._p1_square = value
+            else:
+                self._p2_square = value
+        else:
+            if player_integer == 1:
+                self._p1_fences += 1
+            else:
+                self._p2_fences += 1
+            if value:
+                self.remove_fence(kind, value)
+        self._game_won = game_won
+        self._turn_count = turn_count
+        self._hash = position_hash
+        if self._snapshot is not None:
+            self.publish_snapshot()
+        if self._listeners:
+            self.notify_listeners("undo", None)
+        return True
+
+    def get_undo_count(self):
+        """
+        Returns how many moves can currently be taken back with undo
+        """
+        return len(self._history)
+
+    def remove_fence(self, kind, bit):
+        """
+        Takes a fence back off the board and rebuilds the neighbour table entries and distances it had changed. Cached
+        paths stay valid, since removing a fence never breaks a path
+        """
+        square = bit.bit_length() - 1
+        if kind == H_FENCE:
+            self._h_fences &= ~bit
+            self._hash ^= self._geometry.zobrist_h[square]
+            column = square % self._size
+            row = square // self._size
+            for near_row in range(max(row - 2, 0), min(row + 2, self._size)):
+                self.update_pawn_moves((near_row * self._size) + column)
+            self.lower_distances(square - self._size, square)
+        else:
+            self._v_fences &= ~bit
+            self._hash ^= self._geometry.zobrist_v[square]
+            self.update_pawn_moves(square - 1)
+            self.update_pawn_moves(square)
+            self.lower_distances(square - 1, square)
+
+    def playout(self, rng, greedy=0.75, max_plies=200):
+        """
+        Plays the rest of the game out on local copies of the pawn squares, for Monte Carlo search, and returns the
+        winner (1 or 2), or 0 if nobody has won after max_plies. The game itself is not changed. No fences are placed
+        during a playout, so the game's own distance maps stay right throughout. On each turn the pawn moves to the
+        target closest to its goal row with probability greedy, and to a random legal target otherwise
+        """
+        if self._game_won is True:
+            return 1 if self._turn_count % 2 == 0 else 2  # Whoever moved last won
+        pawn_moves = self._pawn_moves
+        squares = [0, self._p1_square, self._p2_square]
+        distances = [None, self._p1_distances, self._p2_distances]
+        player_integer = 1 if self._turn_count % 2 != 0 else 2
+        for _ in range(max_plies):
+            own_square = squares[player_integer]
+            moves = pawn_moves[own_square]
+            targets = moves.get(squares[3 - player_integer], moves[-1])
+            if targets:
+                own_distances = distances[player_integer]
+                if rng.random() < greedy:
+                    target = min(targets, key=own_distances.__getitem__)
+                else:
+                    target = rng.choice(tuple(targets))
+                if own_distances[target] == 0:
+                    return player_integer
+                squares[player_integer] = target
+            player_integer = 3 - player_integer
+        return 0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Diagnostic Methods
+
+    def rejection_reason(self, player_integer, kind, target_location):
+        """
+        Explains why a move would be turned down, running the same checks in the same order as move_pawn (kind "p") or
+        place_fence (kind "h" or "v") without changing the game. Returns one of "wrong turn", "game over", "off board",
+        "occupied", "no fences left", "already fenced", "blocks path", "fenced" (a pawn move that only a fence is
+        stopping) or "out of reach" (a pawn move that isn't a step, jump or diagonal move), or None if the move is legal
+        """
+        if self.turn_check(player_integer) is False:
+            return "wrong turn"
+        if self._game_won is True:
+            return "game over"
+        if self.board_edges(target_location, self._size) is False:
+            return "off board"
+        if self.is_occupied(target_location):
+            return "occupied"
+        if kind == "p":
+            own_square = self._p1_square if player_integer == 1 else self._p2_square
+            other_square = self._p2_square if player_integer == 1 else self._p1_square
+            target_square = (target_location[1] * self._size) + target_location[0]
+            moves = self._pawn_moves[own_square]
+            if target_square in moves.get(other_square, moves[-1]):
+                return None
+            open_moves = self._geometry.open_board_moves[own_square]
+            if target_square in open_moves.get(other_square, open_moves[-1]):
+                return "fenced"
+            return "out of reach"
+        if self.fences_left(player_integer) is False:
+            return "no fences left"
+        if self.already_fenced(kind, target_location) is True:
+            return "already fenced"
+        if self.fence_blocks_path(kind, target_location) is True:
+            return "blocks path"
+        return None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Snapshot Methods
+
+    def enable_snapshots(self):
+        """
+        Switches on publishing: from now on a new GameSnapshot is published at the end of every move, undo and
+        load_position, and get_snapshot returns the latest one. Publishing is a single attribute assignment, so readers
+        on other threads never see half of a move and never need to take a lock. Searches that apply and undo moves
+        publish the positions they visit too, so they should be run on a copy of a game that is being published
+        """
+        if self._snapshot is None:
+            self.publish_snapshot()
+
+    def disable_snapshots(self):
+        """
+        Stops publishing snapshots
+        """
+        self._snapshot = None
+
+    def make_snapshot(self):
+        """
+        Returns a GameSnapshot of the current position without publishing it. The integers are shared, not copied
+        """
+        return GameSnapshot._make((self._snapshot_version, self._size, self._turn_count, self._game_won,
+                                   self._p1_square, self._p2_square, self._h_fences, self._v_fences, self._p1_fences,
+                                   self._p2_fences, self._hash))
+
+    def publish_snapshot(self):
+        """
+        Makes a snapshot of the current position with the next version number and publishes it
+        """
+        self._snapshot_version += 1
+        self._snapshot = self.make_snapshot()
+
+    def get_snapshot(self):
+        """
+        Returns the latest published snapshot, which is safe to call from any thread. When publishing is off it makes
+        one of the current position instead, which is only safe from the thread playing the game
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.make_snapshot()
+        return snapshot
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Listener Methods
+
+    def add_listener(self, listener, events=LISTENER_EVENTS):
+        """
+        Registers a callable that is told about changes to the position, once the change is complete. It is called as
+        listener(game, event, move), where event is "move" for a move made through move_pawn, place_fence or apply
+        (move is then the compact move), "undo" for a move taken back and "load" for a position set up with
+        load_position (move is None for both). events picks which of them the listener is told about. While nobody
+        listens for "move", moves don't even work out their compact form. Raises ValueError for an unknown event
+        """
+        for event in events:
+            if event not in LISTENER_EVENTS:
+                raise ValueError("unknown event %r, expected one of %s" % (event, ", ".join(LISTENER_EVENTS)))
+        if self._listeners is None:
+            self._listeners = {}
+        for event in events:
+            self._listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, listener):
+        """
+        Stops telling a listener about changes. Does nothing if it wasn't registered
+        """
+        if not self._listeners:
+            return
+        for event in list(self._listeners):
+            listeners = self._listeners[event]
+            if listener in listeners:
+                listeners.remove(listener)
+                if not listeners:
+                    del self._listeners[event]  # So the move methods can tell nobody is listening for moves
+
+    def notify_listeners(self, event, move):
+        """
+        Calls every listener registered for an event
+        """
+        for listener in self._listeners.get(event, ()):
+            listener(self, event, move)
+
+    def __getstate__(self):
+        """
+        Pickles and copies leave the listeners behind, they belong to the original game. The board geometry and the
+        neighbour table are left out as well, since they are much bigger than the position and __setstate__ can get
+        them back from the board size and the fence masks
+        """
+        state = self.__dict__.copy()
+        state["_listeners"] = None
+        del state["_geometry"]
+        del state["_pawn_moves"]
+        return state
+
+    def __deepcopy__(self, memo):
+        """
+        Copies the game without going through pickling. Every list in a game holds values that are never changed in
+        place (a fence replaces neighbour table entries rather than editing them), so each list is copied on its own
+        and its items are shared with the original, as is the board geometry
+        """
+        game = self.__class__.__new__(self.__class__)
+        memo[id(self)] = game
+        state = self.__dict__.copy()
+        for name, value in state.items():
+            if type(value) is list:
+                state[name] = list(value)
+        state["_listeners"] = None
+        game.__dict__.update(state)
+        return game
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled or copied game, sharing the geometry of its board size with every other game again and
+        rebuilding its neighbour table
+        """
+        self.__dict__.update(state)
+        self._geometry = get_geometry(self._size)
+        self.rebuild_pawn_moves()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Binary Encoding Methods
+
+    def to_bytes(self):
+        """
+        Packs the position into get_geometry(size).position_bytes bytes (24 on the standard board), laid out as
+        described at the top of the file. The undo history is not included
+        """
+        return pack_position(self._size, self._p1_square, self._p2_square, self._h_fences, self._v_fences,
+                             self._p1_fences, self._p2_fences, self._turn_count, self._game_won)
+
+    @classmethod
+    def from_bytes(cls, data, board_size=BOARD_SIZE, fences_per_player=10):
+        """
+        Creates a game from a position packed by to_bytes on a board of board_size. data can be any bytes-like object,
+        such as a memoryview into a position store. fences_per_player is only kept for get_fences_per_player, the
+        fences each player has left come from the data. Raises ValueError if it isn't a valid position
+        """
+        if not 0 <= fences_per_player <= 255:
+            raise ValueError("fences per player must be from 0 to 255, got %r" % (fences_per_player,))
+        #  load_position sets up the whole position and everything worked out from it, so __init__ is skipped rather
+        #  than building a starting position only to replace it. Only what load_position doesn't set is filled in here
+        game = cls.__new__(cls)
+        game._geometry = get_geometry(board_size)
+        game._size = board_size
+        game._fences_per_player = fences_per_player
+        game._p1_token = "P1"
+        game._p2_token = "P2"
+        game._snapshot = None
+        game._snapshot_version = 0
+        game._listeners = None
+        expected = game._geometry.position_bytes
+        if len(data) != expected:
+            raise ValueError("a position is %d bytes, got %d" % (expected, len(data)))
+        p1_square, p2_square, p1_fences, p2_fences, turn = POSITION_HEADER.unpack_from(data)
+        square_count = game._geometry.square_count
+        if p1_square >= square_count or p2_square >= square_count or p1_square == p2_square:
+            raise ValueError("bad pawn squares %d and %d" % (p1_square, p2_square))
+        slot_bytes = (expected - POSITION_HEADER.size) // 2
+        h_start = POSITION_HEADER.size
+        v_start = h_start + slot_bytes
+        h_fences = int.from_bytes(data[h_start:v_start], "little") << board_size
+        v_rows = int.from_bytes(data[v_start:v_start + slot_bytes], "little")
+        v_fences = 0
+        row_mask = (1 << (board_size - 1)) - 1
+        for row in range(board_size):
+            v_fences |= ((v_rows >> (row * (board_size - 1))) & row_mask) << ((row * board_size) + 1)
+        game.load_position(p1_square, p2_square, h_fences, v_fences, p1_fences, p2_fences, turn & ~GAME_WON_FLAG,
+                           turn & GAME_WON_FLAG != 0)
+        return game
+
+    def load_position(self, p1_square, p2_square, h_fences, v_fences, p1_fences, p2_fences, turn_count,
+                      game_won=False):
+        """
+        Replaces the whole position and rebuilds everything worked out from it: the neighbour table entries next to
+        fences, both distance maps and the hash. The undo history is cleared
+        """
+        self._p1_square = p1_square
+        self._p2_square = p2_square
+        self._h_fences = h_fences & self._geometry.h_fence_slots
+        self._v_fences = v_fences & self._geometry.v_fence_slots
+        self._p1_fences = p1_fences
+        self._p2_fences = p2_fences
+        self._turn_count = turn_count
+        self._game_won = game_won
+        self.rebuild_pawn_moves()
+        self._p1_distances = self.compute_distance_map(1)
+        self._p2_distances = self.compute_distance_map(2)
+        self._p1_path = None
+        self._p2_path = None
+        self._history = []
+        self._hash = self.compute_hash()
+        if self._snapshot is not None:
+            self.publish_snapshot()
+        if self._listeners:
+            self.notify_listeners("load", None)
+
+    def rebuild_pawn_moves(self):
+        """
+        Rebuilds the whole neighbour table from the fence masks, starting from the open board's table and redoing only
+        the entries next to a fence
+        """
+        self._pawn_moves = list(self._geometry.open_board_moves)
+        changed = set()
+        mask = self._h_fences
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            square = bit.bit_length() - 1
+            row = square // self._size
+            for near_row in range(max(row - 2, 0), min(row + 2, self._size)):
+                changed.add((near_row * self._size) + (square % self._size))
+        mask = self._v_fences
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            square = bit.bit_length() - 1
+            changed.add(square - 1)
+            changed.add(square)
+        for square in changed:
+            self.update_pawn_moves(square)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Check for Win Method
+
+    def is_winner(self, player_integer):
+        """
+        Method to check if a player has moved their pawn to the other side of the board, and won the game. Is called by
+        the move_pawn methods anytime a pawn moves successfully
+        """
+        if player_integer == 1:
+            if self._p1_square // self._size == self._size - 1:
+                self.set_game_won()
+                return True
+            return False
+        elif player_integer == 2:
+            if self._p2_square // self._size == 0:
+                self.set_game_won()
+                return True
+            return False
+        else:
+            return False
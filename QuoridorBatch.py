@@ -0,0 +1,318 @@
+# Description: Batched Quoridor simulator for generating training data. Holds many games at once as NumPy arrays and
+#              applies one action per game in a single vectorized step, following the same rules as
+#              QuoridorGame.move_pawn and QuoridorGame.place_fence.
+
+import math
+
+import numpy as np
+
+from Quoridor import BOARD_SIZE, GAME_WON_FLAG, POSITION_HEADER, UNREACHABLE, get_geometry
+
+
+class QuoridorBatch:
+    """
+    N games of Quoridor stored as arrays: pawn squares, one boolean per fence slot for each direction (laid out like
+    QuoridorGame's fence masks), fence counts, turn counts and won flags. Every game in a batch is on the same size of
+    board
+    """
+
+    def __init__(self, game_count, fences_per_player=10, board_size=BOARD_SIZE):
+        """
+        Creates game_count games on a board of board_size, all at the starting position
+        """
+        get_geometry(board_size)  # Raises ValueError for a size QuoridorGame doesn't support
+        self._game_count = game_count
+        self._fences_per_player = fences_per_player
+        self._size = board_size
+        self._square_count = board_size * board_size
+        self._index = np.arange(game_count)
+        self.p1_square = np.empty(game_count, dtype=np.int16)
+        self.p2_square = np.empty(game_count, dtype=np.int16)
+        self.h_fences = np.empty((game_count, self._square_count), dtype=bool)
+        self.v_fences = np.empty((game_count, self._square_count), dtype=bool)
+        self.fences_left = np.empty((game_count, 2), dtype=np.int16)
+        self.turn_count = np.empty(game_count, dtype=np.int32)
+        self.game_won = np.empty(game_count, dtype=bool)
+        self.winner = np.empty(game_count, dtype=np.int8)
+        self.reset()
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Creates a batch holding copies of the positions of a non-empty list of QuoridorGame objects, which must all be
+        on the same size of board
+        """
+        board_size = games[0].get_board_size()
+        if any(game.get_board_size() != board_size for game in games):
+            raise ValueError("games in a batch must all be on the same size of board")
+        data = b"".join([game.to_bytes() for game in games])
+        return cls.from_records(data, board_size, games[0].get_fences_per_player())
+
+    @classmethod
+    def from_records(cls, data, board_size=BOARD_SIZE, fences_per_player=10):
+        """
+        Creates a batch from positions packed back to back by QuoridorGame.to_bytes, such as the records of a position
+        store. The whole block is unpacked with array operations, without making a QuoridorGame for each position. The
+        positions are trusted to be ones to_bytes wrote
+        """
+        record_bytes = get_geometry(board_size).position_bytes
+        if len(data) % record_bytes != 0:
+            raise ValueError("data is not a whole number of %d byte positions" % record_bytes)
+        count = len(data) // record_bytes
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(count, record_bytes)
+        batch = cls(count, fences_per_player, board_size)
+        batch.p1_square[:] = raw[:, 0]
+        batch.p2_square[:] = raw[:, 1]
+        batch.fences_left[:] = raw[:, 2:4]
+        turn = raw[:, 4].astype(np.int32) | (raw[:, 5].astype(np.int32) << 8)
+        batch.turn_count[:] = turn & ~GAME_WON_FLAG
+        batch.game_won[:] = turn & GAME_WON_FLAG != 0
+        batch.winner[:] = np.where(batch.game_won, np.where(batch.turn_count % 2 == 0, 1, 2), 0)
+
+        #  The horizontal slots are every square after the first row, and the vertical slots every column after the
+        #  first, one row after another, each as a little-endian run of bits
+        slots = board_size * (board_size - 1)
+        slot_bytes = (record_bytes - POSITION_HEADER.size) // 2
+        h_start = POSITION_HEADER.size
+        v_start = h_start + slot_bytes
+        h_bits = np.unpackbits(raw[:, h_start:v_start], axis=1, bitorder="little")[:, :slots]
+        v_bits = np.unpackbits(raw[:, v_start:], axis=1, bitorder="little")[:, :slots]
+        batch.h_fences[:, :board_size] = False
+        batch.h_fences[:, board_size:] = h_bits
+        v_fences = batch.v_fences.reshape(count, board_size, board_size)
+        v_fences[:, :, 0] = False
+        v_fences[:, :, 1:] = v_bits.reshape(count, board_size, board_size - 1)
+        return batch
+
+    def get_game_count(self):
+        """
+        Returns the number of games in the batch
+        """
+        return self._game_count
+
+    def get_board_size(self):
+        """
+        Returns the size of the board the games are on
+        """
+        return self._size
+
+    def get_action_count(self):
+        """
+        Returns the number of compact actions on the batch's board, the width of action_mask
+        """
+        return self._square_count * 4
+
+    def reset(self, which=None):
+        """
+        Puts games back to the starting position. which is a boolean mask or index array of the games to reset, and
+        defaults to every game
+        """
+        if which is None:
+            which = slice(None)
+        self.p1_square[which] = self._size // 2
+        self.p2_square[which] = self._square_count - self._size + self._size // 2
+        self.h_fences[which] = False
+        self.v_fences[which] = False
+        self.fences_left[which] = self._fences_per_player
+        self.turn_count[which] = 1
+        self.game_won[which] = False
+        self.winner[which] = 0
+
+    def pawn_legal(self, targets):
+        """
+        Checks pawn moves to the squares in targets, an array of shape (N,) or (N, k), for the side to move in each
+        game. Follows QuoridorGame.is_legal_move: single steps not blocked by a fence, straight jumps over the other
+        pawn, and diagonal moves when the other pawn is directly ahead with a fence or the board edge behind it
+        """
+        size = self._size
+        square_count = self._square_count
+        targets = np.asarray(targets)
+        extra = (slice(None),) + (None,) * (targets.ndim - 1)
+        index = self._index[extra]
+        p1_turn = (self.turn_count % 2 == 1)[extra]
+        own = np.where(p1_turn, self.p1_square[extra], self.p2_square[extra]).astype(np.int64)
+        other = np.where(p1_turn, self.p2_square[extra], self.p1_square[extra]).astype(np.int64)
+        on_board = (targets >= 0) & (targets < square_count)
+        target = np.where(on_board, targets, 0).astype(np.int64)
+        free = on_board & (target != own) & (target != other) & ~self.game_won[extra]
+        column_change = (target % size) - (own % size)
+        row_change = (target // size) - (own // size)
+        h = self.h_fences
+        v = self.v_fences
+        down = (column_change == 0) & (row_change == 1) & ~h[index, target]
+        up = (column_change == 0) & (row_change == -1) & ~h[index, own]
+        right = (column_change == 1) & (row_change == 0) & ~v[index, target]
+        left = (column_change == -1) & (row_change == 0) & ~v[index, own]
+
+        middle = np.clip(own + size * np.sign(row_change), 0, square_count - 1)
+        jump_open = np.where(row_change > 0, ~h[index, middle] & ~h[index, target], ~h[index, own] & ~h[index, middle])
+        jump = (column_change == 0) & (np.abs(row_change) == 2) & (other == middle) & jump_open
+
+        #  The square behind the other pawn is closed off by a fence, or by the board edge on the first and last rows
+        other_row = other // size
+        behind_below = (other_row == size - 1) | h[index, np.minimum(other + size, square_count - 1)]
+        behind_above = (other_row == 0) | h[index, other]
+        diagonal = ((np.abs(column_change) == 1) & (np.abs(row_change) == 1) &
+                    (other == own + size * row_change) & np.where(row_change > 0, behind_below, behind_above))
+        return free & (down | up | right | left | jump | diagonal)
+
+    def fence_free(self, kind, targets):
+        """
+        Checks that fences of one kind (1 for horizontal, 2 for vertical) could go on the squares in targets, ignoring
+        the rule against cutting a player off: it must be the player's turn to move with fences left, the slot must be
+        empty and on the board, and no pawn may be standing on the target space
+        """
+        size = self._size
+        square_count = self._square_count
+        targets = np.asarray(targets)
+        extra = (slice(None),) + (None,) * (targets.ndim - 1)
+        index = self._index[extra]
+        p1_turn = self.turn_count % 2 == 1
+        fences_left = np.where(p1_turn, self.fences_left[:, 0], self.fences_left[:, 1])[extra] > 0
+        on_board = (targets >= 0) & (targets < square_count)
+        target = np.where(on_board, targets, 0).astype(np.int64)
+        free = (on_board & fences_left & ~self.game_won[extra] &
+                (target != self.p1_square[extra]) & (target != self.p2_square[extra]))
+        if kind == 1:
+            return free & (target >= size) & ~self.h_fences[index, target]
+        return free & (target % size > 0) & ~self.v_fences[index, target]
+
+    @staticmethod
+    def has_paths(h_fences, v_fences, p1_square, p2_square):
+        """
+        Flood fills every board from both goal rows at once and returns an (M, 2) array saying whether each pawn can
+        still reach its goal row. The board size is worked out from the width of the fence arrays
+        """
+        count = len(p1_square)
+        square_count = h_fences.shape[1]
+        size = math.isqrt(square_count)
+        open_rows = ~h_fences.reshape(count, size, size)[:, 1:, :]  # Between row r and row r + 1
+        open_columns = ~v_fences.reshape(count, size, size)[:, :, 1:]  # Between column c and c + 1
+        result = np.empty((count, 2), dtype=bool)
+        index = np.arange(count)
+        for player_column, goal_row, pawn in ((0, size - 1, p1_square), (1, 0, p2_square)):
+            reach = np.zeros((count, size, size), dtype=bool)
+            reach[:, goal_row, :] = True
+            while True:
+                grown = reach.copy()
+                grown[:, 1:, :] |= reach[:, :-1, :] & open_rows
+                grown[:, :-1, :] |= reach[:, 1:, :] & open_rows
+                grown[:, :, 1:] |= reach[:, :, :-1] & open_columns
+                grown[:, :, :-1] |= reach[:, :, 1:] & open_columns
+                if np.array_equal(grown, reach):
+                    break
+                reach = grown
+            result[:, player_column] = reach.reshape(count, square_count)[index, pawn]
+        return result
+
+    def distance_maps(self):
+        """
+        Returns an (N, 2, square count) array with the number of steps from every square to P1's and P2's goal rows,
+        the same as QuoridorGame.get_distance_map, worked out for every game at once by a breadth first search from
+        the goal rows. Squares that can't reach a goal row get UNREACHABLE
+        """
+        count = self._game_count
+        size = self._size
+        open_rows = ~self.h_fences.reshape(count, size, size)[:, 1:, :]
+        open_columns = ~self.v_fences.reshape(count, size, size)[:, :, 1:]
+        distances = np.full((count, 2, size, size), UNREACHABLE, dtype=np.int32)
+        for player_column, goal_row in ((0, size - 1), (1, 0)):
+            reach = np.zeros((count, size, size), dtype=bool)
+            reach[:, goal_row, :] = True
+            frontier = reach.copy()
+            steps = 0
+            while frontier.any():
+                distances[:, player_column][frontier] = steps
+                steps += 1
+                grown = np.zeros_like(reach)
+                grown[:, 1:, :] |= frontier[:, :-1, :] & open_rows
+                grown[:, :-1, :] |= frontier[:, 1:, :] & open_rows
+                grown[:, :, 1:] |= frontier[:, :, :-1] & open_columns
+                grown[:, :, :-1] |= frontier[:, :, 1:] & open_columns
+                frontier = grown & ~reach
+                reach |= frontier
+        return distances.reshape(count, 2, self._square_count)
+
+    def step(self, actions):
+        """
+        Applies one compact action per game and returns a boolean array of which ones were legal. Illegal actions, and
+        actions for games that are already won, leave the game unchanged, the same way move_pawn and place_fence
+        return False. Pass -1 to skip a game
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        index = self._index
+        target = np.where(actions >= 0, actions >> 2, -1)
+        kind = actions & 3
+        p1_turn = self.turn_count % 2 == 1
+
+        pawn_ok = (kind == 0) & self.pawn_legal(target)
+        h_ok = (kind == 1) & self.fence_free(1, target)
+        v_ok = (kind == 2) & self.fence_free(2, target)
+        target = np.where(target >= 0, target, 0)
+
+        fencing = np.nonzero(h_ok | v_ok)[0]
+        if fencing.size:
+            h_after = self.h_fences[fencing]
+            v_after = self.v_fences[fencing]
+            h_after[np.arange(fencing.size), target[fencing]] |= h_ok[fencing]
+            v_after[np.arange(fencing.size), target[fencing]] |= v_ok[fencing]
+            after = self.has_paths(h_after, v_after, self.p1_square[fencing], self.p2_square[fencing])
+            closed = ~after.all(axis=1)
+            if closed.any():
+                #  A player who was already cut off doesn't stop other fences, so only count paths that were lost
+                suspects = fencing[closed]
+                before = self.has_paths(self.h_fences[suspects], self.v_fences[suspects],
+                                        self.p1_square[suspects], self.p2_square[suspects])
+                blocked = suspects[(before & ~after[closed]).any(axis=1)]
+                h_ok[blocked] = False
+                v_ok[blocked] = False
+
+        moved_1 = pawn_ok & p1_turn
+        moved_2 = pawn_ok & ~p1_turn
+        self.p1_square[moved_1] = target[moved_1]
+        self.p2_square[moved_2] = target[moved_2]
+        self.h_fences[index[h_ok], target[h_ok]] = True
+        self.v_fences[index[v_ok], target[v_ok]] = True
+        fenced = h_ok | v_ok
+        self.fences_left[fenced & p1_turn, 0] -= 1
+        self.fences_left[fenced & ~p1_turn, 1] -= 1
+
+        won_1 = moved_1 & (target // self._size == self._size - 1)
+        won_2 = moved_2 & (target // self._size == 0)
+        self.game_won |= won_1 | won_2
+        self.winner[won_1] = 1
+        self.winner[won_2] = 2
+        legal = pawn_ok | fenced
+        self.turn_count[legal] += 1
+        return legal
+
+    def action_mask(self):
+        """
+        Returns an (N, get_action_count()) boolean array of the actions that pass every check except the one against
+        cutting a player off, which is only run by step. Games that are over have no actions
+        """
+        squares = np.broadcast_to(np.arange(self._square_count), (self._game_count, self._square_count))
+        mask = np.zeros((self._game_count, self.get_action_count()), dtype=bool)
+        mask[:, 0::4] = self.pawn_legal(squares)
+        mask[:, 1::4] = self.fence_free(1, squares)
+        mask[:, 2::4] = self.fence_free(2, squares)
+        return mask
+
+    def random_actions(self, rng, fence_rate=None):
+        """
+        Picks one action per game uniformly from action_mask using a NumPy Generator, or -1 for games with no actions.
+        If fence_rate is given, each game places a fence with that probability (when it can) and moves its pawn
+        otherwise, with the action picked uniformly within that group
+        """
+        mask = self.action_mask()
+        weights = rng.random(mask.shape)
+        weights[~mask] = -1.0
+        if fence_rate is not None:
+            can_move = mask[:, 0::4].any(axis=1)
+            can_fence = mask[:, 1::4].any(axis=1) | mask[:, 2::4].any(axis=1)
+            fencing = ((rng.random(self._game_count) < fence_rate) & can_fence) | ~can_move
+            weights[:, 0::4][fencing] = -1.0
+            weights[:, 1::4][~fencing] = -1.0
+            weights[:, 2::4][~fencing] = -1.0
+        actions = np.argmax(weights, axis=1)
+        return np.where(weights.max(axis=1) >= 0, actions, -1)
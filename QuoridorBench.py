@@ -0,0 +1,483 @@
+# Description: Benchmarks for the Quoridor rules engine. Run with "python QuoridorBench.py" to time the hot paths: pawn
+#              moves of each kind, fence placement and its path check, win checks, whole random games on each
+#              board size, copying a position, drawing boards, journaling moves and perft. Results can be saved to JSON
+#              with --json and checked against a saved baseline with --compare, which flags any benchmark that got
+#              slower by more than the threshold.
+
+import argparse
+import copy
+import gc
+import io
+import json
+import pickle
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from Quoridor import BOARD_SIZE, QuoridorGame, _find_path
+from QuoridorJournal import MoveJournal
+from QuoridorPerft import perft
+from QuoridorRender import BoardRenderer
+
+SUITE_VERSION = 2  # Bump when a benchmark changes what it measures, so old baselines aren't compared against it
+ON_OFF_TARGET = 10.0  # Percent that switching something on, like the journal, may add to the result it's measured in
+
+
+def random_fence_game(seed):
+    """
+    Plays a game where both players only place fences at random, until they run out. Returns the list of accepted
+    placements as (player, "h" or "v", location) tuples, in order
+    """
+    rng = random.Random(seed)
+    game = QuoridorGame()
+    placements = []
+    attempts = 0
+    while game.get_fences_left(1) + game.get_fences_left(2) > 0 and attempts < 2000:
+        attempts += 1
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        v_or_h = rng.choice("hv")
+        target_location = (rng.randrange(BOARD_SIZE), rng.randrange(BOARD_SIZE))
+        if game.place_fence(player_integer, v_or_h, target_location) is True:
+            placements.append((player_integer, v_or_h, target_location))
+    return placements
+
+
+def crowded_games(games, seed):
+    """
+    Returns a list of games that have had a whole random fence game played on them
+    """
+    crowded = []
+    for index in range(games):
+        game = QuoridorGame()
+        for player_integer, v_or_h, target_location in random_fence_game(seed + index):
+            game.place_fence(player_integer, v_or_h, target_location)
+        crowded.append(game)
+    return crowded
+
+
+def time_per_call(function, calls):
+    """
+    Calls function calls times and returns the average time per call in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   Benchmarks
+#  Every benchmark returns a dictionary of result name -> microseconds per operation, so lower is always better.
+
+def bench_pawn_moves(calls=20000):
+    """
+    Times move_pawn for a single step, a jump, a diagonal move and a rejected move. Each legal move is taken back with
+    undo before the next call, so those results include one undo
+    """
+    step = QuoridorGame()
+    jump = QuoridorGame()
+    jump.load_position(31, 40, 0, 0, 10, 10, 1)  # P1 on e4 right behind P2 on e5
+    diagonal = QuoridorGame()
+    diagonal.load_position(31, 40, 1 << 49, 0, 10, 10, 1)  # Same, with a fence behind P2
+    results = {}
+    for name, game, target_location in (("step", step, (4, 1)), ("jump", jump, (4, 5)),
+                                        ("diagonal", diagonal, (3, 4))):
+        assert game.move_pawn(1, target_location) is True
+        game.undo()
+        results["move_pawn." + name] = time_per_call(lambda: game.move_pawn(1, target_location) and game.undo(),
+                                                     calls)
+    results["move_pawn.rejected"] = time_per_call(lambda: step.move_pawn(1, (0, 8)), calls)
+    return results
+
+
+def bench_place_fence(games=200, seed=1):
+    """
+    Replays recorded fence-only games and times each place_fence call, which includes the path check and repairing
+    both distance maps. The games are replayed a second time timing only fence_blocks_path before each placement, so
+    the report shows how much of a placement is the path check, and the rest is mostly the distance repair
+    """
+    recorded = [random_fence_game(seed + index) for index in range(games)]
+    placements = 0
+    elapsed = 0.0
+    check_elapsed = 0.0
+    for record in recorded:
+        game = QuoridorGame()
+        start = time.perf_counter()
+        for player_integer, v_or_h, target_location in record:
+            game.place_fence(player_integer, v_or_h, target_location)
+        elapsed += time.perf_counter() - start
+        placements += len(record)
+        game = QuoridorGame()  # A fresh copy, so the timed checks don't find paths cached by the placements above
+        for player_integer, v_or_h, target_location in record:
+            start = time.perf_counter()
+            game.fence_blocks_path(v_or_h, target_location)
+            check_elapsed += time.perf_counter() - start
+            game.place_fence(player_integer, v_or_h, target_location)
+    return {"place_fence.fence_game": elapsed / placements * 1e6,
+            "place_fence.path_check": check_elapsed / placements * 1e6}
+
+
+def bench_candidate_checks(games=50, seed=1):
+    """
+    Times fence_blocks_path on every free fence slot of crowded boards, which is what a search does when it looks at
+    every candidate fence. Also times a full path search for both players per candidate for comparison
+    """
+    checks = 0
+    elapsed = 0.0
+    naive_elapsed = 0.0
+    for game in crowded_games(games, seed):
+        candidates = []
+        for v_or_h in "hv":
+            for row in range(BOARD_SIZE):
+                for column in range(BOARD_SIZE):
+                    if game.already_fenced(v_or_h, (column, row)) is not True:
+                        candidates.append((v_or_h, (column, row)))
+        start = time.perf_counter()
+        for v_or_h, target_location in candidates:
+            game.fence_blocks_path(v_or_h, target_location)
+        elapsed += time.perf_counter() - start
+        h_fences, v_fences = game.get_fence_masks()
+        p1_square = game.get_pawn_square(1)
+        p2_square = game.get_pawn_square(2)
+        start = time.perf_counter()
+        for v_or_h, target_location in candidates:
+            square = (target_location[1] * BOARD_SIZE) + target_location[0]
+            h_after = h_fences | ((1 << square) if v_or_h == "h" else 0)
+            v_after = v_fences | ((1 << square) if v_or_h == "v" else 0)
+            _find_path(p1_square, BOARD_SIZE - 1, h_after, v_after)
+            _find_path(p2_square, 0, h_after, v_after)
+        naive_elapsed += time.perf_counter() - start
+        checks += len(candidates)
+    return {"fence_blocks_path.crowded": elapsed / checks * 1e6,
+            "fence_blocks_path.full_search": naive_elapsed / checks * 1e6}
+
+
+def bench_crowded_fences(games=50, seed=1, calls=200):
+    """
+    Times place_fence followed by undo on crowded boards, for a fence that is legal and for one that is rejected because
+    the slot is taken
+    """
+    legal_elapsed = rejected_elapsed = 0.0
+    for game in crowded_games(games, seed):
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        game.load_position(game.get_pawn_square(1), game.get_pawn_square(2), *game.get_fence_masks(), 10, 10,
+                           game.get_turn_count())  # Give both players their fences back
+        kind, target_location = [move for move in game.legal_moves(player_integer) if move[0] != "p"][0]
+        taken = game.get_fence_masks()[0]
+        taken_square = (taken & -taken).bit_length() - 1
+        taken_location = (taken_square % BOARD_SIZE, taken_square // BOARD_SIZE)
+        legal_elapsed += time_per_call(lambda: game.place_fence(player_integer, kind, target_location) and game.undo(),
+                                       calls)
+        rejected_elapsed += time_per_call(lambda: game.place_fence(player_integer, "h", taken_location), calls)
+    return {"place_fence.crowded_and_undo": legal_elapsed / games,
+            "place_fence.rejected": rejected_elapsed / games}
+
+
+def bench_is_winner(calls=50000):
+    """
+    Times is_winner for a pawn that hasn't reached its goal row
+    """
+    game = QuoridorGame()
+    return {"is_winner": time_per_call(lambda: game.is_winner(1), calls)}
+
+
+def bench_random_games(games=40, seed=1, board_size=BOARD_SIZE):
+    """
+    Plays whole games of uniformly random legal moves and returns the cost per move and per game
+    """
+    rng = random.Random(seed)
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(games):
+        game = QuoridorGame(board_size)
+        while game.get_game_won() is not True and game.get_turn_count() < 400:
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            legal = game.legal_moves(player_integer, compact=True)
+            if len(legal) == 0:
+                break
+            game.apply(legal[rng.randrange(len(legal))])
+            moves += 1
+    elapsed = (time.perf_counter() - start) * 1e6
+    return {"random_game.per_move": elapsed / moves, "random_game.per_game": elapsed / games}
+
+
+def bench_board_sizes(games=20, seed=1):
+    """
+    Plays random games on boards from 7x7 to 13x13 and returns the cost per move on each, which should stay about the
+    same as the board grows
+    """
+    results = {}
+    for board_size in (7, 11, 13):
+        timings = bench_random_games(games, seed, board_size)
+        results["board_%d.per_move" % board_size] = timings["random_game.per_move"]
+    return results
+
+
+def bench_position_copy(games=20, seed=1, calls=200):
+    """
+    Times the ways of copying a crowded position: deepcopy, a pickle round trip, a to_bytes/from_bytes round trip and
+    an immutable snapshot
+    """
+    results = {"copy.deepcopy": 0.0, "copy.pickle": 0.0, "copy.bytes": 0.0, "copy.snapshot": 0.0}
+    for game in crowded_games(games, seed):
+        results["copy.deepcopy"] += time_per_call(lambda: copy.deepcopy(game), calls // 10)
+        results["copy.pickle"] += time_per_call(lambda: pickle.loads(pickle.dumps(game)), calls)
+        results["copy.bytes"] += time_per_call(lambda: QuoridorGame.from_bytes(game.to_bytes()), calls)
+        results["copy.snapshot"] += time_per_call(game.make_snapshot, calls)
+    return {name: total / games for name, total in results.items()}
+
+
+def bench_snapshot_moves(games=20, seed=1, calls=2000):
+    """
+    Times a pawn step and its undo on crowded positions with snapshot publishing off and on, which shows what
+    publishing adds to every move
+    """
+    results = {"snapshot.step_undo_off": 0.0, "snapshot.step_undo_on": 0.0}
+    for game in crowded_games(games, seed):
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        step = game.legal_moves(player_integer, compact=True)[0]
+
+        def step_and_undo():
+            game.apply(step)
+            game.undo()
+        results["snapshot.step_undo_off"] += time_per_call(step_and_undo, calls)
+        game.enable_snapshots()
+        results["snapshot.step_undo_on"] += time_per_call(step_and_undo, calls)
+        game.disable_snapshots()
+    return {name: total / games for name, total in results.items()}
+
+
+def bench_render(games=20, seed=1, calls=200):
+    """
+    Times drawing crowded positions: a full frame, a diff after a pawn step (the time includes making and taking back
+    the step), and drawing many games into one stream, per game
+    """
+    renderer = BoardRenderer()
+    results = {"render.full": 0.0, "render.diff": 0.0}
+    crowded = crowded_games(games, seed)
+    for game in crowded:
+        results["render.full"] += time_per_call(lambda: renderer.render(game), calls)
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        step = game.legal_moves(player_integer, compact=True)[0]
+        renderer.reset_diff()
+        renderer.render_diff(game)
+
+        def step_and_diff():
+            game.apply(step)
+            renderer.render_diff(game)
+            game.undo()
+            renderer.render_diff(game)
+        results["render.diff"] += time_per_call(step_and_diff, calls) / 2
+    results = {name: total / games for name, total in results.items()}
+    stream = io.BytesIO()
+    results["render.bulk"] = time_per_call(lambda: renderer.render_many(crowded, stream), calls // 10) / games
+    return results
+
+
+def bench_journal_moves(games=40, seed=1, commit_every=256, commits=20, rounds=6):
+    """
+    Replays random games through apply without a journal and with every game attached to one, passing each move to
+    record_move the way the server does and committing every commit_every moves. Returns the cost per move of each,
+    and separately the cost of one commit synced to disk, which the server pays once per pass of its event loop however
+    many moves arrived in it. The games are played out first, so only making the moves is timed
+
+    The journal is held to ON_OFF_TARGET rather than a few percent. It measures 6 to 9% on against off, of which
+    about 2% shows up with nothing journaled at all and is the bench itself, and the rest is record_move's two appends
+    and the packing and write at each commit, against a move that costs 6 to 9 us
+    """
+    rng = random.Random(seed)
+    move_lists = []
+    for _ in range(games):
+        game = QuoridorGame()
+        moves = []
+        while game.get_game_won() is not True and game.get_turn_count() < 400:
+            legal = game.legal_moves(1 if game.get_turn_count() % 2 != 0 else 2, compact=True)
+            if len(legal) == 0:
+                break
+            moves.append(legal[rng.randrange(len(legal))])
+            game.apply(moves[-1])
+        move_lists.append(moves)
+    move_count = sum(len(moves) for moves in move_lists)
+
+    def replay(journal, run, off_times, on_times):
+        #  Two copies of every game take each ply in turn, one copy without the journal and one with it, so a pause
+        #  of the machine lands in one ply of one of them instead of a whole run. Each ply keeps its fastest time over
+        #  all the rounds, and which copy is made first and plays first swaps over, so neither gets the better of it
+        if run % 2 == 0:
+            off_games = [QuoridorGame() for _ in move_lists]
+            on_games = [QuoridorGame() for _ in move_lists]
+        else:
+            on_games = [QuoridorGame() for _ in move_lists]
+            off_games = [QuoridorGame() for _ in move_lists]
+        for session_id, game in enumerate(on_games, 1):
+            journal.attach(session_id, game)
+        journal.commit()
+
+        def play(games, ply, journal=None):
+            #  Both copies go through the same loop, so the only difference between them is the journal
+            for session_id, (game, moves) in enumerate(zip(games, move_lists), 1):
+                if ply < len(moves):
+                    game.apply(moves[ply])
+                    if journal is not None:
+                        journal.record_move(session_id, moves[ply])
+            if journal is not None and journal.get_pending_count() >= commit_every:
+                journal.commit()
+
+        gc.collect()  # Games left over from the last round are cleared first, so no ply pays for them
+        for ply in range(len(off_times)):  # Every game moves in turn, as on a busy server
+            turns = ((off_games, None, off_times), (on_games, journal, on_times))
+            for games, playing_journal, times in turns[::1 if (ply + run) % 2 == 0 else -1]:
+                start = time.perf_counter()
+                play(games, ply, playing_journal)
+                times[ply] = min(times[ply], time.perf_counter() - start)
+        journal.commit()
+
+    plies = max(len(moves) for moves in move_lists)
+    off_times = [float("inf")] * plies
+    on_times = [float("inf")] * plies
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        #  The journal leaves out the fsync, so the per move figure is what the moves themselves cost and not the disk
+        for run in range(rounds):
+            with MoveJournal("%s/moves-%d.journal" % (directory, run), sync=False) as journal:
+                journal.open()
+                replay(journal, run, off_times, on_times)
+        results["journal.per_move_off"] = sum(off_times) * 1e6 / move_count
+        results["journal.per_move_on"] = sum(on_times) * 1e6 / move_count
+        with MoveJournal(directory + "/synced.journal") as journal:
+            journal.open()
+            journal.attach(1, QuoridorGame())
+            journal.commit()
+
+            def synced_commit():
+                journal.record_result(1, 0)
+                journal.commit()
+
+            results["journal.per_commit"] = time_per_call(synced_commit, commits)
+    return results
+
+
+def bench_perft(depth=2, runs=5):
+    """
+    Runs perft from the standard starting position and returns the cost per node counted, the inverse of the perft
+    nodes per second
+    """
+    game = QuoridorGame()
+    nodes = perft(game, depth)
+    return {"perft.per_node": time_per_call(lambda: perft(game, depth), runs) / nodes}
+
+
+BENCHMARKS = (bench_pawn_moves, bench_place_fence, bench_candidate_checks, bench_crowded_fences, bench_is_winner,
+              bench_random_games, bench_board_sizes, bench_position_copy, bench_snapshot_moves,
+              bench_render, bench_journal_moves, bench_perft)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                               Running and Comparing
+
+def run_suite(repeat=3, quick=False):
+    """
+    Runs every benchmark repeat times and keeps the fastest time for each result, which is the one least disturbed by
+    whatever else the machine was doing. quick cuts the work of each benchmark down for a fast check. Returns the
+    report as a dictionary ready to be saved as JSON
+    """
+    results = {}
+    for benchmark in BENCHMARKS:
+        for _ in range(repeat):
+            if quick:
+                timings = benchmark(**quick_arguments(benchmark))
+            else:
+                timings = benchmark()
+            for name, value in timings.items():
+                results[name] = min(value, results.get(name, value))
+    return {"suite_version": SUITE_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "quick": quick,
+            "results_us": results}
+
+
+def quick_arguments(benchmark):
+    """
+    Returns smaller arguments for a benchmark, used by the --quick option: a tenth of its own default number of calls
+    and games, so every benchmark is cut down by the same amount
+    """
+    names = benchmark.__code__.co_varnames[:benchmark.__code__.co_argcount]
+    defaults = dict(zip(names[len(names) - len(benchmark.__defaults__ or ()):], benchmark.__defaults__ or ()))
+    return {name: max(1, defaults[name] // 10) for name in ("calls", "games") if name in defaults}
+
+
+def compare_reports(baseline, current, threshold=0.10):
+    """
+    Compares two reports and returns a list of (name, baseline us, current us, change) tuples, sorted by name, plus the
+    list of names that got slower by more than threshold (a fraction, so 0.10 is 10%)
+    """
+    rows = []
+    regressions = []
+    old_results = baseline["results_us"]
+    new_results = current["results_us"]
+    for name in sorted(set(old_results) & set(new_results)):
+        old = old_results[name]
+        new = new_results[name]
+        change = (new - old) / old if old > 0 else 0.0
+        rows.append((name, old, new, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_report(report):
+    """
+    Prints the results of a report, one per line. A result measured with something switched off and on, such as
+    journal.per_move_off and journal.per_move_on, is followed by how much switching it on adds
+    """
+    results = report["results_us"]
+    for name, value in sorted(results.items()):
+        print("%-32s %10.2f us" % (name, value))
+        if name.endswith("_on") and results.get(name[:-3] + "_off"):
+            off = results[name[:-3] + "_off"]
+            print("%-32s %+10.1f %%  on against off, target %+.0f %%" % (name[:-3], (value - off) / off * 100,
+                                                                          ON_OFF_TARGET))
+
+
+def main():
+    """
+    Runs the suite from the command line. Exits with status 1 when --compare finds a regression
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks for the Quoridor rules engine")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="compare against a baseline saved with --json")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the fastest is kept")
+    parser.add_argument("--quick", action="store_true", help="do less work per benchmark")
+    arguments = parser.parse_args()
+
+    report = run_suite(arguments.repeat, arguments.quick)
+    if arguments.json:
+        with open(arguments.json, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if not arguments.compare:
+        print_report(report)
+        return
+    with open(arguments.compare) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("suite_version") != SUITE_VERSION:
+        print("baseline is from suite version %s, this is version %d" % (baseline.get("suite_version"), SUITE_VERSION))
+    if baseline.get("quick") != report["quick"]:
+        print("warning: comparing a --quick run against a full one")
+    rows, regressions = compare_reports(baseline, report, arguments.threshold)
+    for name, old, new, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print("%-32s %10.2f -> %10.2f us  %+6.1f%%%s" % (name, old, new, change * 100, flag))
+    if regressions:
+        print("%d of %d benchmarks got more than %.0f%% slower" % (len(regressions), len(rows),
+                                                                 arguments.threshold * 100))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
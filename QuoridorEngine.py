@@ -0,0 +1,316 @@
+# Description: Move search for QuoridorGame. Holds the transposition table used to remember positions that have
+#              already been searched, keyed by the game's Zobrist hash, and an alpha-beta engine that picks a move
+#              within a fixed time budget.
+
+import time
+from array import array
+
+from Quoridor import H_FENCE, PAWN_MOVE, UNREACHABLE, V_FENCE, decode_move
+from QuoridorTablebase import LOSS, WIN, Tablebase
+
+WIN_SCORE = 100000  # Score for a won position, less one point per ply it takes to get there
+
+
+class TranspositionTable:
+    """
+    Fixed size table of search results keyed by position hash. Each hash maps to one slot, and when two positions want
+    the same slot the one searched to the greater depth is kept. The table never grows past the memory cap it is
+    created with
+    """
+
+    EXACT = 0  # The stored value is the exact score of the position
+    LOWER = 1  # The search failed high, so the real score is at least the stored value
+    UPPER = 2  # The search failed low, so the real score is at most the stored value
+    ENTRY_BYTES = 16  # 8 byte key, 4 byte value, 2 byte move, 1 byte depth and 1 byte flag
+
+    def __init__(self, memory_bytes=16 * 1024 * 1024):
+        """
+        Creates an empty table using at most memory_bytes of storage. The number of slots is rounded down to a power
+        of two so that a slot can be picked by masking the hash
+        """
+        slots = 1
+        while slots * 2 * self.ENTRY_BYTES <= memory_bytes:
+            slots *= 2
+        self._mask = slots - 1
+        self._keys = array("Q", bytes(8 * slots))
+        self._values = array("i", bytes(4 * slots))
+        self._moves = array("H", bytes(2 * slots))
+        self._depths = array("b", b"\xff" * slots)  # A depth of -1 marks an empty slot
+        self._flags = array("B", bytes(slots))
+        self._hits = 0
+        self._probes = 0
+
+    def get_slot_count(self):
+        """
+        Returns the number of entries the table can hold
+        """
+        return self._mask + 1
+
+    def get_memory_bytes(self):
+        """
+        Returns the number of bytes used by the table's storage
+        """
+        return (self._mask + 1) * self.ENTRY_BYTES
+
+    def get_hit_rate(self):
+        """
+        Returns the fraction of probes that found their position in the table
+        """
+        if self._probes == 0:
+            return 0.0
+        return self._hits / self._probes
+
+    def probe(self, position_hash):
+        """
+        Looks a position up. Returns a (depth, value, flag, move) tuple, or None if the position isn't in the table
+        """
+        self._probes += 1
+        index = position_hash & self._mask
+        if self._depths[index] < 0 or self._keys[index] != position_hash:
+            return None
+        self._hits += 1
+        return self._depths[index], self._values[index], self._flags[index], self._moves[index]
+
+    def store(self, position_hash, depth, value, flag, move=0):
+        """
+        Saves a search result. An entry for a different position is only replaced if the new result was searched at
+        least as deep, and an entry for the same position is always replaced
+        """
+        index = position_hash & self._mask
+        if self._keys[index] != position_hash and self._depths[index] > depth:
+            return False
+        self._keys[index] = position_hash
+        self._values[index] = value
+        self._moves[index] = move
+        self._depths[index] = min(depth, 127)
+        self._flags[index] = flag
+        return True
+
+    def clear(self):
+        """
+        Empties the table without giving its memory back
+        """
+        slots = self._mask + 1
+        self._keys = array("Q", bytes(8 * slots))
+        self._depths = array("b", b"\xff" * slots)
+        self._hits = 0
+        self._probes = 0
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget for a move has run out
+    """
+
+
+class AlphaBetaEngine:
+    """
+    Negamax alpha-beta search with iterative deepening and a hard time limit per move. Positions are scored from the
+    difference between the two players' shortest paths to their goal rows and the fences they have left. Once both
+    players are out of fences, positions are looked up in the endgame tablebase instead of searched. A new fence
+    layout is only solved at the root when the solve fits in the time left, and the search itself only uses layouts
+    that are already solved
+    """
+
+    def __init__(self, time_limit=0.1, max_depth=64, fence_weight=40, memory_bytes=16 * 1024 * 1024,
+                 tablebase_layouts=16):
+        """
+        Creates an engine that spends at most time_limit seconds per move. fence_weight is how many points a fence in
+        hand is worth, where one step of path length is worth 100 points. tablebase_layouts is how many solved fence
+        layouts the tablebase keeps, and 0 turns the tablebase off
+        """
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._fence_weight = fence_weight
+        self._table = TranspositionTable(memory_bytes)
+        self._tablebase = Tablebase(tablebase_layouts) if tablebase_layouts > 0 else None
+        self._deadline = 0.0
+        self._nodes = 0
+        self._root_move = None
+
+    def get_table(self):
+        """
+        Returns the engine's transposition table
+        """
+        return self._table
+
+    def choose_move(self, game):
+        """
+        Returns the best move found for the side to move as a (kind, target location) tuple, or None if that side has
+        no legal moves
+        """
+        move = self.search(game)[0]
+        if move is None:
+            return None
+        return decode_move(move, game.get_board_size())
+
+    def search(self, game, time_limit=None):
+        """
+        Searches the position one ply deeper at a time until the time runs out. Returns a (compact move, score, depth,
+        nodes) tuple for the deepest search that finished. The game is left exactly as it was passed in
+        """
+        if time_limit is None:
+            time_limit = self._time_limit
+        self._deadline = time.perf_counter() + time_limit
+        self._nodes = 0
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        root_moves = game.legal_moves(player_integer, compact=True)
+        if len(root_moves) == 0:
+            return None, 0, 0, 0
+        if self._tablebase is not None and self._tablebase.covers(game):
+            #  A solve can't be interrupted, so a new layout is only solved if it fits in what is left of the budget.
+            #  Otherwise the position is searched like any other
+            remaining = self._deadline - time.perf_counter()
+            solve = remaining > self._tablebase.estimate_solve_seconds(game.get_board_size())
+            move = self._tablebase.best_move(game, solve)
+            if move is not None:
+                return move, self.negamax(game, 0, -WIN_SCORE - 1, WIN_SCORE + 1, 0), 0, 1
+        best_move = root_moves[0]
+        best_score = 0
+        finished_depth = 0
+        undo_count = game.get_undo_count()
+        for depth in range(1, self._max_depth + 1):
+            self._root_move = None
+            try:
+                score = self.negamax(game, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+            except SearchTimeout:
+                while game.get_undo_count() > undo_count:
+                    game.undo()
+                break
+            if self._root_move is not None:
+                best_move = self._root_move
+            best_score = score
+            finished_depth = depth
+            if abs(score) >= WIN_SCORE - self._max_depth:
+                break  # Found a forced win or loss, searching deeper won't change it
+        return best_move, best_score, finished_depth, self._nodes
+
+    def evaluate(self, game):
+        """
+        Scores the position for the side to move: being closer to the goal row than the opponent and having more
+        fences left are both good
+        """
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        own_length = game.get_shortest_path_length(player_integer)
+        other_length = game.get_shortest_path_length(3 - player_integer)
+        own_fences = game.get_fences_left(player_integer)
+        other_fences = game.get_fences_left(3 - player_integer)
+        if own_length == UNREACHABLE or other_length == UNREACHABLE:
+            return 0
+        #  Fences only matter while there is still a race to slow down, so they count for less near the end
+        return (100 * (other_length - own_length) + 50 +
+                self._fence_weight * (own_fences - other_fences) * min(own_length + other_length, 10) // 10)
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """
+        Returns the score of the position for the side to move, searching depth plies ahead
+        """
+        self._nodes += 1
+        if time.perf_counter() > self._deadline and ply > 0:
+            raise SearchTimeout()
+        if game.get_game_won() is True:
+            return -(WIN_SCORE - ply)  # The player who just moved reached their goal row
+        if self._tablebase is not None and self._tablebase.covers(game):
+            probe = self._tablebase.probe(game, solve=False)  # Only layouts already solved, never a solve mid-search
+            if probe is not None:
+                result, plies = probe
+                if result == WIN:
+                    return WIN_SCORE - (ply + plies)
+                if result == LOSS:
+                    return -(WIN_SCORE - (ply + plies))
+                return 0
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        if depth == 0:
+            return self.evaluate(game)
+
+        position_hash = game.get_hash()
+        original_alpha = alpha
+        table_move = None
+        entry = self._table.probe(position_hash)
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            value = self.score_from_table(value, ply)
+            if entry_depth >= depth and ply > 0:  # The root always searches, so it has a move to report
+                if flag == TranspositionTable.EXACT:
+                    return value
+                if flag == TranspositionTable.LOWER and value >= beta:
+                    return value
+                if flag == TranspositionTable.UPPER and value <= alpha:
+                    return value
+
+        moves = self.ordered_moves(game, player_integer, table_move)
+        if not moves:
+            return 0  # The pawn is boxed in and can't place a fence, so nobody can make progress
+        best_score = -WIN_SCORE - 1
+        best_move = moves[0]
+        for move in moves:
+            if game.apply(move) is not True:
+                continue
+            score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            game.undo()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self._root_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self._table.store(position_hash, depth, self.score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    @staticmethod
+    def score_to_table(score, ply):
+        """
+        Win and loss scores count plies from the root, so they are stored counting from the position itself instead
+        """
+        if score >= WIN_SCORE - 1000:
+            return score + ply
+        if score <= -WIN_SCORE + 1000:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score, ply):
+        """
+        Turns a stored win or loss score back into one counted from the root
+        """
+        if score >= WIN_SCORE - 1000:
+            return score - ply
+        if score <= -WIN_SCORE + 1000:
+            return score + ply
+        return score
+
+    def ordered_moves(self, game, player_integer, table_move):
+        """
+        Lists the moves worth searching, best first. Pawn moves are sorted by how much they shorten the player's own
+        path. Only fences across the opponent's shortest path are searched, sorted so that the ones closest to the
+        opponent's pawn come first. The move from the transposition table, if any, is always tried first
+        """
+        scored = []
+        for square in game.get_pawn_targets(player_integer):
+            scored.append((game.get_distance(player_integer, square) * 2, (square << 2) | PAWN_MOVE))
+        if game.get_fences_left(player_integer) > 0:
+            path = game.get_shortest_path(3 - player_integer)
+            if path is not None:
+                h_free, v_free = game.legal_fence_masks(player_integer)
+                for kind, mask in ((H_FENCE, h_free & path[1]), (V_FENCE, v_free & path[2])):
+                    while mask:
+                        bit = mask & -mask
+                        mask ^= bit
+                        square = bit.bit_length() - 1
+                        scored.append((1 - game.get_distance(3 - player_integer, square) * 2, (square << 2) | kind))
+        scored.sort()
+        moves = [move for _, move in scored]
+        if table_move is not None and table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+        return moves
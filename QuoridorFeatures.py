@@ -0,0 +1,281 @@
+# Description: Turns Quoridor positions into NumPy feature planes for training evaluation networks. Positions go
+#              through QuoridorBatch in blocks, so each plane is written for the whole block at once straight into a
+#              preallocated array instead of one position at a time. ShardWriter streams positions from games, position
+#              stores or game records out to numbered .npy shards, keeping only one shard in memory.
+#
+#              Run "python QuoridorFeatures.py input output_directory [--derived] [--shard-size N]", where input is a
+#              position store or a file of game records.
+
+import argparse
+import os
+
+import numpy as np
+
+from Quoridor import BOARD_SIZE, QuoridorGame, encode_move, get_geometry
+from QuoridorBatch import QuoridorBatch
+from QuoridorRecords import parse_move, read_records, winner_of
+from QuoridorStore import PositionStore
+
+#  Planes of every position, each board_size x board_size. Fence counts and the side to move fill their whole plane
+PLANE_NAMES = ("p1_pawn", "p2_pawn", "h_fences", "v_fences", "p1_fences_left", "p2_fences_left", "p1_to_move")
+#  Planes added with derived=True: the steps from each square to each player's goal row (the value under a pawn is its
+#  shortest path length), with squares that can't get there set to the number of squares on the board, and the squares
+#  the pawn of the player to move can step to (their count is the pawn's mobility)
+DERIVED_PLANE_NAMES = ("p1_distance", "p2_distance", "pawn_targets")
+
+
+class FeatureExtractor:
+    """
+    Writes the feature planes of blocks of positions into arrays of shape (positions, planes, board_size, board_size)
+    """
+
+    def __init__(self, board_size=BOARD_SIZE, derived=False, dtype=np.uint8):
+        """
+        Sets up planes for one board size. derived adds the distance and pawn target planes, which cost a search per
+        block. Every value fits in uint8, the default dtype
+        """
+        get_geometry(board_size)  # Raises ValueError for a size QuoridorGame doesn't support
+        self._size = board_size
+        self._derived = derived
+        self._dtype = np.dtype(dtype)
+        self._plane_names = PLANE_NAMES + (DERIVED_PLANE_NAMES if derived else ())
+
+    def get_board_size(self):
+        """
+        Returns the size of board the extractor is for
+        """
+        return self._size
+
+    def get_plane_names(self):
+        """
+        Returns the names of the planes in order
+        """
+        return self._plane_names
+
+    def allocate(self, count):
+        """
+        Returns an empty array for count positions
+        """
+        return np.empty((count, len(self._plane_names), self._size, self._size), dtype=self._dtype)
+
+    def extract(self, batch, out=None, start=0):
+        """
+        Writes the planes of every game in a QuoridorBatch into out[start:start + N], allocating out if it isn't given,
+        and returns out. Every value in those rows is overwritten, so out can be reused from block to block
+        """
+        if batch.get_board_size() != self._size:
+            raise ValueError("this extractor is for %dx%d boards" % (self._size, self._size))
+        count = batch.get_game_count()
+        if out is None:
+            out = self.allocate(start + count)
+        square_count = self._size * self._size
+        planes = out[start:start + count].reshape(count, len(self._plane_names), square_count)
+        index = np.arange(count)
+        planes[:, 0:2] = 0
+        planes[index, 0, batch.p1_square] = 1
+        planes[index, 1, batch.p2_square] = 1
+        planes[:, 2] = batch.h_fences
+        planes[:, 3] = batch.v_fences
+        planes[:, 4] = batch.fences_left[:, 0, None]
+        planes[:, 5] = batch.fences_left[:, 1, None]
+        planes[:, 6] = (batch.turn_count % 2 == 1)[:, None]
+        if self._derived:
+            planes[:, 7:9] = np.minimum(batch.distance_maps(), square_count)
+            squares = np.broadcast_to(np.arange(square_count), (count, square_count))
+            planes[:, 9] = batch.pawn_legal(squares)
+        return out
+
+    def from_games(self, games, out=None, start=0):
+        """
+        Writes the planes of a list of QuoridorGame objects, like extract
+        """
+        return self.extract(QuoridorBatch.from_games(games), out, start)
+
+    def from_records(self, data, out=None, start=0):
+        """
+        Writes the planes of positions packed back to back by QuoridorGame.to_bytes, like extract
+        """
+        return self.extract(QuoridorBatch.from_records(data, self._size), out, start)
+
+
+class ShardWriter:
+    """
+    Collects positions and writes them out in shards of shard_size. Shard n is made of three files in the directory:
+    prefix-n-planes.npy with the feature planes, prefix-n-outcome.npy with the result of the game for the player to
+    move (1 won, -1 lost, 0 not known) and prefix-n-move.npy with the compact move played from the position (-1 if not
+    known). Positions are held packed until a shard fills up, and the planes of every shard are written into the same
+    preallocated array
+    """
+
+    def __init__(self, directory, extractor, shard_size=16384, prefix="shard"):
+        """
+        Creates the directory if needed and sets up an empty shard
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._extractor = extractor
+        self._shard_size = shard_size
+        self._prefix = prefix
+        self._record_bytes = get_geometry(extractor.get_board_size()).position_bytes
+        self._positions = bytearray()
+        self._winners = np.zeros(shard_size, dtype=np.int8)
+        self._moves = np.full(shard_size, -1, dtype=np.int16)
+        self._planes = extractor.allocate(shard_size)
+        self._count = 0
+        self._shard_count = 0
+        self._position_count = 0
+
+    def get_shard_count(self):
+        """
+        Returns the number of shards written so far
+        """
+        return self._shard_count
+
+    def get_position_count(self):
+        """
+        Returns the number of positions added so far, written or not
+        """
+        return self._position_count
+
+    def add(self, game, winner=0, move=-1):
+        """
+        Adds a game's current position, with the player who went on to win the game (0 if not known) and the compact
+        move played from it
+        """
+        if game.get_board_size() != self._extractor.get_board_size():
+            raise ValueError("the shards are for %dx%d boards" % (self._extractor.get_board_size(),
+                                                                    self._extractor.get_board_size()))
+        self.add_packed(game.to_bytes(), winner, move)
+
+    def add_packed(self, position, winner=0, move=-1):
+        """
+        Adds one position packed by QuoridorGame.to_bytes, like add
+        """
+        self._positions += position
+        self._winners[self._count] = winner
+        self._moves[self._count] = move
+        self._count += 1
+        self._position_count += 1
+        if self._count == self._shard_size:
+            self.flush()
+
+    def add_records(self, data):
+        """
+        Adds positions packed back to back by QuoridorGame.to_bytes, such as the records of a position store, with no
+        outcome or move
+        """
+        record_bytes = self._record_bytes
+        if len(data) % record_bytes != 0:
+            raise ValueError("data is not a whole number of %d byte positions" % record_bytes)
+        data = memoryview(data)
+        while len(data):
+            room = (self._shard_size - self._count) * record_bytes
+            self._positions += data[:room]
+            taken = min(len(data), room) // record_bytes
+            self._count += taken
+            self._position_count += taken
+            data = data[room:]
+            if self._count == self._shard_size:
+                self.flush()
+
+    def add_record(self, tokens, fences_per_player=10):
+        """
+        Replays one game record (a list of move tokens, see QuoridorRecords) and adds the position before every move,
+        labelled with the move and the game's winner. A record with a bad or illegal move is left out. Returns True if
+        the record was added
+        """
+        board_size = self._extractor.get_board_size()
+        game = QuoridorGame(board_size, fences_per_player)
+        positions = []
+        moves = []
+        for token in tokens:
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            try:
+                kind, target_location = parse_move(token, board_size)
+            except ValueError:
+                return False
+            position = game.to_bytes()
+            if kind == "p":
+                legal = game.move_pawn(player_integer, target_location)
+            else:
+                legal = game.place_fence(player_integer, kind, target_location)
+            if legal is not True:
+                return False
+            positions.append(position)
+            moves.append(encode_move(kind, target_location, board_size))
+        winner = winner_of(game)
+        for position, move in zip(positions, moves):
+            self.add_packed(position, winner, move)
+        return True
+
+    def flush(self):
+        """
+        Writes the positions collected so far as the next shard, if there are any
+        """
+        count = self._count
+        if count == 0:
+            return
+        batch = QuoridorBatch.from_records(self._positions, self._extractor.get_board_size())
+        self._extractor.extract(batch, self._planes)
+        to_move = np.where(batch.turn_count % 2 == 1, 1, 2)
+        winners = self._winners[:count]
+        outcome = np.where(winners == 0, 0, np.where(winners == to_move, 1, -1)).astype(np.int8)
+        name = os.path.join(self._directory, "%s-%05d" % (self._prefix, self._shard_count))
+        np.save(name + "-planes.npy", self._planes[:count])
+        np.save(name + "-outcome.npy", outcome)
+        np.save(name + "-move.npy", self._moves[:count])
+        self._shard_count += 1
+        self._positions = bytearray()
+        self._winners[:] = 0
+        self._moves[:] = -1
+        self._count = 0
+
+    def close(self):
+        """
+        Writes the last, partly filled shard
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+def main():
+    """
+    Writes the positions of a position store, or every position of a file of game records, out as shards
+    """
+    parser = argparse.ArgumentParser(description="Write Quoridor positions out as NumPy feature shards")
+    parser.add_argument("input", help="a position store or a file of game records")
+    parser.add_argument("directory", help="where to write the shards")
+    parser.add_argument("--derived", action="store_true", help="add the distance and pawn target planes")
+    parser.add_argument("--shard-size", type=int, default=16384, help="positions per shard")
+    parser.add_argument("--board-size", type=int, default=BOARD_SIZE, help="board size of a file of game records")
+    arguments = parser.parse_args()
+
+    try:
+        store = PositionStore(arguments.input)
+    except ValueError:
+        store = None  # Not a position store, so read it as game records
+    skipped = 0
+    if store is not None:
+        with store:
+            extractor = FeatureExtractor(store.get_board_size(), arguments.derived)
+            with ShardWriter(arguments.directory, extractor, arguments.shard_size) as writer:
+                writer.add_records(store.get_records())
+    else:
+        extractor = FeatureExtractor(arguments.board_size, arguments.derived)
+        with ShardWriter(arguments.directory, extractor, arguments.shard_size) as writer:
+            with open(arguments.input) as lines:
+                for line_number, tokens in read_records(lines):
+                    if not writer.add_record(tokens):
+                        skipped += 1
+    print("%d positions in %d shards, %d records skipped" % (writer.get_position_count(), writer.get_shard_count(),
+                                                             skipped))
+
+
+if __name__ == "__main__":
+    main()
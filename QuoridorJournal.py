@@ -0,0 +1,423 @@
+# Description: Append-only journal of the moves made in many QuoridorGame sessions, so they can be recovered after a
+#              crash. Each session starts with a snapshot of its position and then gets every successful move, which
+#              whoever makes the move passes to record_move. Undos and loaded positions are picked up by a listener on
+#              the game and written as new snapshots. Moves are kept as plain integers until the next commit packs the
+#              run of them into one record, and every record is written with a single fsync per commit, so every
+#              session that moved since the last commit shares it. Opening a journal replays it to recover every
+#              session and then compacts it into one snapshot per session, which is also done whenever the file has
+#              grown large, so replay stays short.
+#
+#              The file is a header followed by one batch per commit: a CRC-32 and the length of the batch's records,
+#              then the records themselves, each one the session id, the record type and the payload length, then the
+#              payload. Checking the CRC once per batch keeps a move down to adding two integers to a list, and makes
+#              commits all or nothing: a batch that is cut short or fails its CRC ends the journal, as it can only be
+#              the tail of a commit that never finished.
+
+import functools
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from Quoridor import QuoridorGame
+
+JOURNAL_MAGIC = b"QJNL"
+JOURNAL_VERSION = 3
+JOURNAL_HEADER = struct.Struct("<4sH")  # Magic, version
+BATCH_HEADER = struct.Struct("<II")  # CRC-32 of the batch's records, their length in bytes
+RECORD_HEADER = struct.Struct("<IBH")  # Session id, record type, payload length
+
+#  Record types
+SNAPSHOT = 1  # Payload: board size, fences per player, then the position packed with to_bytes
+MOVE = 2  # Payload: a run of moves from any sessions, see MOVE_ARRAYS. The record's own session id is 0
+RESULT = 3  # Payload: the winner of the session, which may have been decided off the board, for example by resigning
+CLOSE = 4  # No payload, the session is gone
+SNAPSHOT_HEADER = struct.Struct("<BB")
+RESULT_PAYLOAD = struct.Struct("<B")
+#  A move record holds the session ids of its moves as little-endian uint32s, then the compact moves themselves as
+#  uint16s in the same order, which are replayed with apply. Laying them out as two arrays lets a commit pack them
+#  straight from array objects instead of one struct call per move
+MOVE_ARRAYS = ("I", "H")
+MOVE_BYTES = 6  # Bytes per move in a move record
+MOVES_PER_RECORD = 0xFFFF // MOVE_BYTES  # As many as fit in the payload length
+
+COMPACT_BYTES = 16 * 1024 * 1024  # The journal is compacted once it grows past this and twice its compacted size
+
+
+class MoveJournal:
+    """
+    Journal for a set of sessions, each one a QuoridorGame under a session id. Records are only in memory until commit
+    is called, so whoever makes the moves decides how many of them share one fsync
+    """
+
+    def __init__(self, path, sync=True, compact_bytes=COMPACT_BYTES):
+        """
+        Sets up a journal at path. Nothing is read or written until open is called. sync=False leaves out the fsync,
+        which keeps the data safe if the process dies but not if the machine does
+        """
+        self._path = path
+        self._sync = sync
+        self._compact_bytes = compact_bytes
+        self._games = {}  # Session id -> game
+        self._winners = {}  # Session id -> winner recorded with record_result
+        self._listeners = {}  # Session id -> the listener added to its game
+        self._buffer = bytearray()
+        self._pending = 0  # Records in the buffer
+        self._moves = []  # Moves passed to record_move and not yet packed, as session id, move, session id, move...
+        self._file = None
+        self._file_bytes = 0
+        self._compacted_bytes = 0
+        self._record_count = 0
+        self._commit_count = 0
+        self._compaction_count = 0
+        self._discarded_bytes = 0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                             Getter/Setter Methods
+    def get_path(self):
+        """
+        Returns the path of the journal file
+        """
+        return self._path
+
+    def get_session_count(self):
+        """
+        Returns the number of sessions being journaled
+        """
+        return len(self._games)
+
+    def get_pending_count(self):
+        """
+        Returns the number of records waiting for the next commit, counting each move as one
+        """
+        return self._pending + len(self._moves) // 2
+
+    def get_record_count(self):
+        """
+        Returns the number of records committed since the journal was opened, counting each move as one
+        """
+        return self._record_count
+
+    def get_commit_count(self):
+        """
+        Returns the number of commits since the journal was opened
+        """
+        return self._commit_count
+
+    def get_compaction_count(self):
+        """
+        Returns the number of times the journal has been compacted since it was opened, including when it was opened
+        """
+        return self._compaction_count
+
+    def get_file_bytes(self):
+        """
+        Returns the size of the journal file
+        """
+        return self._file_bytes
+
+    def get_discarded_bytes(self):
+        """
+        Returns how many bytes at the end of the file were thrown away by open because they were torn or corrupt
+        """
+        return self._discarded_bytes
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Opening and Closing
+    def open(self):
+        """
+        Recovers every session in the journal file, if there is one, compacts the file and starts journaling the
+        recovered games. Returns a dictionary of session id -> (game, winner), where winner is the last result recorded
+        for the session or 0
+        """
+        if os.path.exists(self._path):
+            sessions, valid_bytes, total_bytes = replay_journal(self._path)
+            self._discarded_bytes = total_bytes - valid_bytes
+        else:
+            sessions = {}
+        for session_id, (game, winner) in sessions.items():
+            self._games[session_id] = game
+            if winner:
+                self._winners[session_id] = winner
+            self.listen(session_id, game)
+        self.compact()
+        return sessions
+
+    def close(self):
+        """
+        Commits what is pending, closes the file and stops listening to the games
+        """
+        if self._file is None:
+            return
+        self.commit()
+        self._file.close()
+        self._file = None
+        for session_id, listener in self._listeners.items():
+            self._games[session_id].remove_listener(listener)
+        self._listeners = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                                   Sessions
+    def attach(self, session_id, game):
+        """
+        Starts journaling a game under session_id, beginning with a snapshot of its current position
+        """
+        if session_id in self._games:
+            raise ValueError("session %d is already in the journal" % session_id)
+        self._games[session_id] = game
+        self.append_snapshot(session_id, game)
+        self.listen(session_id, game)
+
+    def detach(self, session_id):
+        """
+        Stops journaling a session and records that it is gone, so recovery leaves it out
+        """
+        game = self._games.pop(session_id)
+        game.remove_listener(self._listeners.pop(session_id))
+        self._winners.pop(session_id, None)
+        self.append(session_id, CLOSE)
+
+    def listen(self, session_id, game):
+        """
+        Adds the listener that journals a game's undos and loaded positions. Moves are left to record_move, so the
+        game doesn't call anything for them
+        """
+        listener = functools.partial(self.record_change, session_id)
+        self._listeners[session_id] = listener
+        game.add_listener(listener, ("undo", "load"))
+
+    def record_change(self, session_id, game, event, move):
+        """
+        Game listener: an undo or a loaded position is journaled as a new snapshot
+        """
+        self.append_snapshot(session_id, game)
+
+    def record_move(self, session_id, move):
+        """
+        Journals a compact move that has just been made in an attached session's game. This is called for every move,
+        so it only keeps the move, and the record is packed at the next commit. Every move made in an attached game
+        has to be passed here, or the moves after it won't replay
+        """
+        self._moves.append(session_id)
+        self._moves.append(move)
+
+    def record_result(self, session_id, winner):
+        """
+        Records the winner of a session's game, which is kept through compaction and handed back by open
+        """
+        self._winners[session_id] = winner
+        self.append(session_id, RESULT, RESULT_PAYLOAD.pack(winner))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Writing Records
+    def append(self, session_id, record_type, payload=b""):
+        """
+        Adds a record to the ones waiting for the next commit, after any moves still waiting to be packed, so the
+        records keep the order things happened in
+        """
+        if self._moves:
+            self.pack_moves()
+        self._buffer += RECORD_HEADER.pack(session_id, record_type, len(payload))
+        self._buffer += payload
+        self._pending += 1
+
+    def pack_moves(self):
+        """
+        Packs the moves waiting from record_move into move records in the buffer, as few as they fit in
+        """
+        session_ids = array(MOVE_ARRAYS[0], self._moves[0::2])
+        moves = array(MOVE_ARRAYS[1], self._moves[1::2])
+        if sys.byteorder != "little":
+            session_ids.byteswap()
+            moves.byteswap()
+        for start in range(0, len(moves), MOVES_PER_RECORD):
+            end = start + MOVES_PER_RECORD
+            payload = session_ids[start:end].tobytes() + moves[start:end].tobytes()
+            self._buffer += RECORD_HEADER.pack(0, MOVE, len(payload))
+            self._buffer += payload
+        self._pending += len(moves)
+        self._moves = []
+
+    def append_snapshot(self, session_id, game):
+        """
+        Adds a snapshot of a game's whole position
+        """
+        payload = SNAPSHOT_HEADER.pack(game.get_board_size(), game.get_fences_per_player()) + game.to_bytes()
+        self.append(session_id, SNAPSHOT, payload)
+
+    def commit(self):
+        """
+        Writes every pending record as one batch with one write and one fsync, then compacts the journal if it has
+        grown past compact_bytes. Returns the number of records committed
+        """
+        if self._moves:
+            self.pack_moves()
+        if not self._buffer:
+            return 0
+        self._file_bytes += self.write_batch(self._file)
+        count = self._pending
+        self._buffer = bytearray()
+        self._pending = 0
+        self._record_count += count
+        self._commit_count += 1
+        if self._file_bytes > self._compact_bytes and self._file_bytes > 2 * self._compacted_bytes:
+            self.compact()
+        return count
+
+    def compact(self):
+        """
+        Replaces the journal file with one snapshot (and result) per live session. The new file is written and synced
+        beside the old one and renamed over it, so a crash at any point leaves one or the other. Pending records are
+        dropped, since the snapshots already hold what they describe
+        """
+        temporary_path = self._path + ".compact"
+        new_file = open(temporary_path, "wb")
+        self._buffer = bytearray()
+        self._pending = 0
+        self._moves = []
+        self.write_header(new_file)
+        for session_id, game in self._games.items():
+            self.append_snapshot(session_id, game)
+            winner = self._winners.get(session_id)
+            if winner:
+                self.append(session_id, RESULT, RESULT_PAYLOAD.pack(winner))
+        self._file_bytes = self._compacted_bytes = JOURNAL_HEADER.size + self.write_batch(new_file)
+        os.replace(temporary_path, self._path)
+        if self._sync:
+            sync_directory(self._path)
+        if self._file is not None:
+            self._file.close()
+        self._file = new_file
+        self._buffer = bytearray()
+        self._pending = 0
+        self._compaction_count += 1
+
+    def write_header(self, file):
+        """
+        Writes the file header
+        """
+        file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+
+    def write_batch(self, file):
+        """
+        Writes the pending records to a file as one batch, syncs it and returns the number of bytes written
+        """
+        file.write(BATCH_HEADER.pack(zlib.crc32(self._buffer), len(self._buffer)) + self._buffer)
+        file.flush()
+        if self._sync:
+            os.fsync(file.fileno())
+        return BATCH_HEADER.size + len(self._buffer)
+
+
+def sync_directory(path):
+    """
+    Syncs the directory holding path, so a rename into it survives a crash. Does nothing where directories can't be
+    opened, such as on Windows
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def read_batches(data):
+    """
+    Generator that goes through the batches after the header of a journal held in data and yields (end offset,
+    records) for each whole batch with a good CRC, stopping at the first that isn't
+    """
+    offset = JOURNAL_HEADER.size
+    while offset + BATCH_HEADER.size <= len(data):
+        crc, length = BATCH_HEADER.unpack_from(data, offset)
+        start = offset + BATCH_HEADER.size
+        end = start + length
+        if end > len(data) or zlib.crc32(data[start:end]) != crc:
+            return
+        yield end, data[start:end]
+        offset = end
+
+
+def read_records(records):
+    """
+    Generator that splits the records of one batch and yields (session id, record type, payload) for each. Raises
+    ValueError if the batch doesn't divide into whole records, which a batch that passed its CRC never should
+    """
+    offset = 0
+    while offset < len(records):
+        if offset + RECORD_HEADER.size > len(records):
+            raise ValueError("a record header runs past the end of its batch")
+        session_id, record_type, length = RECORD_HEADER.unpack_from(records, offset)
+        offset += RECORD_HEADER.size + length
+        if offset > len(records):
+            raise ValueError("a record runs past the end of its batch")
+        yield session_id, record_type, records[offset - length:offset]
+
+
+def read_moves(payload):
+    """
+    Returns the (session id, compact move) pairs in the payload of a move record, in the order they were made. Raises
+    ValueError if the payload isn't a whole number of moves
+    """
+    if len(payload) % MOVE_BYTES != 0:
+        raise ValueError("a move record of %d bytes doesn't hold a whole number of moves" % len(payload))
+    split = len(payload) // MOVE_BYTES * 4
+    session_ids = array(MOVE_ARRAYS[0])
+    session_ids.frombytes(payload[:split])
+    moves = array(MOVE_ARRAYS[1])
+    moves.frombytes(payload[split:])
+    if sys.byteorder != "little":
+        session_ids.byteswap()
+        moves.byteswap()
+    return zip(session_ids, moves)
+
+
+def replay_journal(path):
+    """
+    Replays a journal file and returns (sessions, valid bytes, total bytes), where sessions is a dictionary of session
+    id -> (game, winner) for every session that wasn't closed, and the bytes past valid bytes are a torn or corrupt
+    tail. Raises ValueError if the file isn't a journal, or if a record that passed its CRC doesn't replay
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < JOURNAL_HEADER.size:
+        raise ValueError("%s is too short to be a journal" % path)
+    magic, version = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError("%s is not a journal" % path)
+    if version != JOURNAL_VERSION:
+        raise ValueError("%s has version %d, expected version %d" % (path, version, JOURNAL_VERSION))
+    games = {}
+    winners = {}
+    valid_bytes = JOURNAL_HEADER.size
+    for end, records in read_batches(memoryview(data)):
+        for session_id, record_type, payload in read_records(records):
+            if record_type == SNAPSHOT:
+                board_size, fences_per_player = SNAPSHOT_HEADER.unpack_from(payload)
+                games[session_id] = QuoridorGame.from_bytes(payload[SNAPSHOT_HEADER.size:], board_size,
+                                                            fences_per_player)
+            elif record_type == MOVE:
+                for session_id, move in read_moves(payload):
+                    game = games.get(session_id)
+                    if game is None or game.apply(move) is not True:
+                        raise ValueError("%s: a move in the batch ending at byte %d doesn't replay in session %d" %
+                                         (path, end, session_id))
+            elif record_type == RESULT:
+                winners[session_id] = RESULT_PAYLOAD.unpack(payload)[0]
+            elif record_type == CLOSE:
+                games.pop(session_id, None)
+                winners.pop(session_id, None)
+            else:
+                raise ValueError("%s: unknown record type %d in the batch ending at byte %d" %
+                                 (path, record_type, end))
+        valid_bytes = end
+    sessions = {session_id: (game, winners.get(session_id, 0)) for session_id, game in games.items()}
+    return sessions, valid_bytes, len(data)
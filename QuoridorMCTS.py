@@ -0,0 +1,184 @@
+# Description: Monte Carlo tree search player for QuoridorGame. Uses UCT to grow a tree of moves, QuoridorGame.playout
+#              for fast pawn-only playouts, and a process pool to run one tree per core (root parallelism), merging the
+#              visit counts of the root moves at the end.
+
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Quoridor import H_FENCE, PAWN_MOVE, V_FENCE, decode_move
+
+
+class MCTSNode:
+    """
+    One node of the search tree. wins counts playouts won by the player who made the move leading to this node
+    """
+
+    __slots__ = ("move", "player_integer", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player_integer, parent, untried):
+        """
+        Creates a node for a move made by player_integer. untried is the list of moves from this node that don't have
+        a child yet
+        """
+        self.move = move
+        self.player_integer = player_integer
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """
+        Picks the child with the best UCT score: its win rate plus a bonus for children that haven't been tried much
+        """
+        log_visits = math.log(self.visits)
+        best_child = None
+        best_score = -1.0
+        for child in self.children:
+            score = (child.wins / child.visits) + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+
+def candidate_moves(game):
+    """
+    Lists the moves the tree search considers for the side to move: every pawn move, and the fences that cross the
+    opponent's shortest path. Other fences can't make the opponent's path any longer straight away
+    """
+    if game.get_game_won() is True:
+        return []
+    player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+    moves = [(square << 2) | PAWN_MOVE for square in game.get_pawn_targets(player_integer)]
+    if game.get_fences_left(player_integer) > 0:
+        path = game.get_shortest_path(3 - player_integer)
+        if path is not None:
+            h_free, v_free = game.legal_fence_masks(player_integer)
+            for kind, mask in ((H_FENCE, h_free & path[1]), (V_FENCE, v_free & path[2])):
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    moves.append(((bit.bit_length() - 1) << 2) | kind)
+    return moves
+
+
+def run_search(game, time_limit, playouts=None, exploration=1.4, greedy=0.75, seed=None):
+    """
+    Runs UCT from the game's position in this process until time_limit seconds have passed or playouts playouts have
+    been made. The game is changed with apply/undo during the search and left as it was. Returns a dictionary of
+    compact root move -> (visits, wins)
+    """
+    rng = random.Random(seed)
+    root_player = 1 if game.get_turn_count() % 2 != 0 else 2
+    root = MCTSNode(None, 3 - root_player, None, candidate_moves(game))
+    deadline = time.perf_counter() + time_limit
+    count = 0
+    while (playouts is None or count < playouts) and (count % 16 != 0 or time.perf_counter() < deadline):
+        count += 1
+        node = root
+        depth = 0
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            game.apply(node.move)
+            depth += 1
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            game.apply(move)
+            depth += 1
+            child = MCTSNode(move, player_integer, node, candidate_moves(game))
+            node.children.append(child)
+            node = child
+        winner = game.playout(rng, greedy)
+        for _ in range(depth):
+            game.undo()
+        while node is not None:
+            node.visits += 1
+            if winner == node.player_integer:
+                node.wins += 1.0
+            elif winner == 0:
+                node.wins += 0.5
+            node = node.parent
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+
+def _search_worker(game, time_limit, playouts, exploration, greedy, seed):
+    """
+    Entry point for the process pool. The game arrives as a pickled copy, so the worker can search it freely
+    """
+    return run_search(game, time_limit, playouts, exploration, greedy, seed)
+
+
+class MCTSEngine:
+    """
+    Monte Carlo tree search player. With more than one worker, each worker process grows its own tree from the same
+    position with a different random seed, and the root visit counts are added up to pick the move
+    """
+
+    def __init__(self, time_limit=1.0, playouts=None, workers=None, exploration=1.4, greedy=0.75, seed=None):
+        """
+        Creates an engine that searches for time_limit seconds per move, or until each worker has made playouts
+        playouts. workers defaults to the number of cores
+        """
+        self._time_limit = time_limit
+        self._playouts = playouts
+        self._workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._exploration = exploration
+        self._greedy = greedy
+        self._rng = random.Random(seed)
+        self._pool = None
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any were started
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def search(self, game):
+        """
+        Searches the position and returns a (compact move, root statistics, playouts) tuple. The root statistics map
+        each root move to its merged (visits, wins). The move is None if the side to move has no moves
+        """
+        seeds = [self._rng.getrandbits(64) for _ in range(self._workers)]
+        playouts = None
+        if self._playouts is not None:
+            playouts = -(-self._playouts // self._workers)
+        if self._workers == 1:
+            results = [run_search(game, self._time_limit, playouts, self._exploration, self._greedy, seeds[0])]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self._workers)
+            futures = [self._pool.submit(_search_worker, game, self._time_limit, playouts, self._exploration,
+                                         self._greedy, seed) for seed in seeds]
+            results = [future.result() for future in futures]
+        merged = {}
+        for result in results:
+            for move, (visits, wins) in result.items():
+                total_visits, total_wins = merged.get(move, (0, 0.0))
+                merged[move] = (total_visits + visits, total_wins + wins)
+        if not merged:
+            return None, merged, 0
+        best_move = max(merged, key=lambda move: merged[move][0])
+        return best_move, merged, sum(visits for visits, _ in merged.values())
+
+    def choose_move(self, game):
+        """
+        Returns the most visited move as a (kind, target location) tuple, or None if the side to move has no moves
+        """
+        move = self.search(game)[0]
+        if move is None:
+            return None
+        return decode_move(move, game.get_board_size())
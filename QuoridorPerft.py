@@ -0,0 +1,147 @@
+# Description: Perft for the Quoridor move generator: counts every legal sequence of moves to a given depth from a
+#              position, optionally broken down by the first move ("divide"), which makes it easy to find the move whose
+#              subtree a change to the rules code has altered. The counts of the starting positions are kept in
+#              KNOWN_COUNTS so --check can catch any change to pawn steps, jumps, diagonals or fence legality, and the
+#              nodes per second are a measure of how fast the rules engine is. Root moves can be split across
+#              worker processes.
+#
+#              Run "python QuoridorPerft.py depth [--divide] [--workers N] [--board-size N] [--fences N]
+#              [--moves "e2 e8 ..."]" or "python QuoridorPerft.py depth --check".
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Quoridor import BOARD_SIZE, MOVE_KINDS, QuoridorGame, get_geometry
+from QuoridorRecords import format_move, parse_move
+
+#  (board size, fences per player, depth) -> leaf count from the starting position
+KNOWN_COUNTS = {(5, 3, 1): 40, (5, 3, 2): 1561, (5, 3, 3): 59405, (5, 3, 4): 2206163,
+                (7, 6, 1): 84, (7, 6, 2): 6973, (7, 6, 3): 571961,
+                (9, 10, 1): 144, (9, 10, 2): 20593, (9, 10, 3): 2924501}
+
+
+def perft(game, depth):
+    """
+    Returns the number of legal move sequences of exactly depth moves from the game's position. A won game has no
+    moves, so lines that end the game early add nothing. The game is put back as it was
+    """
+    player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+    moves = game.legal_moves(player_integer, compact=True)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1  # The last ply is counted without being played
+    nodes = 0
+    for move in moves:
+        game.apply(move)
+        nodes += perft(game, depth - 1)
+        game.undo()
+    return nodes
+
+
+def _count_subtree(position, board_size, fences_per_player, move, depth):
+    """
+    Entry point for the process pool: plays one root move on an unpacked position and counts its subtree
+    """
+    game = QuoridorGame.from_bytes(position, board_size, fences_per_player)
+    game.apply(move)
+    return move, perft(game, depth - 1)
+
+
+def divide(game, depth, workers=1):
+    """
+    Returns a list of (compact move, count) for every legal move in the game's position, in the order legal_moves gives
+    them, where count is the number of sequences of depth moves that start with it. With more than one worker the
+    root moves are shared out between processes, each of which gets the position packed with to_bytes
+    """
+    if depth < 1:
+        return []
+    player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+    moves = list(game.legal_moves(player_integer, compact=True))
+    if workers <= 1 or depth == 1:
+        results = []
+        for move in moves:
+            game.apply(move)
+            results.append((move, perft(game, depth - 1)))
+            game.undo()
+        return results
+    position = game.to_bytes()
+    board_size = game.get_board_size()
+    fences_per_player = game.get_fences_per_player()
+    chunk_size = max(1, len(moves) // (4 * workers))  # A few chunks per worker evens out subtrees of different sizes
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_count_subtree, [position] * len(moves), [board_size] * len(moves),
+                             [fences_per_player] * len(moves), moves, [depth] * len(moves), chunksize=chunk_size))
+
+
+def timed_perft(game, depth, workers=1):
+    """
+    Runs divide and returns (total nodes, seconds taken, the divide results)
+    """
+    start = time.perf_counter()
+    results = divide(game, depth, workers)
+    elapsed = time.perf_counter() - start
+    return sum(count for move, count in results), elapsed, results
+
+
+def check_known_counts(max_depth, workers=1):
+    """
+    Runs perft on every starting position in KNOWN_COUNTS up to max_depth and returns a list of (board size, fences
+    per player, depth, expected, counted) for every count that doesn't match
+    """
+    mismatches = []
+    for (board_size, fences_per_player, depth), expected in sorted(KNOWN_COUNTS.items()):
+        if depth > max_depth:
+            continue
+        counted, elapsed, results = timed_perft(QuoridorGame(board_size, fences_per_player), depth, workers)
+        print("%dx%d, %d fences, depth %d: %d nodes in %.2fs" % (board_size, board_size, fences_per_player, depth,
+                                                                  counted, elapsed))
+        if counted != expected:
+            mismatches.append((board_size, fences_per_player, depth, expected, counted))
+    return mismatches
+
+
+def main():
+    """
+    Runs perft from the command line and prints the node count and nodes per second, with the count for each root
+    move in divide mode
+    """
+    parser = argparse.ArgumentParser(description="Count the legal move sequences from a Quoridor position")
+    parser.add_argument("depth", type=int, help="number of moves to look ahead")
+    parser.add_argument("--divide", action="store_true", help="print the count for each root move")
+    parser.add_argument("--workers", type=int, default=1, help="processes to split the root moves across")
+    parser.add_argument("--board-size", type=int, default=BOARD_SIZE, help="size of the board")
+    parser.add_argument("--fences", type=int, default=10, help="fences per player")
+    parser.add_argument("--moves", default="", help="moves in notation to play before counting, such as \"e2 e8\"")
+    parser.add_argument("--check", action="store_true", help="check the starting positions against KNOWN_COUNTS")
+    arguments = parser.parse_args()
+    if arguments.depth < 1:
+        parser.error("depth must be at least 1")
+
+    if arguments.check:
+        mismatches = check_known_counts(arguments.depth, arguments.workers)
+        for board_size, fences_per_player, depth, expected, counted in mismatches:
+            print("MISMATCH %dx%d, %d fences, depth %d: expected %d, counted %d" % (board_size, board_size,
+                                                                                   fences_per_player, depth, expected,
+                                                                                   counted))
+        print("all counts match" if not mismatches else "%d counts differ" % len(mismatches))
+        return
+
+    game = QuoridorGame(arguments.board_size, arguments.fences)
+    for token in arguments.moves.split():
+        try:
+            legal = game.apply(parse_move(token, arguments.board_size))
+        except ValueError as error:
+            parser.error(str(error))
+        if legal is not True:
+            parser.error("illegal move: %s" % token)
+    nodes, elapsed, results = timed_perft(game, arguments.depth, arguments.workers)
+    if arguments.divide:
+        square_to_location = get_geometry(arguments.board_size).square_to_location
+        for move, count in results:
+            print("%s: %d" % (format_move(MOVE_KINDS[move & 3], square_to_location[move >> 2]), count))
+    print("depth %d: %d nodes in %.2fs, %.0f nodes/s" % (arguments.depth, nodes, elapsed,
+                                                        nodes / elapsed if elapsed > 0 else 0.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Description: Opt-in instrumentation for QuoridorGame. While enabled, the rules methods on the class are swapped for
+#              wrappers that count calls, time them into histograms and record why moves were turned down. Disabling
+#              puts the original methods back, so a game that isn't being instrumented runs exactly the same code as
+#              before and pays nothing for it.
+
+import functools
+import inspect
+import threading
+import time
+
+from Quoridor import QuoridorGame
+
+#  The methods a move goes through: move_pawn -> condition_check -> is_legal_move -> relocate_pawn -> is_winner for
+#  pawns, and place_fence -> condition_check -> fence_blocks_path for fences
+INSTRUMENTED_METHODS = ("move_pawn", "condition_check", "is_legal_move", "relocate_pawn", "is_winner", "place_fence",
+                        "fence_blocks_path", "apply", "undo", "legal_moves")
+HISTOGRAM_BUCKETS = 32  # Bucket n counts calls that took less than 2 ** n nanoseconds (and at least half that)
+
+
+class DiagnosisFlag(threading.local):
+    """
+    Set while a thread is asking the game why a move was turned down. Each thread sees its own flag, so one thread's
+    diagnosis doesn't stop the calls of another from being counted
+    """
+
+    diagnosing = False  # Class level default, so a thread that has never set the flag reads False without a lookup miss
+
+
+class Instrumentation:
+    """
+    Call counts, rejection reasons and optional timing histograms for every QuoridorGame. Only one instance can be
+    enabled at a time, since it patches the class itself
+    """
+
+    _active = None  # The enabled instance, if any
+
+    def __init__(self, timing=False):
+        """
+        Creates a switched off set of counters. With timing, every instrumented call is also timed
+        """
+        self._timing = timing
+        self._originals = {}
+        self._local = DiagnosisFlag()
+        self._calls = dict.fromkeys(INSTRUMENTED_METHODS, 0)
+        self._time_ns = dict.fromkeys(INSTRUMENTED_METHODS, 0)
+        self._histograms = {name: [0] * HISTOGRAM_BUCKETS for name in INSTRUMENTED_METHODS}
+        self._rejections = {"move_pawn": {}, "place_fence": {}}
+
+    def is_enabled(self):
+        """
+        Returns True while the wrappers are installed
+        """
+        return Instrumentation._active is self
+
+    def enable(self):
+        """
+        Installs the wrappers on QuoridorGame. Raises RuntimeError if another instance is already enabled
+        """
+        if Instrumentation._active is self:
+            return
+        if Instrumentation._active is not None:
+            raise RuntimeError("another Instrumentation is already enabled")
+        for name in INSTRUMENTED_METHODS:
+            original = QuoridorGame.__dict__[name]
+            self._originals[name] = original
+            setattr(QuoridorGame, name, self.wrap(name, original))
+        Instrumentation._active = self
+
+    def disable(self):
+        """
+        Puts the original methods back. The counters are kept until reset
+        """
+        if Instrumentation._active is not self:
+            return
+        for name, original in self._originals.items():
+            setattr(QuoridorGame, name, original)
+        self._originals = {}
+        Instrumentation._active = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    def reset(self):
+        """
+        Sets every counter back to zero. The counters are cleared in place, since the installed wrappers hold on to them
+        """
+        for name in INSTRUMENTED_METHODS:
+            self._calls[name] = 0
+            self._time_ns[name] = 0
+            self._histograms[name][:] = [0] * HISTOGRAM_BUCKETS
+        for reasons in self._rejections.values():
+            reasons.clear()
+
+    def wrap(self, name, original):
+        """
+        Builds the wrapper installed in place of one method. move_pawn and place_fence also ask the game why a move
+        was turned down, with counting paused on that thread so the diagnosis doesn't show up in the counts
+        """
+        calls = self._calls
+        rejections = self._rejections.get(name)
+        local = self._local
+
+        if self._timing:
+            time_ns = self._time_ns
+            histogram = self._histograms[name]
+            clock = time.perf_counter_ns
+
+            def counted(game, *arguments, **keywords):
+                if local.diagnosing:
+                    return original(game, *arguments, **keywords)
+                start = clock()
+                result = original(game, *arguments, **keywords)
+                elapsed = clock() - start
+                calls[name] += 1
+                time_ns[name] += elapsed
+                histogram[min(elapsed.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+                return result
+        else:
+            def counted(game, *arguments, **keywords):
+                if local.diagnosing:
+                    return original(game, *arguments, **keywords)
+                calls[name] += 1
+                return original(game, *arguments, **keywords)
+
+        if rejections is None:
+            return functools.wraps(original)(counted)
+
+        signature = inspect.signature(original)
+
+        def checked(game, *arguments, **keywords):
+            result = counted(game, *arguments, **keywords)
+            if result is not True and not local.diagnosing:
+                #  Only turned down moves get here, so the arguments are matched up by name, however they were passed
+                bound = signature.bind(game, *arguments, **keywords).arguments
+                local.diagnosing = True
+                try:
+                    if name == "move_pawn":
+                        reason = game.rejection_reason(bound["player_integer"], "p", bound["target_location"])
+                    else:
+                        reason = game.rejection_reason(bound["player_integer"], bound["v_or_h"],
+                                                       bound["target_location"])
+                finally:
+                    local.diagnosing = False
+                reason = reason or "unknown"
+                rejections[reason] = rejections.get(reason, 0) + 1
+            return result
+        return functools.wraps(original)(checked)
+
+    def snapshot(self, reset=False):
+        """
+        Returns a copy of the counters as a dictionary of plain numbers, strings, lists and dictionaries, ready to be
+        turned into JSON. Methods that haven't been called are left out. With reset, the counters start again from zero
+        """
+        calls = {name: count for name, count in self._calls.items() if count}
+        data = {"enabled": self.is_enabled(),
+                "timing": self._timing,
+                "calls": calls,
+                "rejections": {name: dict(reasons) for name, reasons in self._rejections.items()}}
+        if self._timing:
+            data["time_ns"] = {name: self._time_ns[name] for name in calls}
+            data["histograms"] = {}
+            for name in calls:
+                histogram = self._histograms[name]
+                last = max(index for index, count in enumerate(histogram) if count) + 1
+                data["histograms"][name] = {"bucket_limits_ns": [1 << index for index in range(last)],
+                                            "counts": histogram[:last]}
+        if reset:
+            self.reset()
+        return data
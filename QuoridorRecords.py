@@ -0,0 +1,175 @@
+# Description: Reads Quoridor game records in standard notation and replays them through QuoridorGame to check them.
+#              A record is one game per line, with the moves separated by spaces: "e2" moves the pawn to column e,
+#              row 2, and "e3h" or "e3v" places a horizontal or vertical fence at column e, row 3. Files are read one
+#              line at a time, so memory use doesn't grow with the size of the file.
+#
+#              The notation is adapted to this game's fences, which are one segment long: "e3h" is the fence along the
+#              top side of square e3 and "e3v" the one along its left side, the same (column, row) place_fence takes.
+#              In the usual Quoridor notation a fence is two segments long and named by the intersection at its
+#              middle, so records written in that notation don't replay here.
+
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from Quoridor import BOARD_SIZE, MAX_BOARD_SIZE, QuoridorGame
+
+COLUMN_LETTERS = "abcdefghijklmno"[:MAX_BOARD_SIZE]  # Boards smaller than the largest only use the first few
+
+#  Result of replaying one record. illegal_ply is the number (counting from 1) of the first move that couldn't be
+#  parsed or wasn't legal, or None if every move was played, and winner is 1, 2, or 0 if nobody won
+GameVerdict = namedtuple("GameVerdict", ["line_number", "plies", "illegal_ply", "winner", "error"])
+
+
+def parse_move(token, board_size=BOARD_SIZE):
+    """
+    Turns one move in notation into a (kind, target location) tuple, where kind is "p" for a pawn move or "h"/"v" for
+    a one segment fence on the top or left side of the square. Raises ValueError if the token isn't a move on a board
+    of board_size
+    """
+    kind = "p"
+    if token[-1:] in ("h", "v"):
+        kind = token[-1]
+        token = token[:-1]
+    if len(token) < 2 or token[0] not in COLUMN_LETTERS[:board_size] or not token[1:].isdigit():
+        raise ValueError("not a move: %r" % token)
+    row = int(token[1:]) - 1
+    if row < 0 or row >= board_size:
+        raise ValueError("row out of range: %r" % token)
+    return kind, (COLUMN_LETTERS.index(token[0]), row)
+
+
+def format_move(kind, target_location):
+    """
+    Writes a (kind, target location) move in notation, the reverse of parse_move
+    """
+    square = COLUMN_LETTERS[target_location[0]] + str(target_location[1] + 1)
+    if kind == "p":
+        return square
+    return square + kind
+
+
+def read_records(lines):
+    """
+    Generator that goes through an iterable of text lines, such as an open file, and yields a (line number, list of
+    move tokens) tuple for each game. Blank lines and lines starting with "#" are skipped, and move numbers like "12."
+    are dropped
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield line_number, [token for token in line.split() if not token.endswith(".")]
+
+
+def replay_record(tokens, line_number=0, board_size=BOARD_SIZE, fences_per_player=10):
+    """
+    Plays a record's moves on a new game through move_pawn and place_fence, stopping at the first move that can't be
+    parsed or isn't legal, and returns the GameVerdict
+    """
+    game = QuoridorGame(board_size, fences_per_player)
+    for ply, token in enumerate(tokens, 1):
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        try:
+            kind, target_location = parse_move(token, board_size)
+        except ValueError as error:
+            return GameVerdict(line_number, ply - 1, ply, 0, str(error))
+        if kind == "p":
+            legal = game.move_pawn(player_integer, target_location)
+        else:
+            legal = game.place_fence(player_integer, kind, target_location)
+        if legal is not True:
+            return GameVerdict(line_number, ply - 1, ply, winner_of(game), "illegal move: %r" % token)
+    return GameVerdict(line_number, len(tokens), None, winner_of(game), None)
+
+
+def winner_of(game):
+    """
+    Returns the player who has won the game, or 0 if it isn't over
+    """
+    if game.get_game_won() is not True:
+        return 0
+    return 1 if game.get_turn_count() % 2 == 0 else 2  # Whoever moved last won
+
+
+def _replay_chunk(chunk, board_size, fences_per_player):
+    """
+    Entry point for the process pool: replays a list of (line number, tokens) records
+    """
+    return [replay_record(tokens, line_number, board_size, fences_per_player) for line_number, tokens in chunk]
+
+
+def _chunks(records, chunk_size):
+    """
+    Groups records into lists of chunk_size, so each trip to a worker process carries enough work to be worth it
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_records(lines, workers=1, chunk_size=256, window=None, board_size=BOARD_SIZE, fences_per_player=10):
+    """
+    Generator that replays every record in an iterable of lines and yields a GameVerdict for each, in file order. With
+    more than one worker the records are sent to a process pool in chunks, and at most window chunks (twice the number
+    of workers by default) are read ahead of the verdicts that have been yielded, which keeps memory use flat. Every
+    game is played on a board of board_size with fences_per_player fences each
+    """
+    records = read_records(lines)
+    if workers <= 1:
+        for line_number, tokens in records:
+            yield replay_record(tokens, line_number, board_size, fences_per_player)
+        return
+    if window is None:
+        window = 2 * workers
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for chunk in _chunks(records, chunk_size):
+            pending.append(pool.submit(_replay_chunk, chunk, board_size, fences_per_player))
+            if len(pending) >= window:
+                for verdict in pending.pop(0).result():
+                    yield verdict
+        for future in pending:
+            for verdict in future.result():
+                yield verdict
+
+
+def validate_file(path, workers=1, chunk_size=256, board_size=BOARD_SIZE, fences_per_player=10):
+    """
+    Generator that opens a record file and yields the GameVerdict of each game in it
+    """
+    with open(path) as lines:
+        for verdict in validate_records(lines, workers, chunk_size, None, board_size, fences_per_player):
+            yield verdict
+
+
+def main():
+    """
+    Checks the record file named on the command line, prints every game with an illegal move and a summary. Optional
+    further arguments are the number of worker processes, the board size and the fences per player
+    """
+    if len(sys.argv) < 2:
+        print("usage: python QuoridorRecords.py records.txt [workers [board_size [fences_per_player]]]")
+        return
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    board_size = int(sys.argv[3]) if len(sys.argv) > 3 else BOARD_SIZE
+    fences_per_player = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    games = illegal = 0
+    wins = [0, 0, 0]
+    for verdict in validate_file(sys.argv[1], workers, 256, board_size, fences_per_player):
+        games += 1
+        wins[verdict.winner] += 1
+        if verdict.illegal_ply is not None:
+            illegal += 1
+            print("line %d, ply %d: %s" % (verdict.line_number, verdict.illegal_ply, verdict.error))
+    print("%d games, %d with illegal moves, P1 won %d, P2 won %d, %d unfinished" %
+          (games, illegal, wins[1], wins[2], wins[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# Description: Text rendering of Quoridor boards. A BoardRenderer keeps an empty board for its size as a template and
+#              draws a position by copying the template into a buffer it allocated up front and then writing in just
+#              the pawns, the fences and a status line. It can also send only the cells that changed since the last
+#              position it drew, as ANSI cursor moves, and draw many games into one stream in large writes.
+#
+#                    a    b    c
+#                 +----+----+----+
+#               1 |    | P1 |    |
+#                 +----+====+----+      ==== is a horizontal fence, # a vertical one
+#               2 |    #    |    |
+
+from Quoridor import BOARD_SIZE, get_geometry
+
+COLUMN_LETTERS = b"abcdefghijklmno"
+FOOTER_WIDTH = 48
+CURSOR_MOVE = "\x1b[%d;%dH"  # ANSI cursor position, counted from 1
+
+
+class BoardRenderer:
+    """
+    Draws positions for one board size. Each line of a frame is the same width: a row of column letters, then a border
+    line above each row of spaces and the spaces themselves, the bottom border and finally a status line with the turn
+    and the fences left. Diffs are worked out from the last position drawn by render_diff, so a renderer should be kept
+    for each stream of diffs
+    """
+
+    def __init__(self, board_size=BOARD_SIZE, origin_row=1):
+        """
+        Builds the empty board template for board_size. origin_row is the terminal line (counted from 1) the top of the
+        board is drawn on by render_diff
+        """
+        get_geometry(board_size)  # Raises ValueError for a size QuoridorGame doesn't support
+        self._size = board_size
+        self._origin_row = origin_row
+        self._line_width = 4 + (5 * board_size)
+        line_stride = self._line_width + 1
+        grid_lines = (2 * board_size) + 2
+        self._footer_offset = grid_lines * line_stride
+        self._frame_bytes = self._footer_offset + FOOTER_WIDTH + 1
+
+        #  Where each square's pawn token, the fence on its top side and the fence on its left side go in a frame
+        self._pawn_offsets = []
+        self._h_offsets = []
+        self._v_offsets = []
+        for square in range(board_size * board_size):
+            row, column = divmod(square, board_size)
+            self._pawn_offsets.append(((2 + (2 * row)) * line_stride) + 5 + (5 * column))
+            self._h_offsets.append(((1 + (2 * row)) * line_stride) + 4 + (5 * column))
+            self._v_offsets.append(((2 + (2 * row)) * line_stride) + 3 + (5 * column))
+
+        template = bytearray(b" " * self._frame_bytes)
+        for column in range(board_size):
+            template[5 + (5 * column)] = COLUMN_LETTERS[column]
+        border = b"   +" + (b"----+" * board_size)
+        spaces = b"|" + (b"    |" * board_size)
+        for line in range(1, grid_lines):
+            start = line * line_stride
+            if line % 2 == 1:
+                template[start:start + self._line_width] = border
+            else:
+                template[start:start + self._line_width] = (b"%2d " % (line // 2)) + spaces
+        for line in range(grid_lines):
+            template[(line * line_stride) + self._line_width] = 10
+        template[-1] = 10
+        self._template = bytes(template)
+        self._buffer = bytearray(self._frame_bytes)
+        self._bulk_buffer = None
+        self._last = None  # (p1 square, p2 square, h mask, v mask, footer) of the last position render_diff drew
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                             Getter/Setter Methods
+    def get_board_size(self):
+        """
+        Returns the size of board the renderer draws
+        """
+        return self._size
+
+    def get_frame_bytes(self):
+        """
+        Returns the length of one full frame, including the newline at the end of every line
+        """
+        return self._frame_bytes
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Full Frames
+    def footer(self, game):
+        """
+        Returns the status line for a game, padded to FOOTER_WIDTH
+        """
+        turn_count = game.get_turn_count()
+        if game.get_game_won() is True:
+            status = "P1 won" if turn_count % 2 == 0 else "P2 won"  # Whoever moved last won
+        else:
+            status = "P1 to move" if turn_count % 2 != 0 else "P2 to move"
+        text = "turn %d  %s  fences left P1 %d P2 %d" % (turn_count, status, game.get_fences_left(1),
+                                                         game.get_fences_left(2))
+        return text.encode("ascii")[:FOOTER_WIDTH].ljust(FOOTER_WIDTH)
+
+    def render_into(self, game, buffer, offset=0):
+        """
+        Draws a game into buffer (a bytearray or writable memoryview) starting at offset. The template is copied in
+        with one slice assignment, then only the pawns and the fences that are down are written over it. Raises
+        ValueError if the game is on a different size of board
+        """
+        if game.get_board_size() != self._size:
+            raise ValueError("this renderer draws %dx%d boards" % (self._size, self._size))
+        buffer[offset:offset + self._frame_bytes] = self._template
+        pawn_offset = offset + self._pawn_offsets[game.get_pawn_square(1)]
+        buffer[pawn_offset:pawn_offset + 2] = b"P1"
+        pawn_offset = offset + self._pawn_offsets[game.get_pawn_square(2)]
+        buffer[pawn_offset:pawn_offset + 2] = b"P2"
+        h_fences, v_fences = game.get_fence_masks()
+        while h_fences:
+            bit = h_fences & -h_fences
+            h_fences ^= bit
+            fence_offset = offset + self._h_offsets[bit.bit_length() - 1]
+            buffer[fence_offset:fence_offset + 4] = b"===="
+        while v_fences:
+            bit = v_fences & -v_fences
+            v_fences ^= bit
+            buffer[offset + self._v_offsets[bit.bit_length() - 1]] = 35  # "#"
+        footer_offset = offset + self._footer_offset
+        buffer[footer_offset:footer_offset + FOOTER_WIDTH] = self.footer(game)
+
+    def render(self, game):
+        """
+        Returns a full frame of the game as ASCII bytes, drawn in the renderer's own buffer
+        """
+        self.render_into(game, self._buffer)
+        return bytes(self._buffer)
+
+    def render_many(self, games, stream, chunk_size=64):
+        """
+        Draws every game in an iterable into a binary stream, each frame followed by a blank line. Frames are drawn
+        chunk_size at a time into one buffer that is reused for the whole run, so the stream gets one large write per
+        chunk. Returns the number of games drawn
+        """
+        stride = self._frame_bytes + 1
+        if self._bulk_buffer is None or len(self._bulk_buffer) != chunk_size * stride:
+            self._bulk_buffer = bytearray(b"\n" * (chunk_size * stride))
+        buffer = self._bulk_buffer
+        count = filled = 0
+        for game in games:
+            self.render_into(game, buffer, filled * stride)
+            filled += 1
+            if filled == chunk_size:
+                stream.write(buffer)
+                count += filled
+                filled = 0
+        if filled:
+            stream.write(memoryview(buffer)[:filled * stride])
+            count += filled
+        return count
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                                   Diffs
+    def reset_diff(self):
+        """
+        Forgets the last position drawn, so the next render_diff sends the whole board again
+        """
+        self._last = None
+
+    def cursor_move(self, offset):
+        """
+        Returns the ANSI sequence that moves the cursor to the cell at offset in a frame
+        """
+        line, column = divmod(offset, self._line_width + 1)
+        return CURSOR_MOVE % (self._origin_row + line, column + 1)
+
+    def render_diff(self, game):
+        """
+        Returns ANSI bytes that bring a terminal showing the last position drawn by render_diff up to date with the
+        game: a cursor move and the new text for each cell that changed, then a move to the line under the board. The
+        first call draws every line. Returns empty bytes if nothing changed
+        """
+        h_fences, v_fences = game.get_fence_masks()
+        p1_square = game.get_pawn_square(1)
+        p2_square = game.get_pawn_square(2)
+        footer = self.footer(game)
+        last = self._last
+        self._last = (p1_square, p2_square, h_fences, v_fences, footer)
+        if last is None:
+            self.render_into(game, self._buffer)
+            parts = []
+            for start in range(0, self._footer_offset, self._line_width + 1):
+                parts.append(self.cursor_move(start) + self._buffer[start:start + self._line_width].decode("ascii"))
+            parts.append(self.cursor_move(self._footer_offset) + footer.decode("ascii"))
+        else:
+            last_p1, last_p2, last_h, last_v, last_footer = last
+            parts = []
+            for square in (last_p1, last_p2):  # Clear the old squares first, a pawn may have moved onto one
+                if square != p1_square and square != p2_square:
+                    parts.append(self.cursor_move(self._pawn_offsets[square]) + "  ")
+            if p1_square != last_p1:
+                parts.append(self.cursor_move(self._pawn_offsets[p1_square]) + "P1")
+            if p2_square != last_p2:
+                parts.append(self.cursor_move(self._pawn_offsets[p2_square]) + "P2")
+            changed = h_fences ^ last_h
+            while changed:
+                bit = changed & -changed
+                changed ^= bit
+                segment = "====" if h_fences & bit else "----"
+                parts.append(self.cursor_move(self._h_offsets[bit.bit_length() - 1]) + segment)
+            changed = v_fences ^ last_v
+            while changed:
+                bit = changed & -changed
+                changed ^= bit
+                separator = "#" if v_fences & bit else "|"
+                parts.append(self.cursor_move(self._v_offsets[bit.bit_length() - 1]) + separator)
+            if footer != last_footer:
+                parts.append(self.cursor_move(self._footer_offset) + footer.decode("ascii"))
+            if not parts:
+                return b""
+        parts.append(CURSOR_MOVE % (self._origin_row + (2 * self._size) + 3, 1))
+        return "".join(parts).encode("ascii")
+
+
+_renderers = {}
+
+
+def render_board(game):
+    """
+    Returns a full frame of a game as a string, using a renderer shared between every game of the same board size
+    """
+    board_size = game.get_board_size()
+    renderer = _renderers.get(board_size)
+    if renderer is None:
+        renderer = _renderers[board_size] = BoardRenderer(board_size)
+    return renderer.render(game).decode("ascii")
@@ -0,0 +1,523 @@
+# Description: Asyncio game server that hosts many QuoridorGame sessions in one process. Clients talk to it over TCP
+#              with one JSON object per line. Requests are {"op": ..., ...} with an optional "id" that is copied into
+#              the reply, and the server also sends {"event": ...} lines to tell a player what their opponent did.
+#
+#              {"op": "create"}                                      -> {"ok": true, "session": 1, "player": 1}
+#              {"op": "create", "size": 7, "fences": 6}              -> the same, on a smaller board
+#              {"op": "join", "session": 1}                          -> {"ok": true, "session": 1, "player": 2}
+#              {"op": "move", "session": 1, "to": [4, 1]}            -> {"ok": true, "turn": 2, "winner": 0}
+#              {"op": "fence", "session": 1, "kind": "h", "at": [4, 2]}
+#              {"op": "state", "session": 1}                         -> {"ok": true, "state": {...}}
+#              {"op": "resign", "session": 1}
+#              {"op": "takeback", "session": 1}                      -> asks to take back the last move, which happens
+#                                                                       once the opponent sends a takeback as well
+#              {"op": "stats"}                                       -> session count, moves, memory per session
+#
+#              Given a journal path, every move is written to a QuoridorJournal before it is answered, and the sessions
+#              in the journal are brought back when the server starts. Replies wait for the journal to be committed
+#              once per pass of the event loop, so all the moves that arrived together share one fsync.
+
+import asyncio
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+from Quoridor import BOARD_SIZE, QuoridorGame, encode_move, get_geometry
+from QuoridorJournal import MoveJournal
+
+
+class Session:
+    """
+    One match: the game, the connection sitting in each seat and when the session was last used
+    """
+
+    __slots__ = ("session_id", "game", "seats", "last_active", "winner", "takeback")
+
+    def __init__(self, session_id, now, board_size=BOARD_SIZE, fences_per_player=10, game=None):
+        """
+        Creates a session with an empty board of board_size and nobody seated, or hosting an existing game if one is
+        given
+        """
+        self.session_id = session_id
+        self.game = game if game is not None else QuoridorGame(board_size, fences_per_player)
+        self.seats = [None, None, None]  # Index 1 and 2 hold the connection playing P1 and P2
+        self.last_active = now
+        self.winner = 0
+        self.takeback = 0  # The player who has asked to take back the last move, 0 if nobody has
+
+    def get_state(self):
+        """
+        Returns the position as a dictionary that can be sent as JSON
+        """
+        game = self.game
+        h_fences, v_fences = game.get_fence_masks()
+        square_to_location = get_geometry(game.get_board_size()).square_to_location
+        return {"size": game.get_board_size(),
+                "turn": game.get_turn_count(),
+                "p1": square_to_location[game.get_pawn_square(1)],
+                "p2": square_to_location[game.get_pawn_square(2)],
+                "fences_left": [game.get_fences_left(1), game.get_fences_left(2)],
+                "h_fences": [square_to_location[square] for square in mask_squares(h_fences)],
+                "v_fences": [square_to_location[square] for square in mask_squares(v_fences)],
+                "winner": self.winner,
+                "players": [self.seats[1] is not None, self.seats[2] is not None]}
+
+
+class Connection:
+    """
+    One client. Replies and events are collected in a buffer and written out together once per pass of the event loop,
+    so a client that sends many requests at once gets its replies in one write. With a journal, the pending records are
+    committed before anything is written, so no client hears about a move that isn't on disk yet
+    """
+
+    def __init__(self, writer, journal=None):
+        """
+        Wraps the stream writer of a newly connected client
+        """
+        self.writer = writer
+        self.journal = journal
+        self.seats = {}  # Session id -> the player this connection is in that session
+        self._buffer = []
+        self._flush_scheduled = False
+
+    def send(self, message):
+        """
+        Queues a message for the client
+        """
+        self._buffer.append(json.dumps(message, separators=(",", ":")))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        """
+        Writes everything queued so far in a single call
+        """
+        self._flush_scheduled = False
+        if self.journal is not None and self.journal.get_pending_count():
+            self.journal.commit()  # Only the first flush of each pass commits, the rest find nothing pending
+        if self._buffer and not self.writer.is_closing():
+            self._buffer.append("")
+            self.writer.write("\n".join(self._buffer).encode())
+        self._buffer = []
+
+
+def mask_squares(mask):
+    """
+    Lists the squares whose bits are set in a fence mask
+    """
+    squares = []
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        squares.append(bit.bit_length() - 1)
+    return squares
+
+
+def parse_location(value):
+    """
+    Turns a [column, row] list from a request into a location tuple. Raises ValueError unless it is two integers, so
+    floats such as 1e400 are turned away before they reach the game
+    """
+    if not isinstance(value, list) or len(value) != 2:
+        raise ValueError("a location is a list of two integers")
+    for coordinate in value:
+        if not isinstance(coordinate, int) or isinstance(coordinate, bool):
+            raise ValueError("a location is a list of two integers")
+    return value[0], value[1]
+
+
+def measure_session_memory(count=200):
+    """
+    Creates count sessions while tracemalloc is running and returns the average number of bytes each one holds on to.
+    Sessions share the neighbour table of the open board, so a session grows a little with each fence placed
+    """
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [Session(index, 0.0) for index in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    if not already_tracing:
+        tracemalloc.stop()
+    del sessions
+    return (after - before) // count
+
+
+class QuoridorServer:
+    """
+    Holds every session and serves them over TCP. Sessions nobody has touched for idle_timeout seconds are removed
+    """
+
+    def __init__(self, host="127.0.0.1", port=8162, idle_timeout=600.0, sweep_interval=10.0, journal_path=None,
+                 journal_sync=True):
+        """
+        Creates a server that will listen on host and port once started. Port 0 picks a free port. With a journal_path
+        the sessions are journaled there and recovered from it by start
+        """
+        self._host = host
+        self._port = port
+        self._idle_timeout = idle_timeout
+        self._sweep_interval = sweep_interval
+        self._sessions = {}
+        self._connections = set()
+        self._session_ids = itertools.count(1)
+        self._server = None
+        self._sweeper = None
+        self._moves = 0
+        self._evicted = 0
+        self._memory_per_session = None
+        self._journal = MoveJournal(journal_path, journal_sync) if journal_path is not None else None
+        self._handlers = {"create": self.handle_create, "join": self.handle_join, "move": self.handle_move,
+                          "fence": self.handle_fence, "state": self.handle_state, "resign": self.handle_resign,
+                          "takeback": self.handle_takeback, "stats": self.handle_stats}
+
+    async def start(self):
+        """
+        Starts listening and returns the port in use, which is useful when the server was created with port 0. Sessions
+        in the journal are recovered first, with both seats empty for the players to join again
+        """
+        if self._journal is not None:
+            self.restore_sessions(self._journal.open())
+        self._server = await asyncio.start_server(self.handle_connection, self._host, self._port)
+        self._sweeper = asyncio.get_running_loop().create_task(self.sweep())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Starts the server if needed and runs until it is cancelled
+        """
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening, disconnects every client and stops evicting sessions
+        """
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._server is not None:
+            self._server.close()
+            for connection in list(self._connections):
+                connection.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._journal is not None:
+            self._journal.close()
+
+    def restore_sessions(self, recovered):
+        """
+        Hosts the games recovered from the journal, a dictionary of session id -> (game, winner), and carries on
+        numbering new sessions after them
+        """
+        now = time.monotonic()
+        for session_id, (game, winner) in recovered.items():
+            session = Session(session_id, now, game=game)
+            session.winner = winner
+            self._sessions[session_id] = session
+        if recovered:
+            self._session_ids = itertools.count(max(recovered) + 1)
+
+    def get_session_count(self):
+        """
+        Returns the number of live sessions
+        """
+        return len(self._sessions)
+
+    def get_memory_per_session(self):
+        """
+        Returns the measured size of a new session in bytes. It is measured the first time it is asked for
+        """
+        if self._memory_per_session is None:
+            self._memory_per_session = measure_session_memory()
+        return self._memory_per_session
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Connection Handling
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads request lines from one client until it disconnects. Everything that has arrived is handled before
+        waiting for the socket to drain, so pipelined requests are answered in batches
+        """
+        connection = Connection(writer, self._journal)
+        self._connections.add(connection)
+        pending = b""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        connection.send(self.handle_line(connection, line))
+                if self._journal is None:
+                    connection.flush()  # With a journal the scheduled flush sends it, after one shared commit
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(connection)
+            self.drop_connection(connection)
+            writer.close()
+
+    def drop_connection(self, connection):
+        """
+        Frees the seats of a client that has gone away and tells their opponents
+        """
+        for session_id, player_integer in connection.seats.items():
+            session = self._sessions.get(session_id)
+            if session is not None and session.seats[player_integer] is connection:
+                session.seats[player_integer] = None
+                self.notify(session, 3 - player_integer, {"event": "left", "session": session_id,
+                                                          "player": player_integer})
+        connection.seats = {}
+
+    def handle_line(self, connection, line):
+        """
+        Parses and runs one request and returns the reply
+        """
+        try:
+            request = json.loads(line)
+            operation = request["op"]
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "error": "bad request"}
+        handler = self._handlers.get(operation)
+        if handler is None:
+            reply = {"ok": False, "error": "unknown op %r" % (operation,)}
+        else:
+            try:
+                reply = handler(connection, request)
+            except (KeyError, TypeError, ValueError, IndexError, OverflowError):
+                reply = {"ok": False, "error": "bad arguments for %s" % operation}
+        if "id" in request:
+            reply["id"] = request["id"]
+        return reply
+
+    def notify(self, session, player_integer, event):
+        """
+        Sends an event to the connection sitting in one seat of a session, if there is one
+        """
+        connection = session.seats[player_integer]
+        if connection is not None:
+            connection.send(event)
+
+    def seated_session(self, connection, request):
+        """
+        Returns the session a request is for and the player the connection is in it, or an error reply
+        """
+        session = self._sessions.get(request["session"])
+        if session is None:
+            return None, 0, {"ok": False, "error": "no such session"}
+        player_integer = connection.seats.get(session.session_id)
+        if player_integer is None or session.seats[player_integer] is not connection:
+            return None, 0, {"ok": False, "error": "not a player in this session"}
+        session.last_active = time.monotonic()
+        return session, player_integer, None
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Request Handlers
+
+    def handle_create(self, connection, request):
+        """
+        Starts a new session with the client as P1, on a board of "size" with "fences" for each player if given
+        """
+        board_size = int(request.get("size", BOARD_SIZE))
+        fences_per_player = int(request.get("fences", 10))
+        session = Session(0, time.monotonic(), board_size, fences_per_player)  # Raises ValueError for a bad size
+        session_id = session.session_id = next(self._session_ids)
+        session.seats[1] = connection
+        connection.seats[session_id] = 1
+        self._sessions[session_id] = session
+        if self._journal is not None:
+            self._journal.attach(session_id, session.game)
+        return {"ok": True, "session": session_id, "player": 1}
+
+    def handle_join(self, connection, request):
+        """
+        Seats the client in the free seat of a session, P2 unless P1 has left
+        """
+        session = self._sessions.get(request["session"])
+        if session is None:
+            return {"ok": False, "error": "no such session"}
+        for player_integer in (2, 1):
+            if session.seats[player_integer] is None:
+                session.seats[player_integer] = connection
+                connection.seats[session.session_id] = player_integer
+                session.last_active = time.monotonic()
+                self.notify(session, 3 - player_integer, {"event": "joined", "session": session.session_id,
+                                                          "player": player_integer})
+                return {"ok": True, "session": session.session_id, "player": player_integer}
+        return {"ok": False, "error": "session is full"}
+
+    def handle_move(self, connection, request):
+        """
+        Moves the client's pawn to the location in "to"
+        """
+        session, player_integer, error = self.seated_session(connection, request)
+        if error is not None:
+            return error
+        target_location = parse_location(request["to"])
+        return self.play(session, player_integer, "p", target_location)
+
+    def handle_fence(self, connection, request):
+        """
+        Places a fence of "kind" ("h" or "v") at the location in "at"
+        """
+        session, player_integer, error = self.seated_session(connection, request)
+        if error is not None:
+            return error
+        kind = request["kind"]
+        if kind not in ("h", "v"):
+            return {"ok": False, "error": "kind must be h or v"}
+        target_location = parse_location(request["at"])
+        return self.play(session, player_integer, kind, target_location)
+
+    def play(self, session, player_integer, kind, target_location):
+        """
+        Makes a move for a player after checking it is their turn, and tells the opponent about it
+        """
+        game = session.game
+        if session.winner:
+            return {"ok": False, "error": "game over"}
+        if game.turn_check(player_integer) is False:
+            return {"ok": False, "error": "not your turn"}
+        if kind == "p":
+            legal = game.move_pawn(player_integer, target_location)
+        else:
+            legal = game.place_fence(player_integer, kind, target_location)
+        if legal is not True:
+            return {"ok": False, "error": game.rejection_reason(player_integer, kind, target_location) or "illegal"}
+        self._moves += 1
+        if self._journal is not None:
+            self._journal.record_move(session.session_id, encode_move(kind, target_location, game.get_board_size()))
+        session.takeback = 0  # A move cancels any takeback that was asked for
+        if game.get_game_won() is True:
+            session.winner = player_integer
+            if self._journal is not None:
+                self._journal.record_result(session.session_id, player_integer)
+        self.notify(session, 3 - player_integer, {"event": "moved", "session": session.session_id,
+                                                  "player": player_integer, "kind": kind, "at": target_location,
+                                                  "winner": session.winner})
+        return {"ok": True, "turn": game.get_turn_count(), "winner": session.winner}
+
+    def handle_state(self, connection, request):
+        """
+        Returns the position of a session. Anyone can look, not just its players
+        """
+        session = self._sessions.get(request["session"])
+        if session is None:
+            return {"ok": False, "error": "no such session"}
+        return {"ok": True, "session": session.session_id, "state": session.get_state()}
+
+    def handle_resign(self, connection, request):
+        """
+        Ends the game with the opponent as the winner
+        """
+        session, player_integer, error = self.seated_session(connection, request)
+        if error is not None:
+            return error
+        if session.winner:
+            return {"ok": False, "error": "game over"}
+        session.winner = 3 - player_integer
+        if self._journal is not None:
+            self._journal.record_result(session.session_id, session.winner)
+        self.notify(session, 3 - player_integer, {"event": "resigned", "session": session.session_id,
+                                                  "player": player_integer, "winner": session.winner})
+        return {"ok": True, "winner": session.winner}
+
+    def handle_takeback(self, connection, request):
+        """
+        Asks to take back the last move. The move is only taken back once both players have asked, so the first
+        request is left pending and the opponent is told about it. A game that was resigned can't be taken back, but
+        a game won by a move can
+        """
+        session, player_integer, error = self.seated_session(connection, request)
+        if error is not None:
+            return error
+        game = session.game
+        if session.winner and game.get_game_won() is not True:
+            return {"ok": False, "error": "game over"}
+        if game.get_undo_count() == 0:
+            return {"ok": False, "error": "nothing to take back"}
+        if session.takeback in (0, player_integer):
+            session.takeback = player_integer
+            self.notify(session, 3 - player_integer, {"event": "takeback", "session": session.session_id,
+                                                      "player": player_integer, "pending": True})
+            return {"ok": True, "pending": True}
+        session.takeback = 0
+        game.undo()  # A journal records the position after the undo as a new snapshot
+        if session.winner:
+            session.winner = 0
+            if self._journal is not None:
+                self._journal.record_result(session.session_id, 0)
+        self.notify(session, 3 - player_integer, {"event": "takeback", "session": session.session_id,
+                                                  "player": player_integer, "pending": False,
+                                                  "turn": game.get_turn_count()})
+        return {"ok": True, "pending": False, "turn": game.get_turn_count(), "winner": session.winner}
+
+    def handle_stats(self, connection, request):
+        """
+        Returns server wide figures, including the memory used by each new session
+        """
+        reply = {"ok": True, "sessions": len(self._sessions), "moves": self._moves, "evicted": self._evicted,
+                 "memory_per_session": self.get_memory_per_session()}
+        if self._journal is not None:
+            journal = self._journal
+            reply["journal"] = {"records": journal.get_record_count(), "commits": journal.get_commit_count(),
+                                "compactions": journal.get_compaction_count(), "bytes": journal.get_file_bytes()}
+        return reply
+
+    # ------------------------------------------------------------------------------------------------------------------
+    #                                               Idle Sessions
+
+    async def sweep(self):
+        """
+        Background task that evicts idle sessions every sweep_interval seconds
+        """
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            self.evict_idle(time.monotonic())
+
+    def evict_idle(self, now):
+        """
+        Removes every session that has been idle for longer than idle_timeout and tells its players. Returns how many
+        were removed
+        """
+        cutoff = now - self._idle_timeout
+        idle = [session for session in self._sessions.values() if session.last_active < cutoff]
+        for session in idle:
+            del self._sessions[session.session_id]
+            if self._journal is not None:
+                self._journal.detach(session.session_id)
+            for player_integer in (1, 2):
+                connection = session.seats[player_integer]
+                if connection is not None:
+                    connection.seats.pop(session.session_id, None)
+                    connection.send({"event": "evicted", "session": session.session_id})
+        self._evicted += len(idle)
+        return len(idle)
+
+
+def main():
+    """
+    Runs a server on the port given on the command line, 8162 by default, journaling to the path given after it if
+    there is one
+    """
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8162
+    journal_path = sys.argv[2] if len(sys.argv) > 2 else None
+    server = QuoridorServer(port=port, journal_path=journal_path)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
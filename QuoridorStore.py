@@ -0,0 +1,218 @@
+# Description: On-disk stores of Quoridor positions. A store file is a short header followed by positions packed with
+#              QuoridorGame.to_bytes, all the same width, so a reader can memory-map the file and get at any position
+#              by index without loading or copying the rest. Every position in a store is on the same size of board,
+#              which is told apart by the width of the positions.
+
+import mmap
+import os
+import struct
+
+from Quoridor import BOARD_SIZE, MAX_BOARD_SIZE, MIN_BOARD_SIZE, QuoridorGame, position_bytes
+
+STORE_MAGIC = b"QPOS"
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct("<4sHHQ")  # Magic, version, bytes per position, number of positions
+
+
+class PositionWriter:
+    """
+    Writes positions to a store file one after another. The position count in the header is filled in by flush and
+    close, so a store that is still being written can be read up to its last flush
+    """
+
+    def __init__(self, path, append=False, board_size=BOARD_SIZE):
+        """
+        Opens a store file for positions on a board of board_size. An existing file is replaced, unless append is
+        True, in which case new positions go after the ones already in it (and it must hold the same board size)
+        """
+        self._path = path
+        self._board_size = board_size
+        self._record_bytes = position_bytes(board_size)
+        if append and os.path.exists(path):
+            self._file = open(path, "r+b")
+            header = self._file.read(STORE_HEADER.size)
+            if len(header) < STORE_HEADER.size:
+                self._file.close()
+                raise ValueError("%s is too short to be a position store" % path)
+            magic, version, record_bytes, count = STORE_HEADER.unpack(header)
+            try:
+                if check_header(path, magic, version, record_bytes) != board_size:
+                    raise ValueError("%s holds positions for a different board size" % path)
+            except ValueError:
+                self._file.close()
+                raise
+            #  Same as PositionStore, a count past the end of the file only keeps the positions that are really there,
+            #  rather than truncate padding the file out with zeros
+            file_bytes = os.fstat(self._file.fileno()).st_size
+            self._count = min(count, (file_bytes - STORE_HEADER.size) // self._record_bytes)
+            self._file.seek(STORE_HEADER.size + self._count * self._record_bytes)
+            self._file.truncate()
+        else:
+            self._file = open(path, "wb")
+            self._count = 0
+            self._file.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, self._record_bytes, 0))
+
+    def get_count(self):
+        """
+        Returns the number of positions in the store so far
+        """
+        return self._count
+
+    def write(self, game):
+        """
+        Adds a game's current position to the store. Raises ValueError if the game is on a different size of board
+        """
+        if game.get_board_size() != self._board_size:
+            raise ValueError("the store is for %dx%d boards" % (self._board_size, self._board_size))
+        self._file.write(game.to_bytes())
+        self._count += 1
+
+    def write_bytes(self, data):
+        """
+        Adds one or more positions that have already been packed with to_bytes, back to back
+        """
+        if len(data) % self._record_bytes != 0:
+            raise ValueError("data is not a whole number of %d byte positions" % self._record_bytes)
+        self._file.write(data)
+        self._count += len(data) // self._record_bytes
+
+    def flush(self):
+        """
+        Writes the position count into the header and pushes everything written so far out to the file
+        """
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, self._record_bytes, self._count))
+        self._file.seek(end)
+        self._file.flush()
+
+    def close(self):
+        """
+        Flushes and closes the file
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PositionStore:
+    """
+    Read-only view of a store file through a memory map. Indexing returns a memoryview of one packed position, straight
+    out of the mapped file, and get_game turns one into a QuoridorGame only when it is needed. The memoryviews must be
+    let go of before the store is closed
+    """
+
+    def __init__(self, path):
+        """
+        Memory-maps a store file. Raises ValueError if the file isn't a store of positions in the current format
+        """
+        self._path = path
+        self._file = open(path, "rb")
+        header = self._file.read(STORE_HEADER.size)
+        if len(header) < STORE_HEADER.size:
+            self._file.close()
+            raise ValueError("%s is too short to be a position store" % path)
+        magic, version, record_bytes, count = STORE_HEADER.unpack(header)
+        try:
+            self._board_size = check_header(path, magic, version, record_bytes)
+        except ValueError:
+            self._file.close()
+            raise
+        self._record_bytes = record_bytes
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        #  A writer that didn't get to close may have left positions past the count, or a count past the end
+        self._count = min(count, (len(self._map) - STORE_HEADER.size) // record_bytes)
+        self._records = memoryview(self._map)[STORE_HEADER.size:STORE_HEADER.size + self._count * record_bytes]
+
+    def __len__(self):
+        return self._count
+
+    def get_board_size(self):
+        """
+        Returns the size of the board the positions in the store are on
+        """
+        return self._board_size
+
+    def get_record_bytes(self):
+        """
+        Returns the width of one packed position
+        """
+        return self._record_bytes
+
+    def __getitem__(self, index):
+        """
+        Returns the packed position at index as a memoryview. Negative indexes count back from the end
+        """
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("position index out of range")
+        start = index * self._record_bytes
+        return self._records[start:start + self._record_bytes]
+
+    def __iter__(self):
+        """
+        Goes through the packed positions in order, as memoryviews
+        """
+        records = self._records
+        record_bytes = self._record_bytes
+        for start in range(0, self._count * record_bytes, record_bytes):
+            yield records[start:start + record_bytes]
+
+    def get_records(self):
+        """
+        Returns a memoryview of every packed position back to back, for handing to code that reads them in bulk (for
+        example numpy.frombuffer)
+        """
+        return self._records
+
+    def get_game(self, index):
+        """
+        Unpacks the position at index into a new QuoridorGame
+        """
+        return QuoridorGame.from_bytes(self[index], self._board_size)
+
+    def iter_games(self):
+        """
+        Goes through the positions in order as QuoridorGame objects
+        """
+        for record in self:
+            yield QuoridorGame.from_bytes(record, self._board_size)
+
+    def close(self):
+        """
+        Unmaps and closes the file
+        """
+        if self._map is not None:
+            self._records.release()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def check_header(path, magic, version, record_bytes):
+    """
+    Checks a store header against the format this module reads and writes, and returns the board size that matches
+    the width of its positions. Raises ValueError if the header isn't one this module can read
+    """
+    if magic != STORE_MAGIC:
+        raise ValueError("%s is not a position store" % path)
+    if version != STORE_VERSION:
+        raise ValueError("%s has version %d, expected version %d" % (path, version, STORE_VERSION))
+    for board_size in range(MIN_BOARD_SIZE, MAX_BOARD_SIZE + 1):
+        if position_bytes(board_size) == record_bytes:
+            return board_size
+    raise ValueError("%s has %d byte positions, which don't match any board size" % (path, record_bytes))
@@ -0,0 +1,247 @@
+# Description: Endgame tablebase for positions where neither player has a fence left. With no fences to place, the
+#              result only depends on the two pawn squares, the fences already on the board and whose turn it is, so
+#              every such position for a fence layout is solved exactly with retrograde analysis and looked up from
+#              then on. Solved layouts are kept in a least recently used cache.
+
+import time
+from array import array
+from collections import OrderedDict
+
+from Quoridor import BOARD_SIZE, PAWN_MOVE, _square_moves
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+SOLVE_SECONDS_PER_STATE = 6e-6  # Rough cost of solving one state, used until the tablebase has timed a solve
+
+
+class RaceTable:
+    """
+    Every fenceless position for one fence layout, solved. For each position it stores the result for the player to
+    move (WIN, LOSS or DRAW) and how many plies it takes to reach the end of the game with best play: the winner
+    heads for the quickest win and the loser holds out for as long as possible. A draw means neither pawn can ever be
+    forced home, or the player to move has no move at all
+    """
+
+    def __init__(self, h_fences, v_fences, board_size=BOARD_SIZE):
+        """
+        Solves the layout given by the two fence masks on a board of board_size
+        """
+        self._h_fences = h_fences
+        self._v_fences = v_fences
+        self._size = board_size
+        self._square_count = board_size * board_size
+        self._pawn_moves = [_square_moves(square, h_fences, v_fences, board_size)
+                            for square in range(self._square_count)]
+        state_count = self._square_count * self._square_count * 2
+        self._results = array("b", bytes(state_count))
+        self._plies = array("H", bytes(2 * state_count))
+        self.solve()
+
+    def get_fence_masks(self):
+        """
+        Returns the fence layout the table was solved for as (horizontal mask, vertical mask)
+        """
+        return self._h_fences, self._v_fences
+
+    def get_board_size(self):
+        """
+        Returns the size of the board the table was solved for
+        """
+        return self._size
+
+    def state_index(self, p1_square, p2_square, player_integer):
+        """
+        Returns the index of a position in the table: both pawn squares and the player to move
+        """
+        return (((p1_square * self._square_count) + p2_square) << 1) | (player_integer - 1)
+
+    def successors(self, p1_square, p2_square, player_integer):
+        """
+        Lists the positions the player to move can reach with one pawn move, as state indexes
+        """
+        if player_integer == 1:
+            moves = self._pawn_moves[p1_square]
+            return [self.state_index(target, p2_square, 2) for target in moves.get(p2_square, moves[-1])]
+        else:
+            moves = self._pawn_moves[p2_square]
+            return [self.state_index(p1_square, target, 1) for target in moves.get(p1_square, moves[-1])]
+
+    def solve(self):
+        """
+        Retrograde analysis. Finished games (the player who just moved is on their goal row) are losses in 0 for the
+        player to move. Working back one ply at a time, a position with a move into a loss is a win, and a position
+        whose moves all lead to wins is a loss. Positions never settled this way are draws
+        """
+        results = self._results
+        plies = self._plies
+        predecessors = [[] for _ in range(len(results))]
+        unresolved = array("B", bytes(len(results)))
+        frontier = []
+        size = self._size
+        for p1_square in range(self._square_count):
+            for p2_square in range(self._square_count):
+                if p1_square == p2_square:
+                    continue
+                p1_home = p1_square // size == size - 1
+                p2_home = p2_square // size == 0
+                for player_integer in (1, 2):
+                    index = self.state_index(p1_square, p2_square, player_integer)
+                    if (p2_home if player_integer == 1 else p1_home):
+                        results[index] = LOSS  # The other player has just reached their goal row
+                        frontier.append(index)
+                        continue
+                    if (p1_home if player_integer == 1 else p2_home):
+                        results[index] = WIN  # Can only be set up by hand, the game was already over
+                        continue
+                    successors = self.successors(p1_square, p2_square, player_integer)
+                    unresolved[index] = len(successors)
+                    for successor in successors:
+                        predecessors[successor].append(index)
+
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for index in frontier:
+                lost = results[index] == LOSS
+                for predecessor in predecessors[index]:
+                    if unresolved[predecessor] == 0:
+                        continue  # Already settled
+                    if lost:
+                        unresolved[predecessor] = 0
+                        results[predecessor] = WIN
+                        plies[predecessor] = depth
+                        next_frontier.append(predecessor)
+                    else:
+                        unresolved[predecessor] -= 1
+                        if unresolved[predecessor] == 0:
+                            results[predecessor] = LOSS
+                            plies[predecessor] = depth
+                            next_frontier.append(predecessor)
+            frontier = next_frontier
+
+    def probe(self, p1_square, p2_square, player_integer):
+        """
+        Returns (result, plies) for the player to move in a position
+        """
+        index = self.state_index(p1_square, p2_square, player_integer)
+        return self._results[index], self._plies[index]
+
+    def best_target(self, p1_square, p2_square, player_integer):
+        """
+        Returns the square the player to move should step to: the quickest win if there is one, otherwise a draw,
+        otherwise the slowest loss. Returns None if the pawn can't move
+        """
+        best_square = None
+        best_key = None
+        if player_integer == 1:
+            moves = self._pawn_moves[p1_square]
+            targets = moves.get(p2_square, moves[-1])
+        else:
+            moves = self._pawn_moves[p2_square]
+            targets = moves.get(p1_square, moves[-1])
+        for target in sorted(targets):
+            if player_integer == 1:
+                result, plies = self.probe(target, p2_square, 2)
+            else:
+                result, plies = self.probe(p1_square, target, 1)
+            #  The result is the opponent's, so their loss sorts first, then the fewest plies when winning and the
+            #  most plies when losing
+            key = (result, plies if result == LOSS else -plies)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_square = target
+        return best_square
+
+
+class Tablebase:
+    """
+    Looks fenceless positions up in RaceTables, solving each fence layout the first time it is seen. At most capacity
+    layouts are kept, and the one used least recently is dropped to make room
+    """
+
+    def __init__(self, capacity=16):
+        """
+        Creates an empty tablebase that keeps up to capacity solved layouts
+        """
+        self._capacity = capacity
+        self._tables = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._seconds_per_state = SOLVE_SECONDS_PER_STATE
+
+    def get_table(self, h_fences, v_fences, board_size=BOARD_SIZE, solve=True):
+        """
+        Returns the RaceTable for a fence layout, solving it if it isn't cached. With solve=False a layout that isn't
+        cached gives None instead, for callers that can't wait for a solve
+        """
+        key = (board_size, h_fences, v_fences)
+        table = self._tables.get(key)
+        if table is not None:
+            self._hits += 1
+            self._tables.move_to_end(key)
+            return table
+        if not solve:
+            return None
+        self._misses += 1
+        start = time.perf_counter()
+        table = RaceTable(h_fences, v_fences, board_size)
+        #  Keep the slowest rate seen, so estimates err on the side of not starting a solve
+        seconds_per_state = (time.perf_counter() - start) / (2 * board_size ** 4)
+        self._seconds_per_state = max(self._seconds_per_state, seconds_per_state)
+        self._tables[key] = table
+        if len(self._tables) > self._capacity:
+            self._tables.popitem(last=False)
+        return table
+
+    def get_cache_stats(self):
+        """
+        Returns (layouts cached, hits, misses), where misses counts the layouts that had to be solved
+        """
+        return len(self._tables), self._hits, self._misses
+
+    def estimate_solve_seconds(self, board_size=BOARD_SIZE):
+        """
+        Returns about how long solving one layout on a board of board_size takes, from the slowest solve timed so far
+        """
+        return 2 * board_size ** 4 * self._seconds_per_state
+
+    @staticmethod
+    def covers(game):
+        """
+        Returns True if the game is in a position the tablebase can answer: nobody has won and neither player has a
+        fence left
+        """
+        return game.get_game_won() is not True and game.get_fences_left(1) == 0 and game.get_fences_left(2) == 0
+
+    def probe(self, game, solve=True):
+        """
+        Returns (result, plies) for the player to move in a game, or None if the tablebase doesn't cover the position
+        (or, with solve=False, if its layout hasn't been solved yet)
+        """
+        if not self.covers(game):
+            return None
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        h_fences, v_fences = game.get_fence_masks()
+        table = self.get_table(h_fences, v_fences, game.get_board_size(), solve)
+        if table is None:
+            return None
+        return table.probe(game.get_pawn_square(1), game.get_pawn_square(2), player_integer)
+
+    def best_move(self, game, solve=True):
+        """
+        Returns the best pawn move for the player to move as a compact move, or None if the tablebase doesn't cover
+        the position (or, with solve=False, hasn't solved its layout yet) or the pawn can't move
+        """
+        if not self.covers(game):
+            return None
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        h_fences, v_fences = game.get_fence_masks()
+        table = self.get_table(h_fences, v_fences, game.get_board_size(), solve)
+        if table is None:
+            return None
+        target = table.best_target(game.get_pawn_square(1), game.get_pawn_square(2), player_integer)
+        if target is None:
+            return None
+        return (target << 2) | PAWN_MOVE
@@ -0,0 +1,398 @@
+# Description: Engine tournaments for tuning Quoridor players. Plays round robin or gauntlet matches between engines
+#              under the rules in QuoridorGame, spread over a process pool one game per worker at a time. Every finished
+#              game is appended to a checkpoint file, so a run that is stopped can be started again and only plays the
+#              games that are missing. Results are reported as Elo ratings with 95% error bars.
+#
+#              python QuoridorTournament.py --player ab=alphabeta --player mc=mcts:playouts=400 --games 20 \
+#                                           --move-time 0.1 --checkpoint tournament.jsonl
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Quoridor import BOARD_SIZE, QuoridorGame, decode_move
+from QuoridorEngine import AlphaBetaEngine
+from QuoridorMCTS import MCTSEngine
+
+#  A player: its name in the results, the kind of engine (a key of ENGINE_KINDS) and the keyword arguments for it
+PlayerSpec = namedtuple("PlayerSpec", ["name", "engine", "options"])
+#  One scheduled game: its number in the schedule, the names of the players moving first and second, and its seed
+Match = namedtuple("Match", ["game_id", "first", "second", "seed"])
+
+PRIOR_GAMES = 2  # Virtual games each player gets against a 0 rated opponent (scoring half), so ratings stay finite
+ELO_PER_NATURAL_UNIT = 400 / math.log(10)
+
+
+class RandomPlayer:
+    """
+    Baseline player that picks uniformly among the legal moves
+    """
+
+    def __init__(self, seed=None):
+        """
+        Creates a player with its own random number generator
+        """
+        self._rng = random.Random(seed)
+
+    def choose_move(self, game):
+        """
+        Returns a random legal move as a (kind, target location) tuple, or None if there are none
+        """
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        moves = game.legal_moves(player_integer, compact=True)
+        if len(moves) == 0:
+            return None
+        return decode_move(moves[self._rng.randrange(len(moves))], game.get_board_size())
+
+
+ENGINE_KINDS = {"alphabeta": AlphaBetaEngine, "mcts": MCTSEngine, "random": RandomPlayer}
+
+
+def make_engine(spec, move_time, seed):
+    """
+    Builds the engine for a player. Engines that take a time limit get the tournament's move time unless the spec
+    sets its own, engines that take a seed get the game's seed, and the tree search is kept to one process since the
+    tournament already uses every core
+    """
+    options = dict(spec.options)
+    if spec.engine in ("alphabeta", "mcts"):
+        options.setdefault("time_limit", move_time)
+    if spec.engine in ("mcts", "random"):
+        options.setdefault("seed", seed)
+    if spec.engine == "mcts":
+        options.setdefault("workers", 1)
+    return ENGINE_KINDS[spec.engine](**options)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   Scheduling
+
+def round_robin(players, games_per_pair, seed=0):
+    """
+    Schedules games_per_pair games between every pair of players, taking turns at moving first
+    """
+    names = [player.name for player in players]
+    pairs = [(names[first], names[second]) for first in range(len(names)) for second in range(first + 1, len(names))]
+    return schedule_pairs(pairs, games_per_pair, seed)
+
+
+def gauntlet(challengers, opponents, games_per_pair, seed=0):
+    """
+    Schedules games_per_pair games between each challenger and each opponent, taking turns at moving first
+    """
+    pairs = [(challenger.name, opponent.name) for challenger in challengers for opponent in opponents]
+    return schedule_pairs(pairs, games_per_pair, seed)
+
+
+def schedule_pairs(pairs, games_per_pair, seed):
+    """
+    Lists the matches for a list of pairs of player names. The rounds are interleaved, so that a run stopped part way
+    through has played about the same number of games for every pair, and each game gets its own seed
+    """
+    rng = random.Random(seed)
+    matches = []
+    for round_number in range(games_per_pair):
+        for first, second in pairs:
+            if round_number % 2 == 1:
+                first, second = second, first
+            matches.append(Match(len(matches), first, second, rng.getrandbits(32)))
+    return matches
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   Playing
+
+def play_match(match, players, move_time, grace=0.1, max_plies=400, board_size=BOARD_SIZE, fences_per_player=10):
+    """
+    Plays one scheduled game and returns its record as a dictionary. A player loses straight away by taking longer than
+    move_time plus grace for a move, by making an illegal move, by having no move or by raising an error. A game that
+    reaches max_plies is a draw. result is the score of the player who moved first: 1, 0.5 or 0
+    """
+    started = time.perf_counter()
+    engines = {}
+    for side, name in enumerate((match.first, match.second)):
+        engines[name] = make_engine(players[name], move_time, match.seed + side)
+    game = QuoridorGame(board_size, fences_per_player)
+    result, reason = 0.5, "max plies"
+    try:
+        while game.get_turn_count() <= max_plies:
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            name = match.first if player_integer == 1 else match.second
+            move_start = time.perf_counter()
+            try:
+                move = engines[name].choose_move(game)
+            except Exception as error:
+                result, reason = (0 if player_integer == 1 else 1), "error: %s" % error
+                break
+            if time.perf_counter() - move_start > move_time + grace:
+                result, reason = (0 if player_integer == 1 else 1), "time"
+                break
+            if move is None:
+                result, reason = (0 if player_integer == 1 else 1), "no moves"
+                break
+            kind, target_location = move
+            if kind == "p":
+                legal = game.move_pawn(player_integer, target_location)
+            else:
+                legal = game.place_fence(player_integer, kind, target_location)
+            if legal is not True:
+                result, reason = (0 if player_integer == 1 else 1), "illegal move"
+                break
+            if game.get_game_won() is True:
+                result, reason = (1 if player_integer == 1 else 0), "goal"
+                break
+    finally:
+        for engine in engines.values():
+            if hasattr(engine, "close"):
+                engine.close()
+    return {"game": match.game_id, "first": match.first, "second": match.second, "result": result,
+            "reason": reason, "plies": game.get_turn_count() - 1, "seconds": round(time.perf_counter() - started, 3)}
+
+
+class Tournament:
+    """
+    Runs a list of matches over a process pool and keeps the finished games in a checkpoint file of JSON lines. The
+    first line of the file describes the tournament, and every line after it is one finished game
+    """
+
+    def __init__(self, players, matches, checkpoint, move_time=0.1, grace=0.1, max_plies=400, board_size=BOARD_SIZE,
+                 fences_per_player=10, workers=None):
+        """
+        Sets up a tournament between a list of PlayerSpecs. workers defaults to the number of cores
+        """
+        self._players = {player.name: player for player in players}
+        if len(self._players) != len(players):
+            raise ValueError("player names must be different")
+        for player in players:
+            if player.engine not in ENGINE_KINDS:
+                raise ValueError("unknown engine %r, expected one of %s" % (player.engine, ", ".join(ENGINE_KINDS)))
+        self._matches = matches
+        self._checkpoint = checkpoint
+        self._settings = {"move_time": move_time, "grace": grace, "max_plies": max_plies, "board_size": board_size,
+                          "fences_per_player": fences_per_player}
+        self._workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._results = {}
+
+    def get_results(self):
+        """
+        Returns the records of the finished games, in schedule order
+        """
+        return [self._results[game_id] for game_id in sorted(self._results)]
+
+    def describe(self):
+        """
+        Returns the dictionary written at the top of the checkpoint, which a resumed run must match
+        """
+        return {"players": [[player.name, player.engine, player.options] for player in self._players.values()],
+                "matches": [list(match) for match in self._matches],
+                "settings": self._settings}
+
+    def load_checkpoint(self):
+        """
+        Reads the games finished by an earlier run from the checkpoint, if there is one. Raises ValueError if it was
+        written for a different tournament. A last line cut short by a crash is ignored
+        """
+        self._results = {}
+        if not os.path.exists(self._checkpoint):
+            return
+        with open(self._checkpoint) as lines:
+            header = lines.readline()
+            if not header:
+                return
+            if json.loads(header) != {"tournament": json.loads(json.dumps(self.describe()))}:
+                raise ValueError("%s is the checkpoint of a different tournament" % self._checkpoint)
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._results[record["game"]] = record
+
+    def run(self, progress=None):
+        """
+        Plays every match not already in the checkpoint, appending each game to the checkpoint as it finishes, and
+        returns the records of every game. progress, if given, is called with each new record
+        """
+        self.load_checkpoint()
+        pending = [match for match in self._matches if match.game_id not in self._results]
+        with open(self._checkpoint, "a+") as checkpoint:
+            checkpoint.seek(0)
+            if not checkpoint.read(1):
+                checkpoint.write(json.dumps({"tournament": self.describe()}) + "\n")
+            else:
+                #  Start from the last whole line, dropping anything a crash left half written
+                checkpoint.seek(0)
+                whole = checkpoint.read().rsplit("\n", 1)[0] + "\n"
+                checkpoint.seek(0)
+                checkpoint.truncate()
+                checkpoint.write(whole)
+            checkpoint.flush()
+            for record in self.play(pending):
+                self._results[record["game"]] = record
+                checkpoint.write(json.dumps(record) + "\n")
+                checkpoint.flush()
+                if progress is not None:
+                    progress(record)
+        return self.get_results()
+
+    def play(self, matches):
+        """
+        Generator that plays matches and yields their records as they finish, in this process when there is one worker
+        and over a process pool otherwise
+        """
+        settings = self._settings
+        arguments = (self._players, settings["move_time"], settings["grace"], settings["max_plies"],
+                     settings["board_size"], settings["fences_per_player"])
+        if self._workers <= 1:
+            for match in matches:
+                yield play_match(match, *arguments)
+            return
+        with ProcessPoolExecutor(self._workers) as pool:
+            futures = [pool.submit(play_match, match, *arguments) for match in matches]
+            for future in as_completed(futures):
+                yield future.result()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   Ratings
+
+def rate(results, names, iterations=10000, tolerance=1e-10):
+    """
+    Fits Bradley-Terry ratings to game records by the minorization-maximization method, with draws counted as half a
+    win for each side and PRIOR_GAMES virtual games against a 0 rated player to keep every rating finite. Returns a
+    dictionary of name -> (Elo, 95% error margin, games, score), with the Elo ratings shifted to average 0. The error
+    margins treat the other players' ratings as exact
+    """
+    index = {name: number for number, name in enumerate(names)}
+    count = len(names)
+    wins = [PRIOR_GAMES / 2] * count
+    games = [[0] * count for _ in range(count)]
+    played = [0] * count
+    scored = [0.0] * count
+    for record in results:
+        first = index[record["first"]]
+        second = index[record["second"]]
+        wins[first] += record["result"]
+        wins[second] += 1 - record["result"]
+        games[first][second] += 1
+        games[second][first] += 1
+        played[first] += 1
+        played[second] += 1
+        scored[first] += record["result"]
+        scored[second] += 1 - record["result"]
+
+    strength = [1.0] * count
+    for _ in range(iterations):
+        change = 0.0
+        for player in range(count):
+            expected = PRIOR_GAMES / (strength[player] + 1.0)
+            for other in range(count):
+                if games[player][other]:
+                    expected += games[player][other] / (strength[player] + strength[other])
+            updated = wins[player] / expected
+            change = max(change, abs(math.log(updated / strength[player])))
+            strength[player] = updated
+        if change < tolerance:
+            break
+
+    ratings = {}
+    logs = [math.log(value) for value in strength]
+    mean = sum(logs) / count
+    for player, name in enumerate(names):
+        information = PRIOR_GAMES * fisher_information(strength[player], 1.0)
+        for other in range(count):
+            if games[player][other]:
+                information += games[player][other] * fisher_information(strength[player], strength[other])
+        margin = 1.96 * ELO_PER_NATURAL_UNIT / math.sqrt(information)
+        score = scored[player] / played[player] if played[player] else 0.0
+        ratings[name] = ((logs[player] - mean) * ELO_PER_NATURAL_UNIT, margin, played[player], score)
+    return ratings
+
+
+def fisher_information(strength, other_strength):
+    """
+    Returns p * (1 - p), where p is the chance the first player beats the second: how much one game between them
+    tells about the difference in their ratings
+    """
+    chance = strength / (strength + other_strength)
+    return chance * (1 - chance)
+
+
+def format_report(results, names):
+    """
+    Returns the ratings table and the reasons games ended, as text
+    """
+    ratings = rate(results, names)
+    lines = ["%-16s %8s %8s %6s %7s" % ("player", "elo", "+/-", "games", "score")]
+    for name in sorted(names, key=lambda name: -ratings[name][0]):
+        elo, margin, played, score = ratings[name]
+        lines.append("%-16s %8.1f %8.1f %6d %6.1f%%" % (name, elo, margin, played, 100 * score))
+    reasons = {}
+    for record in results:
+        reason = record["reason"].split(":")[0]
+        reasons[reason] = reasons.get(reason, 0) + 1
+    lines.append("games ended by: " + ", ".join("%s %d" % item for item in sorted(reasons.items())))
+    return "\n".join(lines)
+
+
+def parse_player(text):
+    """
+    Turns "name=engine:key=value,key=value" into a PlayerSpec. Values are read as numbers where they look like one
+    """
+    name, _, rest = text.partition("=")
+    engine, _, option_text = rest.partition(":")
+    options = {}
+    for item in filter(None, option_text.split(",")):
+        key, _, value = item.partition("=")
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        options[key] = value
+    return PlayerSpec(name, engine or name, options)
+
+
+def main():
+    """
+    Runs a tournament from the command line and prints the ratings
+    """
+    parser = argparse.ArgumentParser(description="Play a Quoridor engine tournament and estimate Elo ratings")
+    parser.add_argument("--player", action="append", required=True,
+                        help="name=engine[:key=value,...], engine is one of " + ", ".join(ENGINE_KINDS))
+    parser.add_argument("--gauntlet", action="store_true", help="the first player plays every other player")
+    parser.add_argument("--games", type=int, default=10, help="games per pair of players")
+    parser.add_argument("--move-time", type=float, default=0.1, help="seconds per move")
+    parser.add_argument("--grace", type=float, default=0.1, help="seconds over the move time before a loss on time")
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--board-size", type=int, default=BOARD_SIZE)
+    parser.add_argument("--fences", type=int, default=10, help="fences per player")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, the number of cores by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", default="tournament.jsonl")
+    arguments = parser.parse_args()
+
+    players = [parse_player(text) for text in arguments.player]
+    if arguments.gauntlet:
+        matches = gauntlet(players[:1], players[1:], arguments.games, arguments.seed)
+    else:
+        matches = round_robin(players, arguments.games, arguments.seed)
+    tournament = Tournament(players, matches, arguments.checkpoint, arguments.move_time, arguments.grace,
+                            arguments.max_plies, arguments.board_size, arguments.fences, arguments.workers)
+
+    def progress(record):
+        print("game %d: %s - %s %s (%s, %d plies)" % (record["game"], record["first"], record["second"],
+                                                     {1: "1-0", 0: "0-1"}.get(record["result"], "draw"),
+                                                     record["reason"], record["plies"]))
+    results = tournament.run(progress)
+    print(format_report(results, [player.name for player in players]))
+
+
+if __name__ == "__main__":
+    main()
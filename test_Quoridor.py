@@ -0,0 +1,183 @@
+# Description: Tests for QuoridorGame. Checks the distance maps and neighbour table the game keeps up to date move by
+#              move against fresh breadth first searches and entries built from scratch, over random games that place
+#              fences, take moves back and copy themselves, the moves apply turns down, and which listeners are told
+#              about which changes.
+#
+#              Run "python -m pytest test_Quoridor.py" or "python -m unittest test_Quoridor".
+
+import copy
+import random
+import unittest
+
+import numpy as np
+
+from Quoridor import UNREACHABLE, QuoridorGame, _find_path, _square_moves
+
+
+class TestDistanceMaps(unittest.TestCase):
+    """
+    Randomized checks of the incremental distance maps against breadth first search
+    """
+
+    def assert_distances_match(self, game, label):
+        """
+        Checks both players' maps, whole and square by square, against compute_distance_map, and the pawns' distances
+        against _find_path, which searches the fence masks directly instead of the game's neighbour table. The
+        neighbour table itself, whose entries are shared between games, is checked against entries built from scratch
+        """
+        board_size = game.get_board_size()
+        h_fences, v_fences = game.get_fence_masks()
+        for square in range(board_size * board_size):
+            self.assertEqual(game._pawn_moves[square], _square_moves(square, h_fences, v_fences, board_size),
+                             (label, square))
+        for player_integer, goal_row in ((1, board_size - 1), (2, 0)):
+            expected_map = game.compute_distance_map(player_integer)
+            self.assertEqual(list(game.get_distance_map(player_integer)), expected_map, (label, player_integer))
+            self.assertEqual([game.get_distance(player_integer, square) for square in range(len(expected_map))],
+                             expected_map, (label, player_integer))
+            path = _find_path(game.get_pawn_square(player_integer), goal_row, h_fences, v_fences, board_size)
+            expected = UNREACHABLE if path is None else bin(path[0]).count("1") - 1
+            self.assertEqual(game.get_shortest_path_length(player_integer), expected, (label, player_integer))
+
+    def play_random_game(self, board_size, fences_per_player, seed, steps=150):
+        """
+        Plays random moves that favour fences, with undos mixed in, checking the distances after every change
+        """
+        rng = random.Random(seed)
+        game = QuoridorGame(board_size, fences_per_player)
+        for step in range(steps):
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            moves = [] if game.get_game_won() else game.legal_moves(player_integer, compact=True)
+            if not moves or (game.get_undo_count() and rng.random() < 0.25):
+                if not game.undo():
+                    break
+            else:
+                fences = [move for move in moves if move & 3]
+                move = rng.choice(fences) if fences and rng.random() < 0.7 else rng.choice(moves)
+                self.assertTrue(game.apply(move), (seed, step, move))
+            self.assert_distances_match(game, (seed, step))
+            if step % 30 == 29:
+                self.check_copies(game, (seed, step))
+
+    def check_copies(self, game, label):
+        """
+        Copies, and games unpacked with from_bytes, must carry working maps, and changes to a copy must not leak back
+        into the original
+        """
+        duplicate = copy.deepcopy(game)
+        self.assert_distances_match(duplicate, (label, "copy"))
+        duplicate.undo()
+        self.assert_distances_match(duplicate, (label, "copy undo"))
+        self.assert_distances_match(game, (label, "original"))
+        unpacked = QuoridorGame.from_bytes(game.to_bytes(), game.get_board_size(),
+                                            game.get_fences_per_player())
+        self.assertEqual(unpacked.to_bytes(), game.to_bytes(), label)
+        self.assertEqual(unpacked.get_hash(), game.get_hash(), label)
+        self.assertEqual(sorted(vars(unpacked)), sorted(vars(game)), label)  # from_bytes skips __init__
+        self.assert_distances_match(unpacked, (label, "from_bytes"))
+
+    def test_standard_board(self):
+        """
+        Random games on the 9x9 board
+        """
+        for seed in range(6):
+            self.play_random_game(9, 10, seed)
+
+    def test_other_board_sizes(self):
+        """
+        Random games on small and large boards, with enough fences to close off whole regions
+        """
+        for board_size, fences_per_player in ((3, 4), (5, 8), (7, 12), (11, 20)):
+            for seed in range(3):
+                self.play_random_game(board_size, fences_per_player, seed)
+
+
+class TestApply(unittest.TestCase):
+    """
+    Moves given to apply
+    """
+
+    def test_rejects_numbers_that_are_not_moves(self):
+        """
+        Compact moves that are negative, off the board or of an unknown kind are turned down without changing the game
+        """
+        for board_size in (5, 9):
+            game = QuoridorGame(board_size)
+            before = game.to_bytes()
+            square_count = board_size * board_size
+            for move in (-1, -4, square_count << 2, (square_count << 2) + 1, 3, (10 << 2) | 3):
+                self.assertFalse(game.apply(move), (board_size, move))
+            self.assertEqual(game.to_bytes(), before)
+            self.assertEqual(game.get_undo_count(), 0)
+
+    def test_compact_and_tuple_moves_agree(self):
+        """
+        Every legal move from legal_moves can be given to apply in either form, with the same result
+        """
+        game = QuoridorGame()
+        compact_moves = game.legal_moves(1, compact=True)
+        tuple_moves = game.legal_moves(1)
+        self.assertEqual(len(compact_moves), len(tuple_moves))
+        for compact_move, tuple_move in zip(compact_moves, tuple_moves):
+            self.assertTrue(game.apply(compact_move))
+            after = game.to_bytes()
+            game.undo()
+            self.assertTrue(game.apply(tuple_move))
+            self.assertEqual(game.to_bytes(), after, tuple_move)
+            game.undo()
+
+    def test_numpy_integers(self):
+        """
+        Compact moves read out of NumPy arrays are played like plain integers, and checked the same way
+        """
+        game = QuoridorGame()
+        moves = game.legal_moves(1, compact=True)
+        for dtype in (np.int64, np.uint16, np.int32):
+            for move in np.array(moves, dtype=dtype):
+                self.assertTrue(game.apply(move), (dtype, move))
+                self.assertEqual(game.get_undo_count(), 1)
+                game.undo()
+        self.assertFalse(game.apply(np.int64(-1)))
+        self.assertFalse(game.apply(np.uint16(81 << 2)))
+        self.assertEqual(game.get_undo_count(), 0)
+
+
+
+class TestListeners(unittest.TestCase):
+    """
+    Listeners told about the events they registered for
+    """
+
+    def test_listeners_only_get_their_events(self):
+        """
+        Each listener hears only the events it asked for, and nothing once removed
+        """
+        game = QuoridorGame()
+        heard = []
+
+        def everything(changed_game, event, move):
+            heard.append(("everything", event, move))
+
+        def undos(changed_game, event, move):
+            heard.append(("undos", event, move))
+
+        game.add_listener(everything)
+        game.add_listener(undos, ("undo",))
+        game.apply(("p", (4, 1)))
+        game.undo()
+        self.assertEqual(heard, [("everything", "move", 13 << 2), ("everything", "undo", None),
+                                 ("undos", "undo", None)])
+        game.remove_listener(everything)
+        del heard[:]
+        game.apply(("h", (4, 2)))
+        game.undo()
+        game.remove_listener(undos)
+        game.apply(("p", (4, 1)))
+        game.undo()
+        self.assertEqual(heard, [("undos", "undo", None)])
+        with self.assertRaises(ValueError):
+            game.add_listener(everything, ("moved",))
+
+
+if __name__ == "__main__":
+    unittest.main()
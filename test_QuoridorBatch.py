@@ -0,0 +1,101 @@
+# Description: Tests for QuoridorBatch. Plays random actions through a batch and through one QuoridorGame per game side
+#              by side, and checks that both agree on which actions are legal and on the positions they lead to.
+#
+#              Run "python -m pytest test_QuoridorBatch.py" or "python -m unittest test_QuoridorBatch".
+
+import unittest
+
+import numpy as np
+
+from Quoridor import QuoridorGame
+from QuoridorBatch import QuoridorBatch
+
+
+def game_state(game):
+    """
+    Returns everything a batch stores about one game, read from a QuoridorGame
+    """
+    h_fences, v_fences = game.get_fence_masks()
+    return (game.get_pawn_square(1), game.get_pawn_square(2), h_fences, v_fences, game.get_fences_left(1),
+            game.get_fences_left(2), game.get_turn_count(), game.get_game_won())
+
+
+def batch_state(batch, index):
+    """
+    Returns the same values as game_state for one game of a batch
+    """
+    h_fences = sum(1 << int(bit) for bit in np.nonzero(batch.h_fences[index])[0])
+    v_fences = sum(1 << int(bit) for bit in np.nonzero(batch.v_fences[index])[0])
+    return (int(batch.p1_square[index]), int(batch.p2_square[index]), h_fences, v_fences,
+            int(batch.fences_left[index, 0]), int(batch.fences_left[index, 1]), int(batch.turn_count[index]),
+            bool(batch.game_won[index]))
+
+
+class TestQuoridorBatch(unittest.TestCase):
+    """
+    Randomized comparison of QuoridorBatch against QuoridorGame
+    """
+
+    def play_random_actions(self, board_size, fences_per_player, steps, seed):
+        """
+        Steps a batch and a list of games through the same random actions, both ones drawn from action_mask and raw
+        action numbers, and compares legality and positions after every step
+        """
+        rng = np.random.default_rng(seed)
+        games = [QuoridorGame(board_size, fences_per_player) for _ in range(16)]
+        batch = QuoridorBatch.from_games(games)
+        for step in range(steps):
+            if step % 2 == 0:
+                actions = batch.random_actions(rng, fence_rate=0.6)
+            else:
+                actions = rng.integers(-1, batch.get_action_count(), len(games))
+            legal = batch.step(actions)
+            for index, game in enumerate(games):
+                action = int(actions[index])
+                self.assertEqual(bool(legal[index]), game.apply(action) is True,
+                                 (board_size, step, index, action))
+                self.assertEqual(batch_state(batch, index), game_state(game), (board_size, step, index))
+            finished = np.nonzero(batch.game_won)[0]
+            if finished.size:
+                batch.reset(finished)
+                for index in finished:
+                    games[index] = QuoridorGame(board_size, fences_per_player)
+
+    def test_matches_game_on_standard_board(self):
+        """
+        Random play on the 9x9 board with the usual ten fences each
+        """
+        self.play_random_actions(9, 10, 120, 1)
+
+    def test_matches_game_on_small_board(self):
+        """
+        Random play on a 5x5 board, where pawns meet and fences cut paths off much sooner
+        """
+        self.play_random_actions(5, 6, 120, 2)
+
+    def test_action_mask_covers_legal_moves(self):
+        """
+        Every legal move is in action_mask, and the only extra actions are fences that would cut a player off
+        """
+        rng = np.random.default_rng(3)
+        games = [QuoridorGame() for _ in range(8)]
+        batch = QuoridorBatch.from_games(games)
+        for step in range(60):
+            actions = batch.random_actions(rng, fence_rate=0.7)
+            batch.step(actions)
+            for index, game in enumerate(games):
+                if actions[index] >= 0:
+                    game.apply(int(actions[index]))
+            mask = batch.action_mask()
+            for index, game in enumerate(games):
+                if game.get_game_won():
+                    continue
+                player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+                legal = set(game.legal_moves(player_integer, compact=True))
+                masked = set(int(action) for action in np.nonzero(mask[index])[0])
+                self.assertTrue(legal <= masked, (step, index))
+                self.assertTrue(all(action & 3 != 0 for action in masked - legal), (step, index))
+
+
+if __name__ == "__main__":
+    unittest.main()
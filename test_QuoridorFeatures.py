@@ -0,0 +1,143 @@
+# Description: Tests for the feature planes and shards. Checks every plane against what QuoridorGame says about the same
+#              positions, and the labels and sizes of the shards ShardWriter writes out.
+#
+#              Run "python -m pytest test_QuoridorFeatures.py" or "python -m unittest test_QuoridorFeatures".
+
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from Quoridor import QuoridorGame, encode_move
+from QuoridorFeatures import FeatureExtractor, ShardWriter
+from QuoridorRecords import parse_move
+
+#  P1 walks straight up column e while P2 steps back and forth along the top row, so P1 wins on the 15th move
+WINNING_GAME = "e2 d9 e3 c9 e4 d9 e5 c9 e6 d9 e7 c9 e8 d9 e9".split()
+
+
+def random_games(seed, count, board_size):
+    """
+    Returns count games on a board of board_size, each after a different number of random legal moves
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = QuoridorGame(board_size, 8)
+        for _ in range(rng.randint(0, 30)):
+            if game.get_game_won():
+                break
+            game.apply(rng.choice(game.legal_moves(1 if game.get_turn_count() % 2 != 0 else 2, compact=True)))
+        games.append(game)
+    return games
+
+
+def mask_plane(mask, board_size):
+    """
+    Lays a fence mask out as a board_size x board_size array of 0s and 1s
+    """
+    bits = [(mask >> square) & 1 for square in range(board_size * board_size)]
+    return np.array(bits).reshape(board_size, board_size)
+
+
+class TestFeatureExtractor(unittest.TestCase):
+    """
+    Planes checked square by square against QuoridorGame
+    """
+
+    def check_planes(self, board_size):
+        """
+        Extracts the derived planes of random positions and compares each plane with the game it came from
+        """
+        games = random_games(board_size, 24, board_size)
+        extractor = FeatureExtractor(board_size, derived=True)
+        planes = extractor.from_games(games)
+        names = extractor.get_plane_names()
+        self.assertEqual(planes.shape, (len(games), len(names), board_size, board_size))
+        square_count = board_size * board_size
+        for index, game in enumerate(games):
+            plane = dict(zip(names, planes[index]))
+            h_fences, v_fences = game.get_fence_masks()
+            player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+            for name, square in (("p1_pawn", game.get_pawn_square(1)), ("p2_pawn", game.get_pawn_square(2))):
+                self.assertEqual(list(np.flatnonzero(plane[name])), [square], (index, name))
+            np.testing.assert_array_equal(plane["h_fences"], mask_plane(h_fences, board_size))
+            np.testing.assert_array_equal(plane["v_fences"], mask_plane(v_fences, board_size))
+            self.assertTrue((plane["p1_fences_left"] == game.get_fences_left(1)).all())
+            self.assertTrue((plane["p2_fences_left"] == game.get_fences_left(2)).all())
+            self.assertTrue((plane["p1_to_move"] == (player_integer == 1)).all())
+            for name, player in (("p1_distance", 1), ("p2_distance", 2)):
+                expected = np.minimum(game.get_distance_map(player), square_count).reshape(board_size, board_size)
+                np.testing.assert_array_equal(plane[name], expected, err_msg=str((index, name)))
+            targets = set(move >> 2 for move in game.legal_moves(player_integer, compact=True) if move & 3 == 0)
+            if not game.get_game_won():
+                self.assertEqual(set(np.flatnonzero(plane["pawn_targets"])), targets, index)
+
+    def test_standard_board(self):
+        """
+        Planes of random 9x9 positions
+        """
+        self.check_planes(9)
+
+    def test_small_board(self):
+        """
+        Planes of random 5x5 positions, where pawns meet and jumps show up in the pawn targets
+        """
+        self.check_planes(5)
+
+
+class TestShardWriter(unittest.TestCase):
+    """
+    Shards written to a temporary directory
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def load(self, shard, part):
+        """
+        Loads one file of a shard
+        """
+        return np.load(os.path.join(self._directory.name, "shard-%05d-%s.npy" % (shard, part)))
+
+    def test_records_are_labelled(self):
+        """
+        A won record adds the position before each move, labelled with the move and the result for the side to move,
+        split into shards of shard_size. Records with an illegal move add nothing
+        """
+        extractor = FeatureExtractor()
+        with ShardWriter(self._directory.name, extractor, shard_size=4) as writer:
+            self.assertFalse(writer.add_record(["e2", "e8", "e5"]))
+            self.assertTrue(writer.add_record(WINNING_GAME))
+        self.assertEqual(writer.get_position_count(), len(WINNING_GAME))
+        self.assertEqual(writer.get_shard_count(), 4)
+        outcome = np.concatenate([self.load(shard, "outcome") for shard in range(4)])
+        moves = np.concatenate([self.load(shard, "move") for shard in range(4)])
+        planes = np.concatenate([self.load(shard, "planes") for shard in range(4)])
+        self.assertEqual(len(self.load(3, "planes")), 3)
+        self.assertEqual(list(outcome), [1, -1] * 7 + [1])  # P1 won, and P1 is to move in the even positions
+        self.assertEqual(list(moves), [encode_move(*parse_move(token)) for token in WINNING_GAME])
+        expected = extractor.from_games([QuoridorGame()])
+        np.testing.assert_array_equal(planes[0], expected[0])
+
+    def test_packed_records(self):
+        """
+        Packed positions added in bulk come out with no outcome or move, and the same planes as the games
+        """
+        games = random_games(7, 10, 9)
+        extractor = FeatureExtractor()
+        with ShardWriter(self._directory.name, extractor, shard_size=6) as writer:
+            writer.add_records(b"".join(game.to_bytes() for game in games))
+        planes = np.concatenate([self.load(0, "planes"), self.load(1, "planes")])
+        np.testing.assert_array_equal(planes, extractor.from_games(games))
+        self.assertTrue((self.load(1, "outcome") == 0).all())
+        self.assertTrue((self.load(1, "move") == -1).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
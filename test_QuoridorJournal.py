@@ -0,0 +1,205 @@
+# Description: Tests for the move journal: sessions come back from a reopened journal as they were last committed,
+#              including after undos, results, closed sessions and runs of moves split over several records, a torn or
+#              corrupt tail is thrown away, and compaction keeps the file small without losing anything.
+#
+#              Run "python -m pytest test_QuoridorJournal.py" or "python -m unittest test_QuoridorJournal".
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from Quoridor import QuoridorGame
+from QuoridorJournal import MOVE, MoveJournal, read_batches, read_records, replay_journal
+
+
+def play_random_moves(game, rng, count, journal=None, session_id=None):
+    """
+    Makes up to count random legal moves, stopping early if the game is won, and passes each one to the journal the
+    way the server does, if one is given
+    """
+    for _ in range(count):
+        if game.get_game_won():
+            return
+        move = rng.choice(game.legal_moves(1 if game.get_turn_count() % 2 != 0 else 2, compact=True))
+        game.apply(move)
+        if journal is not None:
+            journal.record_move(session_id, move)
+
+
+def recovered_state(sessions):
+    """
+    Turns what open or replay_journal returns into session id -> (packed position, winner), for comparing
+    """
+    return {session_id: (game.to_bytes(), winner) for session_id, (game, winner) in sessions.items()}
+
+
+class TestMoveJournal(unittest.TestCase):
+    """
+    Journals in a temporary directory, reopened the way a restarted server would
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "moves.qjnl")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def read_file(self):
+        """
+        Returns the bytes in the journal file
+        """
+        with open(self._path, "rb") as file:
+            return file.read()
+
+    def reopen(self, data=None):
+        """
+        Opens a new journal on the file, after replacing its contents with data if given, and returns the journal and
+        the recovered state
+        """
+        if data is not None:
+            with open(self._path, "wb") as file:
+                file.write(data)
+        journal = MoveJournal(self._path, sync=False)
+        return journal, recovered_state(journal.open())
+
+    def test_sessions_come_back(self):
+        """
+        Moves, undos, loaded positions and results are all recovered, in the order they happened within a commit, and
+        closed sessions are not
+        """
+        rng = random.Random(1)
+        journal = MoveJournal(self._path, sync=False)
+        self.assertEqual(journal.open(), {})
+        games = {session_id: QuoridorGame(size, 5) for session_id, size in ((1, 9), (2, 5), (3, 7))}
+        for session_id, game in games.items():
+            journal.attach(session_id, game)
+            play_random_moves(game, rng, 12, journal, session_id)
+        journal.commit()
+        play_random_moves(games[1], rng, 3, journal, 1)
+        games[1].undo()
+        games[1].undo()
+        play_random_moves(games[1], rng, 2, journal, 1)
+        play_random_moves(games[2], rng, 3, journal, 2)
+        scratch = QuoridorGame(7, 5)
+        play_random_moves(scratch, rng, 8)
+        games[3].load_position(scratch.get_pawn_square(1), scratch.get_pawn_square(2), *scratch.get_fence_masks(),
+                               scratch.get_fences_left(1), scratch.get_fences_left(2), scratch.get_turn_count())
+        journal.record_result(2, 1)
+        journal.detach(1)
+        journal.close()
+        expected = {2: (games[2].to_bytes(), 1), 3: (games[3].to_bytes(), 0)}
+        journal, state = self.reopen()
+        self.assertEqual(state, expected)
+        journal.close()
+
+    def test_recovered_games_keep_journaling(self):
+        """
+        Moves made in a recovered game are journaled like any other
+        """
+        journal = MoveJournal(self._path, sync=False)
+        journal.open()
+        journal.attach(1, QuoridorGame())
+        journal.close()
+        journal = MoveJournal(self._path, sync=False)
+        game = journal.open()[1][0]
+        play_random_moves(game, random.Random(2), 6, journal, 1)
+        journal.close()
+        journal, state = self.reopen()
+        self.assertEqual(state, {1: (game.to_bytes(), 0)})
+        journal.close()
+
+    def test_long_runs_of_moves(self):
+        """
+        Moves from many sessions in one commit are split over as many move records as they need, and replay in order
+        """
+        rng = random.Random(6)
+        journal = MoveJournal(self._path, sync=False)
+        journal.open()
+        games = [QuoridorGame(5, 3) for _ in range(5)]
+        for session_id, game in enumerate(games, 1):
+            journal.attach(session_id, game)
+        with mock.patch("QuoridorJournal.MOVES_PER_RECORD", 4):
+            for _ in range(6):
+                for session_id, game in enumerate(games, 1):
+                    play_random_moves(game, rng, 1, journal, session_id)
+            moves = journal.get_pending_count() - len(games)
+            self.assertGreater(moves, 8)
+            self.assertEqual(journal.commit(), moves + len(games))
+        records = list(read_batches(self.read_file()))[-1][1]
+        move_records = [record_type for _, record_type, _ in read_records(records) if record_type == MOVE]
+        self.assertEqual(len(move_records), (moves + 3) // 4)
+        journal.close()
+        journal, state = self.reopen()
+        self.assertEqual(state, {session_id: (game.to_bytes(), 0) for session_id, game in enumerate(games, 1)})
+        journal.close()
+
+    def test_torn_tail_is_dropped(self):
+        """
+        A commit cut short or corrupted by a crash is thrown away whole, even when it holds several records, and
+        everything committed before it is recovered
+        """
+        journal = MoveJournal(self._path, sync=False)
+        journal.open()
+        game = QuoridorGame()
+        journal.attach(1, game)
+        play_random_moves(game, random.Random(3), 5, journal, 1)
+        journal.commit()
+        expected = {1: (game.to_bytes(), 0)}
+        committed = self.read_file()
+        play_random_moves(game, random.Random(4), 3, journal, 1)
+        journal.record_result(1, 2)
+        self.assertEqual(journal.commit(), 4)
+        data = self.read_file()
+        journal.close()
+        damaged_files = [data[:cut] for cut in range(len(committed), len(data))]
+        damaged_files += [data[:-2] + bytes([data[-2] ^ 0x40]) + data[-1:], committed + b"\x01\x02garbage"]
+        for damaged in damaged_files:
+            journal, state = self.reopen(damaged)
+            self.assertEqual(state, expected)
+            self.assertEqual(journal.get_discarded_bytes(), len(damaged) - len(committed))
+            journal.close()
+        journal, state = self.reopen(data)
+        self.assertEqual(state, {1: (game.to_bytes(), 2)})
+        journal.close()
+
+    def test_compaction(self):
+        """
+        A journal that grows past compact_bytes is rewritten as one snapshot per session, and still recovers every
+        session
+        """
+        rng = random.Random(5)
+        journal = MoveJournal(self._path, sync=False, compact_bytes=1000)
+        journal.open()
+        games = [QuoridorGame() for _ in range(4)]
+        for session_id, game in enumerate(games, 1):
+            journal.attach(session_id, game)
+        for _ in range(60):
+            for session_id, game in enumerate(games, 1):
+                play_random_moves(game, rng, 1, journal, session_id)
+            journal.commit()
+        self.assertGreater(journal.get_compaction_count(), 1)
+        self.assertLess(os.path.getsize(self._path), 2000)
+        self.assertFalse(os.path.exists(self._path + ".compact"))
+        journal.close()
+        sessions, valid_bytes, total_bytes = replay_journal(self._path)
+        self.assertEqual(valid_bytes, total_bytes)
+        self.assertEqual(recovered_state(sessions),
+                         {session_id: (game.to_bytes(), 0) for session_id, game in enumerate(games, 1)})
+
+    def test_rejects_other_files(self):
+        """
+        A file that isn't a journal raises ValueError instead of being replayed or overwritten
+        """
+        for data in (b"QJ", b"NOPE\x01\x00" + bytes(20)):
+            with open(self._path, "wb") as file:
+                file.write(data)
+            with self.assertRaises(ValueError):
+                MoveJournal(self._path).open()
+            self.assertEqual(self.read_file(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# Description: Regression tests for the move generator, undo and hashing. Checks the cheaper KNOWN_COUNTS and some
+#              jumps worked out by hand, compares perft with a brute force count made through move_pawn and place_fence,
+#              and walks perft trees checking that every move's hash matches one worked out from scratch and that every
+#              undo restores the position.
+#
+#              Run "python -m pytest test_QuoridorPerft.py" or "python -m unittest test_QuoridorPerft".
+
+import random
+import unittest
+
+from Quoridor import QuoridorGame
+from QuoridorPerft import KNOWN_COUNTS, divide, perft
+
+MAX_NODES = 100000  # KNOWN_COUNTS bigger than this are left to "python QuoridorPerft.py 4 --check"
+
+
+def brute_force_perft(game, depth):
+    """
+    Counts the move sequences of exactly depth moves the slow way, by trying every pawn move and fence on every space
+    through move_pawn and place_fence instead of legal_moves, and taking back each one that is made
+    """
+    if depth == 0:
+        return 1
+    if game.get_game_won():
+        return 0
+    player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+    board_size = game.get_board_size()
+    nodes = 0
+    for kind in ("p", "h", "v"):
+        for column in range(board_size):
+            for row in range(board_size):
+                if kind == "p":
+                    legal = game.move_pawn(player_integer, (column, row))
+                else:
+                    legal = game.place_fence(player_integer, kind, (column, row))
+                if legal is True:
+                    nodes += brute_force_perft(game, depth - 1)
+                    game.undo()
+    return nodes
+
+
+def random_position(rng, board_size, fences_per_player, moves):
+    """
+    Returns a game on a board of board_size after up to the given number of random legal moves
+    """
+    game = QuoridorGame(board_size, fences_per_player)
+    for _ in range(moves):
+        legal = game.legal_moves(1 if game.get_turn_count() % 2 != 0 else 2, compact=True)
+        if not legal:
+            break
+        game.apply(rng.choice(legal))
+    return game
+
+
+class TestPerft(unittest.TestCase):
+    """
+    Move generator node counts
+    """
+
+    def test_known_counts(self):
+        """
+        The starting positions match every count in KNOWN_COUNTS up to MAX_NODES
+        """
+        for (board_size, fences_per_player, depth), expected in sorted(KNOWN_COUNTS.items()):
+            if expected <= MAX_NODES:
+                self.assertEqual(perft(QuoridorGame(board_size, fences_per_player), depth), expected,
+                                 (board_size, fences_per_player, depth))
+
+    def test_matches_brute_force(self):
+        """
+        perft agrees with trying every move on every space, from random positions on small boards
+        """
+        rng = random.Random(5)
+        for trial in range(8):
+            board_size = rng.choice((3, 4, 5, 6))
+            game = random_position(rng, board_size, rng.randint(0, 4), rng.randint(0, 12))
+            depth = 3 if board_size <= 4 else 2
+            before = game.to_bytes()
+            self.assertEqual(perft(game, depth), brute_force_perft(game, depth), (trial, board_size))
+            self.assertEqual(game.to_bytes(), before, trial)
+
+    def test_pawns_meeting(self):
+        """
+        Jumps and diagonal sidesteps worked out by hand. The other checks here can't see them: KNOWN_COUNTS stop
+        before the pawns meet, and move_pawn reads the same neighbour table as legal_moves
+        """
+        game = QuoridorGame()
+        #  (P1 square, P2 square, horizontal fence mask) -> squares P1 can move to on the 9x9 board
+        cases = {(40, 49, 0): {31, 39, 41, 58},  # Straight jump over P2
+                 (40, 49, 1 << 58): {31, 39, 41, 48, 50},  # Fence behind P2, so sidestep diagonally
+                 (67, 76, 0): {58, 66, 68, 75, 77}}  # Board edge behind P2
+        for (p1_square, p2_square, h_fences), expected in cases.items():
+            game.load_position(p1_square, p2_square, h_fences, 0, 10, 10, 1)
+            pawn_moves = set(move >> 2 for move in game.legal_moves(1, compact=True) if move & 3 == 0)
+            self.assertEqual(pawn_moves, expected, (p1_square, p2_square))
+
+    def test_divide_adds_up(self):
+        """
+        The divide counts add up to perft, and splitting the root moves across workers gives the same counts
+        """
+        game = QuoridorGame(5, 3)
+        results = divide(game, 3)
+        self.assertEqual(sum(count for move, count in results), KNOWN_COUNTS[(5, 3, 3)])
+        self.assertEqual(divide(game, 3, workers=2), results)
+
+
+class TestUndoAndHash(unittest.TestCase):
+    """
+    Checks made at every node of a perft tree
+    """
+
+    def walk(self, game, depth, label):
+        """
+        Plays every legal move to the given depth. After each move the hash has to match compute_hash, and after each
+        undo the position, hash, undo count and legal moves have to be exactly as they were
+        """
+        player_integer = 1 if game.get_turn_count() % 2 != 0 else 2
+        moves = game.legal_moves(player_integer, compact=True)
+        before = (game.to_bytes(), game.get_hash(), game.get_undo_count(), list(moves))
+        for move in moves:
+            self.assertTrue(game.apply(move), (label, move))
+            self.assertEqual(game.get_hash(), game.compute_hash(), (label, move))
+            if depth > 1:
+                self.walk(game, depth - 1, label)
+            self.assertTrue(game.undo(), (label, move))
+            after = (game.to_bytes(), game.get_hash(), game.get_undo_count(),
+                     list(game.legal_moves(player_integer, compact=True)))
+            self.assertEqual(after, before, (label, move))
+
+    def test_starting_positions(self):
+        """
+        Two moves deep from the starting position of a few board sizes, and one move deep on the standard board
+        """
+        for board_size, fences_per_player, depth in ((3, 2, 2), (5, 3, 2), (7, 6, 2), (9, 10, 1)):
+            self.walk(QuoridorGame(board_size, fences_per_player), depth, board_size)
+
+    def test_random_positions(self):
+        """
+        Two moves deep from random positions, where pawns meet and fences are already down
+        """
+        rng = random.Random(11)
+        for trial in range(6):
+            game = random_position(rng, rng.choice((4, 5, 7)), 6, rng.randint(4, 20))
+            self.walk(game, 2, trial)
+
+    def test_transpositions_hash_alike(self):
+        """
+        The same position reached by two move orders has the same hash, and the game packs to the same bytes
+        """
+        first = QuoridorGame()
+        second = QuoridorGame()
+        #  Each player makes the same two moves, in the opposite order in the second game
+        p1_moves = [("p", (4, 1)), ("v", (6, 5))]
+        p2_moves = [("h", (2, 3)), ("p", (4, 7))]
+        for game, order in ((first, (0, 0, 1, 1)), (second, (1, 1, 0, 0))):
+            for turn, index in enumerate(order):
+                player_integer = 1 if turn % 2 == 0 else 2
+                kind, location = (p1_moves if player_integer == 1 else p2_moves)[index]
+                if kind == "p":
+                    self.assertTrue(game.move_pawn(player_integer, location))
+                else:
+                    self.assertTrue(game.place_fence(player_integer, kind, location))
+        self.assertEqual(first.get_hash(), second.get_hash())
+        self.assertEqual(first.to_bytes(), second.to_bytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
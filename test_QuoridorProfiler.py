@@ -0,0 +1,71 @@
+# Description: Tests for the opt-in instrumentation: calls are counted and turned down moves get a reason however their
+#              arguments are passed, the diagnosis of one thread doesn't stop another thread's calls being counted, and
+#              disabling puts the original methods back.
+#
+#              Run "python -m pytest test_QuoridorProfiler.py" or "python -m unittest test_QuoridorProfiler".
+
+import threading
+import unittest
+
+from Quoridor import QuoridorGame
+from QuoridorProfiler import Instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Counters and rejection reasons collected while instrumentation is enabled
+    """
+
+    def test_keyword_arguments(self):
+        """
+        Moves passed by keyword are played and diagnosed the same as positional ones
+        """
+        game = QuoridorGame()
+        with Instrumentation(timing=True) as instrumentation:
+            self.assertTrue(game.move_pawn(player_integer=1, target_location=(4, 1)))
+            self.assertFalse(game.move_pawn(2, target_location=(4, 5)))
+            self.assertTrue(game.place_fence(2, v_or_h="h", target_location=(4, 2)))
+            self.assertFalse(game.place_fence(player_integer=1, v_or_h="h", target_location=(4, 2)))
+        data = instrumentation.snapshot()
+        self.assertEqual(data["calls"]["move_pawn"], 2)
+        self.assertEqual(data["calls"]["place_fence"], 2)
+        self.assertEqual(data["rejections"], {"move_pawn": {"out of reach": 1}, "place_fence": {"already fenced": 1}})
+
+    def test_diagnosis_only_pauses_its_own_thread(self):
+        """
+        Calls made on another thread while a rejection is being diagnosed are still counted
+        """
+        game = QuoridorGame()
+        other_game = QuoridorGame()
+        diagnose = game.rejection_reason
+
+        def rejection_reason(*arguments):
+            thread = threading.Thread(target=other_game.move_pawn, args=(1, (4, 1)))
+            thread.start()
+            thread.join()
+            return diagnose(*arguments)
+
+        game.rejection_reason = rejection_reason
+        with Instrumentation() as instrumentation:
+            self.assertFalse(game.move_pawn(1, (4, 3)))
+        data = instrumentation.snapshot()
+        self.assertEqual(data["calls"]["move_pawn"], 2)
+        self.assertEqual(data["rejections"]["move_pawn"], {"out of reach": 1})
+
+    def test_disable_restores_methods(self):
+        """
+        Once disabled, QuoridorGame has its own methods back and nothing more is counted
+        """
+        move_pawn = QuoridorGame.move_pawn
+        instrumentation = Instrumentation()
+        with instrumentation:
+            self.assertIsNot(QuoridorGame.move_pawn, move_pawn)
+            with self.assertRaises(RuntimeError):
+                Instrumentation().enable()
+        self.assertIs(QuoridorGame.move_pawn, move_pawn)
+        QuoridorGame().move_pawn(1, (4, 1))
+        self.assertEqual(instrumentation.snapshot()["calls"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# Description: Tests for the game record reader: parsing moves in notation, and the verdicts validate_records gives for
+#              legal games, won games, illegal moves and tokens that aren't moves.
+#
+#              Run "python -m pytest test_QuoridorRecords.py" or "python -m unittest test_QuoridorRecords".
+
+import unittest
+
+from QuoridorRecords import GameVerdict, format_move, parse_move, validate_records
+
+#  P1 walks straight up column e while P2 steps back and forth along the top row, so P1 wins on the 15th move
+WINNING_GAME = "e2 d9 e3 c9 e4 d9 e5 c9 e6 d9 e7 c9 e8 d9 e9"
+
+
+class TestParseMove(unittest.TestCase):
+    """
+    Moves in notation
+    """
+
+    def test_parses_moves(self):
+        """
+        Pawn moves and both kinds of fence
+        """
+        self.assertEqual(parse_move("e2"), ("p", (4, 1)))
+        self.assertEqual(parse_move("a9"), ("p", (0, 8)))
+        self.assertEqual(parse_move("c3h"), ("h", (2, 2)))
+        self.assertEqual(parse_move("i1v"), ("v", (8, 0)))
+
+    def test_format_is_the_reverse(self):
+        """
+        format_move writes back the token parse_move read
+        """
+        for token in ("e2", "a9", "c3h", "i1v", "f5h"):
+            self.assertEqual(format_move(*parse_move(token)), token)
+
+    def test_rejects_tokens_that_are_not_moves(self):
+        """
+        Unknown columns, rows off the board and malformed tokens raise ValueError
+        """
+        for token in ("", "e", "h", "z2", "e0", "e10", "ex", "2e", "e2x", "E2"):
+            with self.assertRaises(ValueError, msg=token):
+                parse_move(token)
+
+
+class TestValidateRecords(unittest.TestCase):
+    """
+    Verdicts for whole records
+    """
+
+    def test_verdicts(self):
+        """
+        Each kind of record gets the verdict it should, with the line numbers of the file
+        """
+        lines = ["# a comment", "1. e2 e8 2. e3 e7", "", WINNING_GAME, WINNING_GAME + " c9", "e2 e8 e5", "e2 z9"]
+        verdicts = list(validate_records(lines))
+        self.assertEqual(verdicts, [GameVerdict(2, 4, None, 0, None),
+                                    GameVerdict(4, 15, None, 1, None),
+                                    GameVerdict(5, 15, 16, 1, "illegal move: 'c9'"),
+                                    GameVerdict(6, 2, 3, 0, "illegal move: 'e5'"),
+                                    GameVerdict(7, 1, 2, 0, "not a move: 'z9'")])
+
+    def test_workers_keep_file_order(self):
+        """
+        Sharing the records out between worker processes gives the same verdicts in the same order
+        """
+        lines = [WINNING_GAME, "e2 e8 e5", "e2 e8 e3h e7", "a1"] * 5
+        self.assertEqual(list(validate_records(lines, workers=2, chunk_size=3)), list(validate_records(lines)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+# Description: Tests for QuoridorServer. Requests are run through handle_line with a stand-in connection that records
+#              what it is sent, which covers the replies to every kind of bad request and take-backs, and the rest talk
+#              to a running server over TCP: pipelined requests, and sessions coming back from the journal after a
+#              restart.
+#
+#              Run "python -m pytest test_QuoridorServer.py" or "python -m unittest test_QuoridorServer".
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from QuoridorServer import QuoridorServer
+
+
+class RecordingConnection:
+    """
+    Stands in for a Connection, keeping the events it is sent in a list
+    """
+
+    def __init__(self):
+        self.seats = {}
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+class TestRequests(unittest.TestCase):
+    """
+    Replies to requests, good and bad, without a network
+    """
+
+    def setUp(self):
+        self.server = QuoridorServer()
+        self.p1 = RecordingConnection()
+        self.p2 = RecordingConnection()
+        self.watcher = RecordingConnection()
+
+    def request(self, connection, **request):
+        """
+        Runs one request and returns the reply
+        """
+        return self.server.handle_line(connection, json.dumps(request).encode())
+
+    def start_game(self):
+        """
+        Creates a session with both seats taken and returns its id
+        """
+        session_id = self.request(self.p1, op="create")["session"]
+        self.assertEqual(self.request(self.p2, op="join", session=session_id),
+                         {"ok": True, "session": session_id, "player": 2})
+        return session_id
+
+    def assert_error(self, reply, error):
+        """
+        Checks that a reply is a failure with the given message
+        """
+        self.assertEqual(reply, {"ok": False, "error": error})
+
+    def test_malformed_requests(self):
+        """
+        Lines that aren't requests get an error reply instead of dropping the client
+        """
+        for line in (b"not json", b"[1, 2]", b'{"no_op": 1}'):
+            self.assert_error(self.server.handle_line(self.p1, line), "bad request")
+        self.assert_error(self.request(self.p1, op="fly"), "unknown op 'fly'")
+        self.assert_error(self.request(self.p1, op="move"), "bad arguments for move")
+        session_id = self.start_game()
+        self.assert_error(self.request(self.p1, op="move", session=session_id, to=[4]), "bad arguments for move")
+        self.assert_error(self.request(self.p1, op="fence", session=session_id, kind="d", at=[4, 2]),
+                          "kind must be h or v")
+        line = b'{"op": "move", "session": %d, "to": [1e400, 0]}' % session_id
+        self.assert_error(self.server.handle_line(self.p1, line), "bad arguments for move")
+        for location in ([4.0, 1], [True, 1], ["4", 1], {"x": 4}, 4):
+            self.assert_error(self.request(self.p1, op="move", session=session_id, to=location),
+                              "bad arguments for move")
+            self.assert_error(self.request(self.p1, op="fence", session=session_id, kind="h", at=location),
+                              "bad arguments for fence")
+        self.assertEqual(self.request(self.watcher, op="state", session=session_id)["state"]["turn"], 1)
+
+    def test_seats_and_turns(self):
+        """
+        Only seated players can move, only on their turn, and a full session can't be joined
+        """
+        session_id = self.start_game()
+        self.assert_error(self.request(self.p1, op="move", session=99, to=[4, 1]), "no such session")
+        self.assert_error(self.request(self.watcher, op="move", session=session_id, to=[4, 1]),
+                          "not a player in this session")
+        self.assert_error(self.request(self.watcher, op="join", session=session_id), "session is full")
+        self.assert_error(self.request(self.p2, op="move", session=session_id, to=[4, 7]), "not your turn")
+        self.assertEqual(self.request(self.watcher, op="state", session=session_id)["state"]["turn"], 1)
+
+    def test_illegal_moves_say_why(self):
+        """
+        Illegal moves are turned down with the reason from rejection_reason
+        """
+        session_id = self.start_game()
+        self.assert_error(self.request(self.p1, op="move", session=session_id, to=[4, 3]), "out of reach")
+        self.assert_error(self.request(self.p1, op="move", session=session_id, to=[12, 1]), "off board")
+        self.assertEqual(self.request(self.p1, op="fence", session=session_id, kind="h", at=[4, 2]),
+                         {"ok": True, "turn": 2, "winner": 0})
+        self.assert_error(self.request(self.p2, op="fence", session=session_id, kind="h", at=[4, 2]),
+                          "already fenced")
+
+    def test_moves_reach_the_opponent(self):
+        """
+        A move is answered with the new turn and reported to the other player, and the id comes back in the reply
+        """
+        session_id = self.start_game()
+        reply = self.request(self.p1, op="move", session=session_id, to=[4, 1], id=7)
+        self.assertEqual(reply, {"ok": True, "turn": 2, "winner": 0, "id": 7})
+        self.assertEqual(self.p2.sent[-1]["event"], "moved")
+        self.assertEqual(self.p2.sent[-1]["at"], (4, 1))
+
+    def test_resign_ends_the_game(self):
+        """
+        After a resignation the opponent has won and no more moves are taken
+        """
+        session_id = self.start_game()
+        self.assertEqual(self.request(self.p1, op="resign", session=session_id), {"ok": True, "winner": 2})
+        self.assertEqual(self.p2.sent[-1]["event"], "resigned")
+        self.assert_error(self.request(self.p2, op="move", session=session_id, to=[4, 7]), "game over")
+        self.assert_error(self.request(self.p1, op="resign", session=session_id), "game over")
+
+    def test_takeback_needs_both_players(self):
+        """
+        The first takeback is left pending and the opponent told, the second takes the move back, and a move in between
+        cancels the request
+        """
+        session_id = self.start_game()
+        self.assert_error(self.request(self.p1, op="takeback", session=session_id), "nothing to take back")
+        self.request(self.p1, op="move", session=session_id, to=[4, 1])
+        self.assertEqual(self.request(self.p1, op="takeback", session=session_id), {"ok": True, "pending": True})
+        self.assertEqual(self.p2.sent[-1]["event"], "takeback")
+        self.request(self.p2, op="move", session=session_id, to=[4, 7])
+        self.assertEqual(self.request(self.p2, op="takeback", session=session_id), {"ok": True, "pending": True})
+        self.assertEqual(self.request(self.p1, op="takeback", session=session_id),
+                         {"ok": True, "pending": False, "turn": 2, "winner": 0})
+        state = self.request(self.watcher, op="state", session=session_id)["state"]
+        self.assertEqual((state["p1"], state["p2"]), ((4, 1), (4, 8)))
+
+    def test_takeback_of_a_win(self):
+        """
+        A winning move can be taken back, which clears the winner, but a resignation can't
+        """
+        session_id = self.request(self.p1, op="create", size=3, fences=0)["session"]
+        self.request(self.p2, op="join", session=session_id)
+        for connection, location in ((self.p1, [0, 0]), (self.p2, [2, 2]), (self.p1, [0, 1]), (self.p2, [2, 1])):
+            self.assertTrue(self.request(connection, op="move", session=session_id, to=location)["ok"])
+        self.assertEqual(self.request(self.p1, op="move", session=session_id, to=[0, 2])["winner"], 1)
+        self.request(self.p2, op="takeback", session=session_id)
+        self.assertEqual(self.request(self.p1, op="takeback", session=session_id),
+                         {"ok": True, "pending": False, "turn": 5, "winner": 0})
+        self.request(self.p1, op="resign", session=session_id)
+        self.assert_error(self.request(self.p2, op="takeback", session=session_id), "game over")
+
+    def test_idle_sessions_are_evicted(self):
+        """
+        Sessions idle for longer than idle_timeout are removed and their players told
+        """
+        session_id = self.start_game()
+        self.assertEqual(self.server.evict_idle(self.server._sessions[session_id].last_active + 1000.0), 1)
+        self.assertEqual(self.server.get_session_count(), 0)
+        self.assertEqual(self.p1.sent[-1], {"event": "evicted", "session": session_id})
+        self.assert_error(self.request(self.watcher, op="state", session=session_id), "no such session")
+
+
+class TestOverTCP(unittest.TestCase):
+    """
+    A real server on a free port
+    """
+
+    def test_pipelined_requests(self):
+        """
+        Requests sent together in one write are all answered, in order
+        """
+
+        async def run():
+            server = QuoridorServer(port=0)
+            port = await server.start()
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b'{"op":"create","id":1}\n{"op":"bogus","id":2}\n{"op":"state","session":1,"id":3}\n')
+                replies = [json.loads(await reader.readline()) for _ in range(3)]
+                writer.close()
+                await writer.wait_closed()
+                await asyncio.sleep(0)
+            finally:
+                await server.close()
+            return replies
+
+        replies = asyncio.run(run())
+        self.assertEqual([reply["id"] for reply in replies], [1, 2, 3])
+        self.assertEqual(replies[0]["session"], 1)
+        self.assertFalse(replies[1]["ok"])
+        self.assertEqual(replies[2]["state"]["turn"], 1)
+
+    def test_journal_restores_sessions(self):
+        """
+        A server restarted on the same journal hosts the sessions as they were, take-backs and results included
+        """
+
+        async def play(server, lines):
+            port = await server.start()
+            try:
+                clients = [await asyncio.open_connection("127.0.0.1", port) for _ in range(2)]
+                replies = []
+                for client, line in lines:
+                    reader, writer = clients[client]
+                    writer.write(json.dumps(line).encode() + b"\n")
+                    replies.append(json.loads(await reader.readline()))
+                for reader, writer in clients:
+                    writer.close()
+                    await writer.wait_closed()
+                await asyncio.sleep(0)
+            finally:
+                await server.close()
+            return replies
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "server.qjnl")
+            asyncio.run(play(QuoridorServer(port=0, journal_path=path, journal_sync=False), [
+                (0, {"op": "create"}), (1, {"op": "join", "session": 1}),
+                (0, {"op": "move", "session": 1, "to": [4, 1]}),
+                (1, {"op": "fence", "session": 1, "kind": "h", "at": [3, 3]}),
+                (0, {"op": "takeback", "session": 1}), (1, {"op": "takeback", "session": 1}),
+                (0, {"op": "create"}), (0, {"op": "resign", "session": 2})]))
+            replies = asyncio.run(play(QuoridorServer(port=0, journal_path=path, journal_sync=False), [
+                (0, {"op": "state", "session": 1}), (0, {"op": "state", "session": 2}), (0, {"op": "create"})]))
+        self.assertEqual(replies[0]["state"]["turn"], 2)
+        self.assertEqual(replies[0]["state"]["p1"], [4, 1])
+        self.assertEqual(replies[0]["state"]["h_fences"], [])
+        self.assertEqual(replies[0]["state"]["players"], [False, False])
+        self.assertEqual(replies[1]["state"]["winner"], 2)
+        self.assertEqual(replies[2]["session"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+# Description: Tests for the position stores: positions written with PositionWriter read back unchanged through
+#              PositionStore, appending keeps what was already there, and files that aren't stores are rejected.
+#
+#              Run "python -m pytest test_QuoridorStore.py" or "python -m unittest test_QuoridorStore".
+
+import gc
+import os
+import random
+import tempfile
+import unittest
+import warnings
+
+from Quoridor import QuoridorGame
+from QuoridorStore import PositionStore, PositionWriter
+
+
+def random_games(seed, count, board_size=9):
+    """
+    Returns count games on a board of board_size, each after a different number of random legal moves
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = QuoridorGame(board_size)
+        for _ in range(rng.randint(0, 40)):
+            if game.get_game_won():
+                break
+            game.apply(rng.choice(game.legal_moves(1 if game.get_turn_count() % 2 != 0 else 2, compact=True)))
+        games.append(game)
+    return games
+
+
+class TestPositionStore(unittest.TestCase):
+    """
+    Round trips through store files in a temporary directory
+    """
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "positions.qpos")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_round_trip(self):
+        """
+        Every position comes back byte for byte, by index, in order and as a game
+        """
+        games = random_games(1, 50)
+        with PositionWriter(self._path) as writer:
+            for game in games:
+                writer.write(game)
+        with PositionStore(self._path) as store:
+            self.assertEqual(len(store), len(games))
+            self.assertEqual([bytes(record) for record in store], [game.to_bytes() for game in games])
+            self.assertEqual(bytes(store[-1]), games[-1].to_bytes())
+            self.assertEqual([game.to_bytes() for game in store.iter_games()], [game.to_bytes() for game in games])
+            unpacked = store.get_game(7)
+            self.assertEqual(unpacked.get_fence_masks(), games[7].get_fence_masks())
+            self.assertEqual(unpacked.get_hash(), games[7].compute_hash())
+            with self.assertRaises(IndexError):
+                store[len(games)]
+
+    def test_append(self):
+        """
+        Reopening with append=True adds positions after the ones already stored
+        """
+        games = random_games(2, 30)
+        with PositionWriter(self._path) as writer:
+            for game in games[:10]:
+                writer.write(game)
+        with PositionWriter(self._path, append=True) as writer:
+            self.assertEqual(writer.get_count(), 10)
+            writer.write_bytes(b"".join(game.to_bytes() for game in games[10:]))
+        with PositionStore(self._path) as store:
+            self.assertEqual([bytes(record) for record in store], [game.to_bytes() for game in games])
+
+    def test_append_after_a_torn_write(self):
+        """
+        Appending to a store cut off partway through its positions keeps the whole positions that are left, instead of
+        padding the file out to its count
+        """
+        games = random_games(4, 20)
+        with PositionWriter(self._path) as writer:
+            for game in games[:10]:
+                writer.write(game)
+        record_bytes = len(games[0].to_bytes())
+        os.truncate(self._path, os.path.getsize(self._path) - 4 * record_bytes - 3)
+        with PositionWriter(self._path, append=True) as writer:
+            self.assertEqual(writer.get_count(), 5)
+            for game in games[10:]:
+                writer.write(game)
+        with PositionStore(self._path) as store:
+            self.assertEqual([bytes(record) for record in store], [game.to_bytes() for game in games[:5] + games[10:]])
+
+    def test_board_sizes(self):
+        """
+        A store holds positions for one size of board, and tells which from the width of its positions
+        """
+        games = random_games(4, 20, 5)
+        with PositionWriter(self._path, board_size=5) as writer:
+            for game in games:
+                writer.write(game)
+            with self.assertRaises(ValueError):
+                writer.write(QuoridorGame())
+        with self.assertRaises(ValueError):
+            PositionWriter(self._path, append=True)
+        with PositionStore(self._path) as store:
+            self.assertEqual(store.get_board_size(), 5)
+            self.assertEqual([game.to_bytes() for game in store.iter_games()], [game.to_bytes() for game in games])
+
+    def test_flushed_positions_are_readable(self):
+        """
+        A store that is still being written can be read up to its last flush
+        """
+        games = random_games(3, 5)
+        writer = PositionWriter(self._path)
+        for game in games:
+            writer.write(game)
+        writer.flush()
+        writer.write(games[0])
+        with PositionStore(self._path) as store:
+            self.assertEqual(len(store), len(games))
+        writer.close()
+
+    def test_rejects_other_files(self):
+        """
+        Files that are too short or have the wrong magic raise ValueError, both to read and to append to, and are left
+        closed and as they were
+        """
+        for data in (b"", b"QPOS", b"NOPE" + bytes(12)):
+            with open(self._path, "wb") as file:
+                file.write(data)
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                with self.assertRaises(ValueError):
+                    PositionStore(self._path)
+                with self.assertRaises(ValueError):
+                    PositionWriter(self._path, append=True)
+                gc.collect()
+            unclosed = [warning for warning in caught if issubclass(warning.category, ResourceWarning)
+                        and self._path in str(warning.message)]
+            self.assertEqual(unclosed, [])
+            with open(self._path, "rb") as file:
+                self.assertEqual(file.read(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()